@@ -2,6 +2,13 @@
 ASGI config for app project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with uvicorn, one worker per core:
+
+    uvicorn app.asgi:application --host 0.0.0.0 --port 8000 --workers 4
+
+or with gunicorn managing uvicorn workers:
+
+    gunicorn app.asgi:application -k uvicorn.workers.UvicornWorker -w 4
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -9,8 +16,25 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler, ASGIRequest
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
+
+class AsyncViewsRequest(ASGIRequest):
+    """Request resolved with the URLs of app.asgi_urls"""
+    urlconf = 'app.asgi_urls'
+
+
+class AsyncViewsASGIHandler(ASGIHandler):
+    """ASGI handler serving recipe read endpoints with async views"""
+    request_class = AsyncViewsRequest
+
+
+def get_asgi_application():
+    django.setup(set_prefix=False)
+    return AsyncViewsASGIHandler()
+
+
 application = get_asgi_application()
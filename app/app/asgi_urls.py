@@ -0,0 +1,16 @@
+"""
+URL configuration of the ASGI application
+
+Same routes as app.urls, with recipe, tag and ingredient list and
+detail routes served by coroutines, see recipe.async_views.
+"""
+from django.urls import path, include
+
+from app import urls
+from recipe.urls import async_urlpatterns
+
+
+urlpatterns = [
+    path('api/recipe/', include((async_urlpatterns, 'recipe'))),
+    *urls.urlpatterns,
+]
@@ -0,0 +1,124 @@
+"""
+Gunicorn configuration for serving app.wsgi in production.
+
+Run from the directory of manage.py:
+
+    gunicorn -c python:app.gunicorn_conf app.wsgi
+
+Each worker process runs GUNICORN_THREADS threads, by default enough to
+keep one core busy while other threads wait on the database. Try it
+locally with the load benchmark:
+
+    python manage.py benchmark_api --url http://localhost:8000 \\
+        --concurrency 16
+"""
+import math
+import os
+
+
+def cpu_count():
+    """Return the CPUs available to this process, honouring cgroup quotas"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as cpu_max:
+            quota, period = cpu_max.read().split()
+    except (OSError, ValueError):
+        return cpus
+    if quota == 'max':
+        return cpus
+    return max(1, min(cpus, math.ceil(int(quota) / int(period))))
+
+
+def thread_count(cpu_ms, db_wait_ms, max_threads=32):
+    """
+    Return the threads keeping a core busy when each request takes
+    cpu_ms of CPU time and waits db_wait_ms on the database.
+    """
+    threads = math.ceil((cpu_ms + db_wait_ms) / cpu_ms)
+    return max(1, min(threads, max_threads))
+
+
+def fit_connections(workers, threads, max_connections):
+    """Return threads per worker so all threads fit in max_connections"""
+    if not max_connections:
+        return threads
+    return max(1, min(threads, max_connections // workers))
+
+
+def memory_usage():
+    """Return the resident memory of this process in bytes"""
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _env(name, default, cast=int):
+    return cast(os.environ.get(name, default))
+
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = 'gthread'
+workers = _env('WEB_CONCURRENCY', cpu_count())
+threads = fit_connections(
+    workers,
+    _env('GUNICORN_THREADS', thread_count(
+        _env('GUNICORN_CPU_MS', 10, float),
+        _env('GUNICORN_DB_WAIT_MS', 20, float),
+    )),
+    _env('GUNICORN_MAX_DB_CONNECTIONS', 0),
+)
+
+# Import the application once in the master, workers share its memory
+# pages copy-on-write.
+preload_app = bool(_env('GUNICORN_PRELOAD', 1))
+
+# Workers restart gracefully after max_requests or once their resident
+# memory exceeds GUNICORN_MAX_WORKER_MEMORY_MB, whichever comes first.
+max_requests = _env('GUNICORN_MAX_REQUESTS', 5000)
+max_requests_jitter = _env('GUNICORN_MAX_REQUESTS_JITTER', 500)
+max_worker_memory = _env('GUNICORN_MAX_WORKER_MEMORY_MB', 512) * 1024 ** 2
+
+# Keep idle API connections open longer than a load balancer would, so
+# it never sends a request on a connection gunicorn is closing.
+keepalive = _env('GUNICORN_KEEPALIVE', 75)
+timeout = _env('GUNICORN_TIMEOUT', 30)
+graceful_timeout = _env('GUNICORN_GRACEFUL_TIMEOUT', 30)
+backlog = _env('GUNICORN_BACKLOG', 2048)
+
+# Heartbeat files on disk can stall workers, keep them in memory.
+worker_tmp_dir = os.environ.get(
+    'GUNICORN_WORKER_TMP_DIR',
+    '/dev/shm' if os.path.isdir('/dev/shm') else None,
+)
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def pre_fork(server, worker):
+    """Close connections of the master, so workers never share them"""
+    from django.db import connections
+
+    from core.db.pool import close_pools
+
+    connections.close_all()
+    close_pools()
+
+
+def post_request(worker, req, environ, resp):
+    """Restart the worker once it uses more than max_worker_memory"""
+    if max_worker_memory and memory_usage() > max_worker_memory:
+        worker.log.info(
+            'Worker %s uses more than %d MB, restarting',
+            worker.pid,
+            max_worker_memory // 1024 ** 2,
+        )
+        worker.alive = False
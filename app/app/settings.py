@@ -47,11 +47,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.HashingBusyMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -80,13 +83,32 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Pooled connections go back to the pool at the end of each request,
+# otherwise connections persist per thread for DB_CONN_MAX_AGE seconds.
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 0))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+        },
+        'CONN_MAX_AGE': (
+            0 if DB_POOL_MAX_SIZE
+            else int(os.environ.get('DB_CONN_MAX_AGE', 60))
+        ),
+        'CONN_HEALTH_CHECKS': bool(
+            int(os.environ.get('DB_CONN_HEALTH_CHECKS', 1))
+        ),
+        'POOL': {
+            'MAX_SIZE': DB_POOL_MAX_SIZE,
+            'MIN_SIZE': int(os.environ.get('DB_POOL_MIN_SIZE', 0)),
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        },
     }
 }
 
@@ -109,6 +131,38 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# The first hasher hashes new passwords, hashes of the others are
+# upgraded on login. Argon2 needs argon2-cffi installed.
+PASSWORD_HASHERS = os.environ.get('PASSWORD_HASHERS', ','.join([
+    'core.hashers.ScryptPasswordHasher',
+    'core.hashers.Argon2PasswordHasher',
+    'core.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+])).split(',')
+PASSWORD_SCRYPT = {
+    'WORK_FACTOR': int(os.environ.get('PASSWORD_SCRYPT_WORK_FACTOR', 2 ** 14)),
+    'BLOCK_SIZE': int(os.environ.get('PASSWORD_SCRYPT_BLOCK_SIZE', 8)),
+    'PARALLELISM': int(os.environ.get('PASSWORD_SCRYPT_PARALLELISM', 1)),
+}
+PASSWORD_ARGON2 = {
+    'TIME_COST': int(os.environ.get('PASSWORD_ARGON2_TIME_COST', 2)),
+    'MEMORY_COST': int(os.environ.get('PASSWORD_ARGON2_MEMORY_COST', 19456)),
+    'PARALLELISM': int(os.environ.get('PASSWORD_ARGON2_PARALLELISM', 1)),
+}
+PASSWORD_PBKDF2_ITERATIONS = int(
+    os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 260000)
+)
+# Hashes are computed by this many threads, so login bursts queue up
+# instead of taking the CPU from other requests. 0 hashes inline.
+PASSWORD_HASHING_WORKERS = int(os.environ.get(
+    'PASSWORD_HASHING_WORKERS',
+    max(1, (os.cpu_count() or 2) // 2),
+))
+PASSWORD_HASHING_QUEUE = int(os.environ.get('PASSWORD_HASHING_QUEUE', 32))
+PASSWORD_HASHING_TIMEOUT = float(
+    os.environ.get('PASSWORD_HASHING_TIMEOUT', 5)
+)
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
@@ -133,6 +187,20 @@ MEDIA_URL = '/static/media/'
 STATIC_ROOT = '/vol/web/static'
 MEDIA_ROOT = '/vol/web/media'
 
+# Threads generating recipe image derivatives, 0 generates them inline.
+RECIPE_IMAGE_WORKERS = int(os.environ.get('RECIPE_IMAGE_WORKERS', 2))
+
+# Serialize recipe lists from values() rows instead of model serializers.
+RECIPE_LIST_FAST_PATH = bool(int(os.environ.get('RECIPE_LIST_FAST_PATH', 1)))
+
+# Limits enforced while recipe images are streamed in.
+RECIPE_IMAGE_MAX_UPLOAD_SIZE = int(
+    os.environ.get('RECIPE_IMAGE_MAX_UPLOAD_SIZE', 10 * 2 ** 20)
+)
+RECIPE_IMAGE_MAX_PIXELS = int(
+    os.environ.get('RECIPE_IMAGE_MAX_PIXELS', 40_000_000)
+)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -141,7 +209,78 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
-    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema'
+    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'user.authentication.CachedTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+    # Use orjson when installed, falling back to the stdlib encoder
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# Local memory by default, set CACHE_BACKEND and CACHE_LOCATION to
+# share entries between processes, e.g. with memcached or redis.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    },
+}
+
+# Per endpoint request metrics, scraped from /metrics by the given IPs.
+METRICS_ENABLED = bool(int(os.environ.get('METRICS_ENABLED', 1)))
+METRICS_ALLOWED_IPS = os.environ.get(
+    'METRICS_ALLOWED_IPS', '127.0.0.1',
+).split(',')
+
+# Threads running async views under ASGI, each holds a DB connection.
+ASYNC_VIEW_WORKERS = int(os.environ.get('ASYNC_VIEW_WORKERS', 16))
+
+# Staff users can profile single requests, see core.middleware.
+PROFILING_ENABLED = bool(int(os.environ.get('PROFILING_ENABLED', 0)))
+PROFILING_DIR = os.environ.get('PROFILING_DIR', '/tmp/profiles')
+PROFILING_KEEP = int(os.environ.get('PROFILING_KEEP', 100))
+PROFILING_SAMPLE_INTERVAL = float(
+    os.environ.get('PROFILING_SAMPLE_INTERVAL', 0.005)
+)
+
+# Rendered recipe API responses, an empty alias disables the cache.
+RESPONSE_CACHE = {
+    'ALIAS': os.environ.get('RESPONSE_CACHE_ALIAS', 'default'),
+    'TIMEOUT': int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 300)),
+}
+
+# Token to user cache used by CachedTokenAuthentication. Without an
+# alias, tokens are cached per process; with a cache alias (e.g. a shared
+# memcached/redis cache) invalidations are seen by all processes.
+TOKEN_AUTH_CACHE = {
+    'ALIAS': os.environ.get('TOKEN_AUTH_CACHE_ALIAS'),
+    'MAX_SIZE': int(os.environ.get('TOKEN_AUTH_CACHE_MAX_SIZE', 10000)),
+    'TIMEOUT': int(os.environ.get('TOKEN_AUTH_CACHE_TIMEOUT', 60)),
+}
+
+# Login returns signed, expiring tokens instead of rows of the token
+# table. Opaque tokens issued before keep working. Token versions of
+# users are cached in CACHE_ALIAS for TOKEN_AUTH_CACHE['TIMEOUT']
+# seconds. Point it at a cache shared by all workers, e.g. Redis or
+# Memcached, for a revoked token to be rejected by each of them at
+# once. With the default local memory cache, other workers keep
+# accepting a revoked token until their cached version expires.
+SIGNED_TOKENS = {
+    'ENABLED': bool(int(os.environ.get('SIGNED_TOKENS_ENABLED', 0))),
+    'MAX_AGE': int(os.environ.get('SIGNED_TOKENS_MAX_AGE', 24 * 60 * 60)),
+    'CACHE_ALIAS': os.environ.get('SIGNED_TOKENS_CACHE_ALIAS', 'default'),
 }
 
 SPECTACULAR_SETTINGS = {
@@ -2,6 +2,9 @@
 WSGI config for app project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
+Serve it with gunicorn, configured from the environment:
+
+    gunicorn -c python:app.gunicorn_conf app.wsgi
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/wsgi/
@@ -0,0 +1,3 @@
+"""
+PostgreSQL backend with connection health checks and pooling
+"""
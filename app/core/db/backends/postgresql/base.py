@@ -0,0 +1,106 @@
+"""
+PostgreSQL backend adding connection health checks and pooling.
+
+Extra database settings:
+    CONN_HEALTH_CHECKS: check a persistent connection is usable before
+        its first use in each request, like Django 4.1 does.
+    POOL: dict with MAX_SIZE, MIN_SIZE and TIMEOUT, share connections
+        between threads through an in-process pool when MAX_SIZE is set.
+"""
+from functools import partial
+
+from django.db.backends.postgresql import base
+
+from core.db.backends.postgresql.creation import DatabaseCreation
+from core.db.pool import get_pool
+
+
+def is_usable(connection):
+    """Whether a raw psycopg2 connection answers queries"""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except base.Database.Error:
+        return False
+    else:
+        return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_done = False
+
+    @property
+    def health_check_enabled(self):
+        return self.settings_dict.get('CONN_HEALTH_CHECKS', False)
+
+    @property
+    def pool(self):
+        """Return the connection pool, None when pooling is disabled"""
+        if not (self.settings_dict.get('POOL') or {}).get('MAX_SIZE'):
+            return None
+        return get_pool(
+            self.settings_dict,
+            check=is_usable if self.health_check_enabled else None,
+        )
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+
+        connection = pool.acquire(
+            partial(super().get_new_connection, conn_params),
+        )
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level',
+            connection.isolation_level,
+        )
+        return connection
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+
+        with self.wrap_database_errors:
+            pool.release(self.connection, discard=self.errors_occurred)
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def ensure_connection(self):
+        if (
+            self.connection is not None
+            and self.health_check_enabled
+            and not self.health_check_done
+            and not self.in_atomic_block
+        ):
+            if not self.is_usable():
+                self.close()
+            self.health_check_done = True
+
+        super().ensure_connection()
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def warm_pool(self):
+        """
+        Fill the pool up to its minimum size and check every connection.
+        Return the number of healthy connections.
+        """
+        pool = self.pool
+        if pool is None:
+            self.ensure_connection()
+            return int(self.is_usable())
+
+        return pool.warm(partial(
+            super().get_new_connection,
+            self.get_connection_params(),
+        ))
@@ -0,0 +1,81 @@
+"""
+Work collected while a transaction is open and done once it commits
+"""
+import threading
+from collections import defaultdict
+
+from django.db import connection, transaction
+
+
+_local = threading.local()
+_batches = []
+
+
+class OnCommitBatch:
+    """
+    Keys of deferred work, e.g. ids of rows to recount, collected while
+    a transaction is open and handed to handler as {kind: set of keys}
+    once it commits. Outside transactions the handler runs right away.
+    Batches of a transaction are handled in ascending order, whatever
+    order their keys were added in.
+    """
+
+    def __init__(self, handler, order=0):
+        self.handler = handler
+        self.order = order
+        _batches.append(self)
+        _batches.sort(key=lambda batch: batch.order)
+
+    def add(self, kind, keys):
+        """Queue keys of a kind of work"""
+        keys = set(keys)
+        if not keys:
+            return
+        if not connection.in_atomic_block:
+            self.handler({kind: keys})
+            return
+
+        _pending()[self][kind].update(keys)
+
+
+def _is_registered(callback):
+    """Tell whether callback is still to run when the transaction commits"""
+    return callback is not None and any(
+        entry[1] is callback for entry in connection.run_on_commit
+    )
+
+
+def _pending():
+    """
+    Return keys queued in the current transaction, handled by a single
+    callback on commit. Keys of a rolled back transaction or savepoint
+    are dropped along with the callback Django discarded.
+    """
+    if not _is_registered(getattr(_local, 'callback', None)):
+        pending = defaultdict(lambda: defaultdict(set))
+
+        def callback():
+            if _local.callback is callback:
+                _local.callback = None
+            handled = dict(pending)
+            pending.clear()
+            for batch in _batches:
+                if batch in handled:
+                    batch.handler(handled[batch])
+
+        _local.callback = callback
+        _local.pending = pending
+        transaction.on_commit(callback)
+
+    return _local.pending
+
+
+def flush_pending():
+    """
+    Handle work queued in the current transaction right away, e.g. in
+    tests whose transactions never commit. Work of a rolled back
+    transaction is never handled.
+    """
+    callback = getattr(_local, 'callback', None)
+    if _is_registered(callback):
+        callback()
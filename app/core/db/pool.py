@@ -0,0 +1,156 @@
+"""
+In-process pools of psycopg2 connections
+"""
+import threading
+from collections import deque
+
+from psycopg2 import OperationalError
+from psycopg2.extensions import (
+    TRANSACTION_STATUS_IDLE,
+    TRANSACTION_STATUS_UNKNOWN,
+)
+
+
+POOL_KEY = ['HOST', 'PORT', 'NAME', 'USER']
+
+
+class PoolTimeout(OperationalError):
+    """Raised when no connection became available in time"""
+
+
+class ConnectionPool:
+    """
+    Thread safe pool holding at most max_size connections.
+    Idle connections are reused most recently released first, checked
+    before reuse when a check is given and rolled back when released
+    in the middle of a transaction.
+    """
+
+    def __init__(self, max_size, min_size=0, timeout=10, check=None):
+        self.max_size = max_size
+        self.min_size = min(min_size, max_size)
+        self.timeout = timeout
+        self.check = check
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self.in_use = 0
+
+    def acquire(self, connect):
+        """Return an idle connection, or one from connect if none is idle"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(
+                f'No database connection available after {self.timeout}s, '
+                f'all {self.max_size} are in use.'
+            )
+
+        try:
+            connection = self._reuse() or connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.in_use += 1
+        return connection
+
+    def _reuse(self):
+        """Pop idle connections until one passes the health check"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                connection = self._idle.pop()
+            if not connection.closed and (
+                self.check is None or self.check(connection)
+            ):
+                return connection
+            self._discard(connection)
+
+    def release(self, connection, discard=False):
+        """Give a connection back, closing it when it cannot be reused"""
+        try:
+            if not discard and not connection.closed:
+                status = connection.get_transaction_status()
+                if status == TRANSACTION_STATUS_UNKNOWN:
+                    discard = True
+                elif status != TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+
+            if discard or connection.closed:
+                self._discard(connection)
+            else:
+                with self._lock:
+                    self._idle.append(connection)
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    def warm(self, connect):
+        """
+        Open min_size connections, at least one, and check each of them.
+        Return the number of healthy connections left idle.
+        """
+        connections = []
+        healthy = 0
+        try:
+            for _ in range(max(self.min_size, 1)):
+                connections.append(self.acquire(connect))
+        finally:
+            for connection in connections:
+                usable = self.check is None or self.check(connection)
+                if usable:
+                    healthy += 1
+                self.release(connection, discard=not usable)
+
+        return healthy
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def close(self):
+        """Close all idle connections"""
+        with self._lock:
+            connections, self._idle = list(self._idle), deque()
+        for connection in connections:
+            self._discard(connection)
+
+    @staticmethod
+    def _discard(connection):
+        if not connection.closed:
+            try:
+                connection.close()
+            except OperationalError:
+                pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(settings_dict, check=None):
+    """Return the pool of connections to the database of settings_dict"""
+    key = tuple(settings_dict.get(name) for name in POOL_KEY)
+    with _pools_lock:
+        if key not in _pools:
+            options = settings_dict['POOL']
+            _pools[key] = ConnectionPool(
+                options['MAX_SIZE'],
+                min_size=options.get('MIN_SIZE', 0),
+                timeout=options.get('TIMEOUT', 10),
+                check=check,
+            )
+        return _pools[key]
+
+
+def close_pools(name=None):
+    """Close idle connections of all pools, or of those to database name"""
+    with _pools_lock:
+        pools = [
+            pool for key, pool in _pools.items()
+            if name is None or key[POOL_KEY.index('NAME')] == name
+        ]
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,216 @@
+"""
+Password hashers with tunable costs, hashing in a bounded worker pool
+"""
+import base64
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.crypto import constant_time_compare
+from django.utils.translation import gettext_noop as _
+
+
+class HashingBusy(Exception):
+    """
+    Raised when no hashing worker frees up in time, callers may retry
+    after wait seconds. The API and HashingBusyMiddleware answer it with
+    429 Too Many Requests.
+    """
+
+    def __init__(self, wait):
+        super().__init__('Too many password checks in progress.')
+        self.wait = wait
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_local = threading.local()
+
+
+def _get_pool():
+    """Return the hashing executor and the semaphore bounding its users"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = settings.PASSWORD_HASHING_WORKERS
+                _pool = (
+                    ThreadPoolExecutor(
+                        max_workers=workers,
+                        thread_name_prefix='password-hash',
+                    ),
+                    threading.BoundedSemaphore(
+                        workers + settings.PASSWORD_HASHING_QUEUE,
+                    ),
+                )
+
+    return _pool
+
+
+@receiver(setting_changed)
+def reset_pool(setting, **kwargs):
+    """Recreate the pool when its settings change in tests"""
+    global _pool
+    if setting.startswith('PASSWORD_HASHING_') and _pool is not None:
+        _pool[0].shutdown(wait=False)
+        _pool = None
+
+
+def _call_in_pool(func, args):
+    _local.in_pool = True
+    try:
+        return func(*args)
+    finally:
+        _local.in_pool = False
+
+
+def run_bounded(func, *args):
+    """
+    Run func in the hashing pool, so only PASSWORD_HASHING_WORKERS
+    hashes are computed at once and other requests keep their share of
+    the CPU. Callers wait at most PASSWORD_HASHING_TIMEOUT seconds for
+    a place in the queue, runs inline when the pool has no workers.
+    """
+    if not settings.PASSWORD_HASHING_WORKERS or getattr(
+        _local, 'in_pool', False,
+    ):
+        return func(*args)
+
+    executor, slots = _get_pool()
+    if not slots.acquire(timeout=settings.PASSWORD_HASHING_TIMEOUT):
+        raise HashingBusy(wait=settings.PASSWORD_HASHING_TIMEOUT)
+    try:
+        return executor.submit(_call_in_pool, func, args).result()
+    finally:
+        slots.release()
+
+
+class BoundedHashingMixin:
+    """Compute hashes of a hasher with run_bounded"""
+
+    def encode(self, password, salt, *args):
+        return run_bounded(super().encode, password, salt, *args)
+
+    def verify(self, password, encoded):
+        return run_bounded(super().verify, password, encoded)
+
+    def harden_runtime(self, password, encoded):
+        return run_bounded(super().harden_runtime, password, encoded)
+
+
+class BaseScryptPasswordHasher(hashers.BasePasswordHasher):
+    """
+    Memory hard hashing with scrypt from the standard library, encoded
+    like the scrypt hasher of later Django releases.
+    """
+    algorithm = 'scrypt'
+    dklen = 64
+
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT['WORK_FACTOR']
+
+    @property
+    def block_size(self):
+        return settings.PASSWORD_SCRYPT['BLOCK_SIZE']
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_SCRYPT['PARALLELISM']
+
+    def encode(self, password, salt, n=None, r=None, p=None):
+        assert password is not None
+        assert salt and '$' not in salt
+        n = n or self.work_factor
+        r = r or self.block_size
+        p = p or self.parallelism
+        hash_ = hashlib.scrypt(
+            password.encode(),
+            salt=salt.encode(),
+            n=n,
+            r=r,
+            p=p,
+            maxmem=256 * n * r * p,
+            dklen=self.dklen,
+        )
+        hash_ = base64.b64encode(hash_).decode('ascii').strip()
+        return '%s$%d$%s$%d$%d$%s' % (self.algorithm, n, salt, r, p, hash_)
+
+    def decode(self, encoded):
+        algorithm, n, salt, r, p, hash_ = encoded.split('$', 5)
+        assert algorithm == self.algorithm
+        return {
+            'algorithm': algorithm,
+            'work_factor': int(n),
+            'salt': salt,
+            'block_size': int(r),
+            'parallelism': int(p),
+            'hash': hash_,
+        }
+
+    def verify(self, password, encoded):
+        decoded = self.decode(encoded)
+        encoded_2 = self.encode(
+            password,
+            decoded['salt'],
+            decoded['work_factor'],
+            decoded['block_size'],
+            decoded['parallelism'],
+        )
+        return constant_time_compare(encoded, encoded_2)
+
+    def safe_summary(self, encoded):
+        decoded = self.decode(encoded)
+        return {
+            _('algorithm'): decoded['algorithm'],
+            _('work factor'): decoded['work_factor'],
+            _('block size'): decoded['block_size'],
+            _('parallelism'): decoded['parallelism'],
+            _('salt'): hashers.mask_hash(decoded['salt']),
+            _('hash'): hashers.mask_hash(decoded['hash']),
+        }
+
+    def must_update(self, encoded):
+        decoded = self.decode(encoded)
+        return (
+            decoded['work_factor'] != self.work_factor
+            or decoded['block_size'] != self.block_size
+            or decoded['parallelism'] != self.parallelism
+            or hashers.must_update_salt(decoded['salt'], self.salt_entropy)
+        )
+
+    def harden_runtime(self, password, encoded):
+        # Hashes with other costs are upgraded by must_update on login.
+        pass
+
+
+class ScryptPasswordHasher(BoundedHashingMixin, BaseScryptPasswordHasher):
+    """Scrypt with costs from settings"""
+
+
+class Argon2PasswordHasher(BoundedHashingMixin, hashers.Argon2PasswordHasher):
+    """Argon2 with costs from settings, needs argon2-cffi installed"""
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2['TIME_COST']
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2['MEMORY_COST']
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2['PARALLELISM']
+
+
+class PBKDF2PasswordHasher(BoundedHashingMixin, hashers.PBKDF2PasswordHasher):
+    """PBKDF2 SHA256 with iterations from settings"""
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
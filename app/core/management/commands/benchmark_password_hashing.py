@@ -0,0 +1,73 @@
+"""
+Django command to measure logins per second of password hashers
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, get_hashers
+from django.core.management.base import BaseCommand
+
+from core.hashers import run_bounded
+
+
+class Command(BaseCommand):
+    """Django command to benchmark password verification."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hasher',
+            action='append',
+            help='Algorithm of a configured hasher, can be repeated. '
+                 'Defaults to all hashers whose library is installed.',
+        )
+        parser.add_argument(
+            '--logins',
+            type=int,
+            default=20,
+            help='Number of password checks per measurement.',
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=8,
+            help='Number of concurrent logins going through the pool.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        if options['hasher']:
+            hashers = [get_hasher(name) for name in options['hasher']]
+        else:
+            hashers = get_hashers()
+
+        for hasher in hashers:
+            algorithm = hasher.algorithm
+            try:
+                encoded = hasher.encode('benchmark', hasher.salt())
+            except ValueError as error:
+                self.stdout.write(f'{algorithm}: skipped, {error}')
+                continue
+
+            def login():
+                return hasher.verify('benchmark', encoded)
+
+            per_core = self.measure(login, options['logins'], 1)
+            bounded = self.measure(
+                lambda: run_bounded(login),
+                options['logins'],
+                options['threads'],
+            )
+            self.stdout.write(
+                f'{algorithm}: {per_core:.1f} logins/s per core, '
+                f'{bounded:.1f} logins/s from {options["threads"]} threads '
+                f'with {settings.PASSWORD_HASHING_WORKERS} hashing workers'
+            )
+
+    def measure(self, login, logins, threads):
+        """Return logins per second of login called from threads"""
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as executor:
+            for _ in executor.map(lambda _: login(), range(logins)):
+                pass
+        return logins / (time.perf_counter() - start)
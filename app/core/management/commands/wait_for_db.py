@@ -1,27 +1,173 @@
 """
 Django command to wait for the database to be available
 """
+import random
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 from psycopg2 import OperationalError as Psycopg2Error
 
+from django.db import connections
+from django.db.migrations.executor import MigrationExecutor
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+
+
+class MigrationsPending(Exception):
+    """Raised while the database has unapplied migrations"""
+
+
+RETRY_ERRORS = (Psycopg2Error, OperationalError, MigrationsPending)
 
 
 class Command(BaseCommand):
     """Django command to wait for database."""
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            action='append',
+            dest='databases',
+            help='Database alias to wait for, can be repeated. '
+                 'Defaults to "default".',
+        )
+        parser.add_argument(
+            '--all-databases',
+            action='store_true',
+            help='Wait for every configured database.',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=120,
+            help='Seconds to wait before failing, 0 waits forever.',
+        )
+        parser.add_argument(
+            '--initial-delay',
+            type=float,
+            default=0.1,
+            help='Seconds before the first retry.',
+        )
+        parser.add_argument(
+            '--max-delay',
+            type=float,
+            default=5,
+            help='Upper bound of the delay between retries.',
+        )
+        parser.add_argument(
+            '--backoff',
+            type=float,
+            default=2,
+            help='Factor the delay grows by after each retry.',
+        )
+        parser.add_argument(
+            '--jitter',
+            type=float,
+            default=0.2,
+            help='Fraction of each delay that is randomized.',
+        )
+        parser.add_argument(
+            '--migrations',
+            action='store_true',
+            help='Also wait until all migrations are applied.',
+        )
+        parser.add_argument(
+            '--warm',
+            action='store_true',
+            help='Open the connection pool and check every connection.',
+        )
+
+    def delays(self, options):
+        """Yield delays growing exponentially, with random jitter"""
+        delay = options['initial_delay']
+        while True:
+            yield delay * (1 - random.uniform(0, options['jitter']))
+            delay = min(delay * options['backoff'], options['max_delay'])
+
+    def check_migrations(self, alias):
+        """Raise MigrationsPending while migrations are left to apply"""
+        executor = MigrationExecutor(connections[alias])
+        targets = executor.loader.graph.leaf_nodes()
+        if executor.migration_plan(targets):
+            raise MigrationsPending
+
+    def wait(self, alias, options):
+        """Retry checks of one database until it is ready"""
+        start = time.monotonic()
+        delays = self.delays(options)
+        attempts = 1
+        while True:
+            try:
+                self.check(databases=[alias])
+                if options['migrations']:
+                    self.check_migrations(alias)
+                break
+            except RETRY_ERRORS as exc:
+                reason = (
+                    'has unapplied migrations'
+                    if isinstance(exc, MigrationsPending) else 'unavailable'
+                )
+
+            delay = next(delays)
+            elapsed = time.monotonic() - start
+            if options['timeout'] and elapsed + delay > options['timeout']:
+                raise CommandError(
+                    f'Database {alias} {reason} after {elapsed:.1f}s '
+                    f'and {attempts} attempt(s).'
+                )
+            self.stdout.write(
+                f'Database {alias} {reason}, retry in {delay:.2f} seconds.'
+            )
+            time.sleep(delay)
+            attempts += 1
+
+        self.stdout.write(
+            f'Database {alias} ready after '
+            f'{time.monotonic() - start:.2f}s and {attempts} attempt(s).'
+        )
+
+    def wait_in_thread(self, alias, options):
+        """Wait from a worker thread, closing its connection afterwards"""
+        try:
+            self.wait(alias, options)
+        finally:
+            connections[alias].close()
+
+    def warm(self, alias):
+        """Warm the connection pool, or check the single connection"""
+        connection = connections[alias]
+        if hasattr(connection, 'warm_pool'):
+            healthy = connection.warm_pool()
+        else:
+            connection.ensure_connection()
+            healthy = int(connection.is_usable())
+
+        if not healthy:
+            raise CommandError(f'No healthy connection to database {alias}.')
+        self.stdout.write(self.style.SUCCESS(
+            f'Warmed {healthy} connection(s) to database {alias}.'
+        ))
+
     def handle(self, *args, **options):
         """Entrypoint for command"""
+        if options['all_databases']:
+            aliases = list(connections)
+        else:
+            aliases = options['databases'] or ['default']
+
         self.stdout.write('Waiting for database...')
-        db_up = False
-        while db_up is False:
-            try:
-                self.check(databases=['default'])
-                db_up = True
-            except (Psycopg2Error, OperationalError):
-                self.stdout.write('Database unavailable, retry in 1 second.')
-                time.sleep(1)
+        if len(aliases) == 1:
+            self.wait(aliases[0], options)
+        else:
+            with ThreadPoolExecutor(max_workers=len(aliases)) as executor:
+                futures = [
+                    executor.submit(self.wait_in_thread, alias, options)
+                    for alias in aliases
+                ]
+                for future in futures:
+                    future.result()
 
         self.stdout.write(self.style.SUCCESS('Database available!'))
+        if options['warm']:
+            for alias in aliases:
+                self.warm(alias)
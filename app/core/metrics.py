@@ -0,0 +1,190 @@
+"""
+In-memory request metrics rendered in the Prometheus text format
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+
+def _format_labels(labels):
+    def escape(value):
+        return (
+            str(value)
+            .replace('\\', '\\\\')
+            .replace('"', '\\"')
+            .replace('\n', '\\n')
+        )
+
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels)
+
+
+class Histogram:
+    """Histogram with fixed buckets, one series per set of label values"""
+
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        """Record a value for the series of the given label values"""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [
+                    [0] * (len(self.buckets) + 1), 0.0, 0,
+                ]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self):
+        """Yield lines of the Prometheus text format"""
+        with self._lock:
+            series = {
+                labelvalues: (list(counts), total, count)
+                for labelvalues, (counts, total, count)
+                in self._series.items()
+            }
+
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        for labelvalues, (counts, total, count) in sorted(series.items()):
+            labels = list(zip(self.labelnames, labelvalues))
+            cumulative = 0
+            for bound, bucket_count in zip(
+                self.buckets + ('+Inf',),
+                counts,
+            ):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(labels + [('le', bound)])
+                yield f'{self.name}_bucket{{{bucket_labels}}} {cumulative}'
+            yield f'{self.name}_sum{{{_format_labels(labels)}}} {total}'
+            yield f'{self.name}_count{{{_format_labels(labels)}}} {count}'
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Registry:
+    """Metrics exposed by the metrics endpoint"""
+
+    def __init__(self):
+        self.histograms = []
+        self.collectors = []
+
+    def histogram(self, name, documentation, labelnames, buckets):
+        histogram = Histogram(name, documentation, labelnames, buckets)
+        self.histograms.append(histogram)
+        return histogram
+
+    def register_collector(self, collector):
+        """Add a callable yielding lines of the Prometheus text format"""
+        self.collectors.append(collector)
+
+    def render(self):
+        """Return all metrics in the Prometheus text format"""
+        lines = []
+        for histogram in self.histograms:
+            lines.extend(histogram.collect())
+        for collector in self.collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        for histogram in self.histograms:
+            histogram.clear()
+
+
+REGISTRY = Registry()
+REQUEST_DURATION = REGISTRY.histogram(
+    'http_request_duration_seconds',
+    'Wall time of requests.',
+    ['endpoint', 'method'],
+    DURATION_BUCKETS,
+)
+REQUEST_QUERIES = REGISTRY.histogram(
+    'http_request_db_queries',
+    'Database queries executed per request.',
+    ['endpoint', 'method'],
+    QUERY_BUCKETS,
+)
+REQUEST_DB_DURATION = REGISTRY.histogram(
+    'http_request_db_duration_seconds',
+    'Time spent in database queries per request.',
+    ['endpoint', 'method'],
+    DURATION_BUCKETS,
+)
+REQUEST_SERIALIZATION_DURATION = REGISTRY.histogram(
+    'http_request_serialization_duration_seconds',
+    'Time spent serializing recipes per request.',
+    ['endpoint', 'method'],
+    DURATION_BUCKETS,
+)
+
+
+class RequestMetrics:
+    """Measurements of the request being handled"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_duration = 0.0
+        self.serialization_duration = 0.0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """Database execute wrapper counting and timing queries"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_duration += time.perf_counter() - start
+            self.queries += 1
+
+
+current_request = ContextVar('current_request', default=None)
+
+
+@contextmanager
+def recording_queries():
+    """
+    Count queries of the current thread's connections into the current
+    request, also in threads running parts of the request.
+    """
+    metrics = current_request.get()
+    with ExitStack() as stack:
+        if metrics is not None:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(metrics.execute_wrapper),
+                )
+        yield
+
+
+@contextmanager
+def time_serialization():
+    """Add the time spent in the block to the current request"""
+    metrics = current_request.get()
+    if metrics is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serialization_duration += time.perf_counter() - start
@@ -0,0 +1,196 @@
+"""
+Middleware of the core app
+"""
+import asyncio
+import logging
+import math
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+
+from rest_framework import authentication, exceptions
+from rest_framework.settings import api_settings
+
+from core import metrics
+from core.hashers import HashingBusy
+from core.profiling import RequestProfiler, prune_profiles
+
+
+logger = logging.getLogger(__name__)
+
+
+KNOWN_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+class AsyncCapableMiddleware:
+    """
+    Base of middleware running as a coroutine under ASGI, so requests to
+    async views are not funnelled through a single thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Marks instances as coroutine functions like MiddlewareMixin
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return self.handle(request)
+
+    def handle(self, request):
+        raise NotImplementedError
+
+    async def __acall__(self, request):
+        raise NotImplementedError
+
+
+class MetricsMiddleware(AsyncCapableMiddleware):
+    """
+    Record wall time, database queries and time, and serialization time
+    of every request, aggregated per URL name.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def handle(self, request):
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.current_request.set(request_metrics)
+        start = time.perf_counter()
+        try:
+            with metrics.recording_queries():
+                return self.get_response(request)
+        finally:
+            duration = time.perf_counter() - start
+            metrics.current_request.reset(token)
+            self.record(request, request_metrics, duration)
+
+    async def __acall__(self, request):
+        # Queries run in other threads, which record them with
+        # metrics.recording_queries() in the copied context.
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.current_request.set(request_metrics)
+        start = time.perf_counter()
+        try:
+            return await self.get_response(request)
+        finally:
+            duration = time.perf_counter() - start
+            metrics.current_request.reset(token)
+            self.record(request, request_metrics, duration)
+
+    def record(self, request, request_metrics, duration):
+        match = request.resolver_match
+        labels = (
+            match.view_name if match else 'unmatched',
+            request.method if request.method in KNOWN_METHODS else 'other',
+        )
+        metrics.REQUEST_DURATION.observe(duration, *labels)
+        metrics.REQUEST_QUERIES.observe(request_metrics.queries, *labels)
+        metrics.REQUEST_DB_DURATION.observe(
+            request_metrics.db_duration,
+            *labels,
+        )
+        metrics.REQUEST_SERIALIZATION_DURATION.observe(
+            request_metrics.serialization_duration,
+            *labels,
+        )
+
+
+class ProfilingMiddleware(AsyncCapableMiddleware):
+    """
+    Profile requests of staff users asking for it with the X-Profile
+    header or the _profile query parameter. Artifacts are stored under
+    PROFILING_DIR and named by the X-Profile-Id response header, only
+    the newest PROFILING_KEEP are kept.
+    Requests served by async views under ASGI are not profiled.
+    """
+    header = 'HTTP_X_PROFILE'
+    query_param = '_profile'
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    def handle(self, request):
+        if not self.wants_profile(request) or not self.is_staff(request):
+            return self.get_response(request)
+
+        profiler = RequestProfiler(settings.PROFILING_SAMPLE_INTERVAL)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(profiler.execute_wrapper),
+                )
+            response = profiler.run(self.get_response, request)
+
+        response['X-Profile-Queries'] = len(profiler.queries)
+        try:
+            response['X-Profile-Id'] = profiler.save(settings.PROFILING_DIR)
+            prune_profiles(settings.PROFILING_DIR, settings.PROFILING_KEEP)
+        except OSError:
+            logger.exception(
+                'Storing profile in %s failed', settings.PROFILING_DIR,
+            )
+        return response
+
+    def wants_profile(self, request):
+        return bool(
+            request.META.get(self.header)
+            or request.GET.get(self.query_param)
+        )
+
+    def is_staff(self, request):
+        """
+        Check the session user, or authenticate like the API would.
+        API authentication normally happens in the view, after
+        middleware, so it is only done here for profiling requests.
+        """
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user.is_staff
+
+        for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+            # Reads the session user checked above from a DRF request
+            if issubclass(authenticator, authentication.SessionAuthentication):
+                continue
+            try:
+                result = authenticator().authenticate(request)
+            except exceptions.APIException:
+                return False
+            if result is not None:
+                return result[0].is_staff
+        return False
+
+
+class HashingBusyMiddleware(MiddlewareMixin):
+    """
+    Answer requests whose password could not be hashed in time, like
+    logins to the admin, with 429 Too Many Requests instead of an error.
+    """
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, HashingBusy):
+            return None
+
+        response = HttpResponse(
+            str(exception),
+            status=429,
+            content_type='text/plain',
+        )
+        response['Retry-After'] = str(math.ceil(exception.wait))
+        return response
@@ -0,0 +1,55 @@
+# Generated by Django 3.2.25 on 2026-10-18 02:11
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Merge tags and ingredients sharing a name for the same user"""
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field_name in (
+        ('Tag', 'tags'),
+        ('Ingredient', 'ingredients'),
+    ):
+        model = apps.get_model('core', model_name)
+        through = Recipe._meta.get_field(field_name).remote_field.through
+        column = f'{model_name.lower()}_id'
+        duplicates = (
+            model.objects.values('user', 'name')
+            .annotate(count=Count('id'), keep=Min('id'))
+            .filter(count__gt=1)
+        )
+        for duplicate in duplicates:
+            extra_ids = list(
+                model.objects.filter(
+                    user=duplicate['user'],
+                    name=duplicate['name'],
+                ).exclude(id=duplicate['keep']).values_list('id', flat=True)
+            )
+            linked = set(
+                through.objects.filter(**{column: duplicate['keep']})
+                .values_list('recipe_id', flat=True)
+            )
+            moved = set(
+                through.objects.filter(**{f'{column}__in': extra_ids})
+                .values_list('recipe_id', flat=True)
+            )
+            through.objects.bulk_create([
+                through(recipe_id=recipe_id, **{column: duplicate['keep']})
+                for recipe_id in moved - linked
+            ])
+            model.objects.filter(id__in=extra_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_recipe_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_names,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 3.2.25 on 2026-10-18 02:32
+
+from django.db import migrations
+
+
+FORWARD_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm;',
+    """
+    ALTER TABLE core_recipesearchdocument
+    ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', title), 'A') ||
+        setweight(to_tsvector('simple', ingredients), 'B') ||
+        setweight(to_tsvector('simple', description), 'C')
+    ) STORED;
+    """,
+    """
+    CREATE INDEX recipe_search_vector_idx
+    ON core_recipesearchdocument USING GIN (search_vector);
+    """,
+    """
+    CREATE INDEX recipe_search_trigram_idx
+    ON core_recipesearchdocument
+    USING GIN ((title || ' ' || ingredients) gin_trgm_ops);
+    """,
+]
+
+REVERSE_SQL = [
+    'DROP INDEX recipe_search_trigram_idx;',
+    'DROP INDEX recipe_search_vector_idx;',
+    'ALTER TABLE core_recipesearchdocument DROP COLUMN search_vector;',
+]
+
+
+def _run_on_postgres(statements):
+    """Build a RunPython function running statements on PostgreSQL only"""
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recipe_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run_on_postgres(FORWARD_SQL),
+            _run_on_postgres(REVERSE_SQL),
+        ),
+    ]
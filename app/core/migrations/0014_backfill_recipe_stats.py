@@ -0,0 +1,53 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:05
+
+from django.db import migrations
+from django.db.models import Avg, Count, Max, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+BATCH_SIZE = 1000
+
+
+def backfill_recipe_stats(apps, schema_editor):
+    """Count recipes of tags and ingredients and sum them per user"""
+    Recipe = apps.get_model('core', 'Recipe')
+    RecipeStats = apps.get_model('core', 'RecipeStats')
+    for model_name, field_name in (
+        ('Tag', 'tags'),
+        ('Ingredient', 'ingredients'),
+    ):
+        model = apps.get_model('core', model_name)
+        through = Recipe._meta.get_field(field_name).remote_field.through
+        column = f'{model_name.lower()}_id'
+        links = through.objects.filter(
+            **{column: OuterRef('pk')},
+        ).order_by().values(column).annotate(
+            count=Count('*'),
+        ).values('count')
+        model.objects.update(recipe_count=Coalesce(Subquery(links), 0))
+
+    totals = Recipe.objects.order_by().values('user_id').annotate(
+        recipe_count=Count('id'),
+        average_time_minutes=Avg('time_minutes'),
+        min_price=Min('price'),
+        max_price=Max('price'),
+    )
+    RecipeStats.objects.all().delete()
+    RecipeStats.objects.bulk_create(
+        (RecipeStats(**row) for row in totals.iterator()),
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_recipe_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_recipe_stats,
+            migrations.RunPython.noop,
+        ),
+    ]
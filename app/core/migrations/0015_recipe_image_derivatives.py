@@ -0,0 +1,53 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:10
+
+import os
+
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+BATCH_SIZE = 1000
+
+# Extensions of recipe.images.DERIVATIVES when this migration was written
+DERIVATIVE_EXTENSIONS = {
+    'thumbnail': '.jpg',
+    'web': '.jpg',
+    'web_webp': '.webp',
+}
+
+
+def record_image_derivatives(apps, schema_editor):
+    """Record the derivatives already generated for recipe images"""
+    Recipe = apps.get_model('core', 'Recipe')
+    recipes = Recipe.objects.exclude(image='').exclude(image__isnull=True)
+    batch = []
+    for recipe in recipes.only('id', 'image').iterator():
+        base = os.path.splitext(recipe.image.name)[0]
+        recipe.image_derivatives = [
+            key for key, extension in DERIVATIVE_EXTENSIONS.items()
+            if default_storage.exists(f'{base}_{key}{extension}')
+        ]
+        batch.append(recipe)
+        if len(batch) >= BATCH_SIZE:
+            Recipe.objects.bulk_update(batch, ['image_derivatives'])
+            batch = []
+    Recipe.objects.bulk_update(batch, ['image_derivatives'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_backfill_recipe_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_derivatives',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(
+            record_image_derivatives,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -6,6 +6,7 @@ import os
 
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -42,6 +43,10 @@ class UserManager(BaseUserManager):
 
         return user
 
+    def bump_data_version(self, *user_ids):
+        """Record that recipes, tags or ingredients of users changed"""
+        UserDataVersion.objects.bump(*user_ids)
+
 
 class User(AbstractBaseUser, PermissionsMixin):
     """Model for user"""
@@ -49,12 +54,125 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Signed tokens carry this counter, incrementing it revokes them
+    token_version = models.PositiveIntegerField(default=0)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
 
 
+class UserDataVersionQuerySet(models.QuerySet):
+    """Queryset for data versions of users"""
+
+    def bump(self, *user_ids):
+        """Give users' data a new version"""
+        self.filter(user_id__in=user_ids).update(
+            version=uuid.uuid4(),
+            modified=timezone.now(),
+        )
+
+    def current(self, user_id):
+        """Return version and modification time of a user's data"""
+        data_version, _ = self.get_or_create(user_id=user_id)
+        return data_version.version, data_version.modified
+
+
+class UserDataVersion(models.Model):
+    """
+    Version of a user's recipes, tags and ingredients. Kept out of the
+    user row, so saving a stale user object never rolls it back.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='data_version',
+    )
+    version = models.UUIDField(default=uuid.uuid4)
+    modified = models.DateTimeField(null=True)
+
+    objects = UserDataVersionQuerySet.as_manager()
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Queryset for recipes"""
+    LIST_FIELDS = ['id', 'user', 'title', 'time_minutes', 'price', 'link']
+    ATTR_FIELDS = ['id', 'name']
+
+    def with_attrs(self):
+        """Prefetch tags and ingredients with only the serialized columns"""
+        return self.prefetch_related(
+            models.Prefetch(
+                'tags',
+                queryset=Tag.objects.only(*self.ATTR_FIELDS).order_by('id'),
+            ),
+            models.Prefetch(
+                'ingredients',
+                queryset=(
+                    Ingredient.objects.only(*self.ATTR_FIELDS).order_by('id')
+                ),
+            ),
+        )
+
+    def for_list(self):
+        """Load only the columns needed to list recipes"""
+        return self.only(*self.LIST_FIELDS).with_attrs()
+
+    def for_detail(self):
+        """Load recipe with everything needed for detail view"""
+        return self.with_attrs()
+
+    def filter_related(self, field_name, ids, match_all=False):
+        """
+        Filter recipes linked to any (or all) of the given related ids.
+        Uses EXISTS on the through table, so no join duplicates rows.
+        """
+        field = self.model._meta.get_field(field_name)
+        through = field.remote_field.through
+        related_id = f'{field.m2m_reverse_field_name()}_id'
+
+        def linked(*related_ids):
+            return models.Exists(through.objects.filter(**{
+                'recipe_id': models.OuterRef('pk'),
+                f'{related_id}__in': related_ids,
+            }))
+
+        if match_all:
+            return self.filter(*[linked(pk) for pk in set(ids)])
+        return self.filter(linked(*ids))
+
+
+class RecipeAttrQuerySet(models.QuerySet):
+    """Queryset for recipe attributes identified by name"""
+
+    def get_or_create_many(self, user, names):
+        """
+        Return objects for names in given order, creating missing ones.
+        Missing names are inserted in bulk, skipping rows created
+        concurrently by someone else, then selected again.
+        """
+        names = list(dict.fromkeys(names))
+        if not names:
+            return []
+
+        found = {
+            obj.name: obj for obj in self.filter(user=user, name__in=names)
+        }
+        missing = [name for name in names if name not in found]
+        if missing:
+            self.bulk_create(
+                [self.model(user=user, name=name) for name in missing],
+                ignore_conflicts=True,
+            )
+            found.update({
+                obj.name: obj
+                for obj in self.filter(user=user, name__in=missing)
+            })
+
+        return [found[name] for name in names]
+
+
 class Recipe(models.Model):
     """Model for recipe"""
     user = models.ForeignKey(
@@ -69,6 +187,16 @@ class Recipe(models.Model):
     tags = models.ManyToManyField('Tag')
     ingredients = models.ManyToManyField('Ingredient')
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    # Keys of derivatives generated for the image, see recipe.images
+    image_derivatives = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-id'], name='recipe_user_id_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -81,6 +209,19 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by recipe.stats, rebuild with rebuild_recipe_stats
+    recipe_count = models.PositiveIntegerField(default=0)
+
+    objects = RecipeAttrQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_tag_name_per_user',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -93,6 +234,70 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by recipe.stats, rebuild with rebuild_recipe_stats
+    recipe_count = models.PositiveIntegerField(default=0)
+
+    objects = RecipeAttrQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_ingredient_name_per_user',
+            ),
+        ]
 
     def __str__(self):
         return self.name
+
+
+class RecipeStats(models.Model):
+    """Denormalized totals of a user's recipes, kept by recipe.stats"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='recipe_stats',
+    )
+    recipe_count = models.PositiveIntegerField(default=0)
+    average_time_minutes = models.FloatField(null=True)
+    min_price = models.DecimalField(max_digits=5, decimal_places=2, null=True)
+    max_price = models.DecimalField(max_digits=5, decimal_places=2, null=True)
+
+
+class RecipeSearchDocument(models.Model):
+    """Denormalized searchable text of a recipe"""
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document',
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    title = models.TextField()
+    ingredients = models.TextField(blank=True)
+    description = models.TextField(blank=True)
+
+
+class RecipeSearchTerm(models.Model):
+    """Inverted index entry, used when full text search is unavailable"""
+    document = models.ForeignKey(
+        RecipeSearchDocument,
+        on_delete=models.CASCADE,
+        related_name='terms',
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    term = models.CharField(max_length=64)
+    weight = models.PositiveSmallIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'term'], name='search_term_user_idx'),
+        ]
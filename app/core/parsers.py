@@ -0,0 +1,35 @@
+"""
+JSON parsing using orjson when it is installed
+"""
+import io
+
+from django.conf import settings
+
+from rest_framework.parsers import JSONParser
+
+from core.renderers import orjson
+
+
+class FastJSONParser(JSONParser):
+    """
+    JSONParser decoding UTF-8 bodies with orjson. Bodies orjson rejects
+    are parsed again by the stdlib, so errors are reported as before.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get(
+            'encoding',
+            settings.DEFAULT_CHARSET,
+        )
+        if orjson is None or encoding.lower() not in ['utf-8', 'utf8']:
+            return super().parse(stream, media_type, parser_context)
+
+        content = stream.read() if stream is not None else b''
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            return super().parse(
+                io.BytesIO(content),
+                media_type,
+                parser_context,
+            )
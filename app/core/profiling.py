@@ -0,0 +1,116 @@
+"""
+Profiling of single requests for staff users
+"""
+import cProfile
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+
+class StackSampler:
+    """Sample the call stack of a thread at a fixed interval"""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[self._collapse(frame)] += 1
+
+    @staticmethod
+    def _collapse(frame):
+        """Return the stack as semicolon separated frames, root first"""
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(
+                f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})'
+                .replace(';', ':')
+            )
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def collapsed(self):
+        """Return stacks in the collapsed format read by flamegraph.pl"""
+        return ''.join(
+            f'{stack} {count}\n' for stack, count in self.stacks.items()
+        )
+
+
+class RequestProfiler:
+    """
+    Run a request under cProfile and a stack sampler while recording
+    the executed SQL, then store the artifacts in a directory.
+    """
+
+    def __init__(self, sample_interval=0.005):
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident(), sample_interval)
+        self.queries = []
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """
+        Database execute wrapper recording queries and their time.
+        Parameters are left out, they may hold passwords or tokens.
+        """
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'many': many,
+                'duration': time.perf_counter() - start,
+            })
+
+    def run(self, func, *args):
+        """Return the result of func, profiling the call"""
+        self.sampler.start()
+        self.profile.enable()
+        try:
+            return func(*args)
+        finally:
+            self.profile.disable()
+            self.sampler.stop()
+
+    def save(self, directory):
+        """Write artifacts to a new directory and return its name"""
+        profile_id = f'{time.strftime("%Y%m%d-%H%M%S")}-{uuid.uuid4().hex}'
+        path = os.path.join(directory, profile_id)
+        os.makedirs(path)
+
+        self.profile.dump_stats(os.path.join(path, 'profile.pstats'))
+        with open(os.path.join(path, 'stacks.txt'), 'w') as stacks_file:
+            stacks_file.write(self.sampler.collapsed())
+        with open(os.path.join(path, 'queries.json'), 'w') as queries_file:
+            json.dump(self.queries, queries_file, indent=2)
+
+        return profile_id
+
+
+def prune_profiles(directory, keep):
+    """Delete all but the keep newest profiles stored in directory"""
+    entries = sorted(
+        (entry for entry in os.scandir(directory) if entry.is_dir()),
+        key=lambda entry: entry.stat().st_mtime_ns,
+    )
+    for entry in entries[:max(len(entries) - keep, 0)]:
+        shutil.rmtree(entry.path, ignore_errors=True)
@@ -0,0 +1,91 @@
+"""
+JSON rendering using orjson when it is installed
+"""
+import json
+from itertools import islice
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+ORJSON_OPTIONS = (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    if orjson else 0
+)
+LINE_SEPARATORS = [
+    ('\u2028'.encode(), b'\\u2028'),
+    ('\u2029'.encode(), b'\\u2029'),
+]
+
+
+def _stdlib_dumps(data):
+    return json.dumps(
+        data,
+        cls=JSONEncoder,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(',', ':'),
+    ).encode()
+
+
+def dumps(data):
+    """
+    Encode data to compact UTF-8 JSON, byte for byte like DRF's default
+    JSONRenderer. Values orjson cannot encode natively (Decimal, lazy
+    strings, datetimes) go through DRF's encoder; data orjson rejects
+    altogether, like integers over 64 bits, is encoded by the stdlib.
+    """
+    if orjson is None:
+        content = _stdlib_dumps(data)
+    else:
+        try:
+            content = orjson.dumps(
+                data,
+                default=JSONEncoder().default,
+                option=ORJSON_OPTIONS,
+            )
+        except TypeError:
+            content = _stdlib_dumps(data)
+
+    # Same escaping as DRF, these are valid JSON but not valid JavaScript
+    for separator, escaped in LINE_SEPARATORS:
+        content = content.replace(separator, escaped)
+    return content
+
+
+def iter_encoded_list(items, chunk_size=100):
+    """
+    Yield a JSON array encoding items piece by piece.
+    Each chunk of items is encoded with a single call to the encoder.
+    """
+    items = iter(items)
+    yield b'['
+    separator = b''
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            break
+        yield separator + dumps(chunk)[1:-1]
+        separator = b','
+    yield b']'
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer encoding with orjson when the output allows it"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if (
+            data is None
+            or indent is not None
+            or self.ensure_ascii
+            or not self.compact
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return dumps(data)
@@ -0,0 +1,62 @@
+"""
+Signal handlers keeping the users' data versions current
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.db.commit import OnCommitBatch
+from core.models import Recipe, Tag, Ingredient, UserDataVersion
+
+
+@receiver(post_save, sender=get_user_model())
+def create_data_version(sender, instance, created, raw=False, **kwargs):
+    """Start the data version of a new user"""
+    if created and not raw:
+        UserDataVersion.objects.create(user=instance)
+
+
+def _bump_pending(pending):
+    recipe_ids = pending.get('linked', set()) - pending.get('saved', set())
+    if recipe_ids:
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            updated_at=timezone.now(),
+        )
+    if pending.get('users'):
+        UserDataVersion.objects.bump(*pending['users'])
+
+
+# Handled after batches of other apps, so a new data version describes
+# the counts and documents they write on commit.
+pending = OnCommitBatch(_bump_pending, order=100)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def bump_on_write(sender, instance, raw=False, **kwargs):
+    """Bump data version of the owner of a written object once committed"""
+    if raw:
+        return
+
+    pending.add('users', [instance.user_id])
+    if sender is Recipe:
+        pending.add('saved', [instance.pk])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_on_link(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Bump data version and touch recipes not saved in the transaction
+    when their tags or ingredients change, once committed.
+    """
+    if action not in ['post_add', 'post_remove', 'post_clear']:
+        return
+
+    pending.add('users', [instance.user_id])
+    pending.add('linked', (pk_set or []) if reverse else [instance.pk])
@@ -0,0 +1,113 @@
+"""
+Query budget assertions and commit hooks for tests
+"""
+import re
+from collections import Counter
+from contextlib import ContextDecorator, contextmanager
+
+from django.db import connections
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.db.commit import flush_pending
+
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDERS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_ROWS = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+
+
+def sql_shape(sql):
+    """Return SQL with literals and parameter lists replaced"""
+    shape = _STRING.sub('?', sql.replace('%s', '?'))
+    shape = _NUMBER.sub('?', shape)
+    shape = _PLACEHOLDERS.sub('(...)', shape)
+    return _ROWS.sub('(...)', shape)
+
+
+def describe_queries(queries, limit=5):
+    """Describe SQL shapes run more than once, most repeated first"""
+    shapes = Counter(sql_shape(query['sql']) for query in queries)
+    repeated = [
+        f'  {count}x {shape}'
+        for shape, count in shapes.most_common(limit) if count > 1
+    ]
+    if not repeated:
+        return 'No repeated queries.'
+    return 'Repeated queries:\n' + '\n'.join(repeated)
+
+
+class query_budget(ContextDecorator):
+    """Fail when more than max_queries queries run in the block"""
+
+    def __init__(self, max_queries, using='default'):
+        self.max_queries = max_queries
+        self.using = using
+
+    def __enter__(self):
+        self.context = CaptureQueriesContext(connections[self.using])
+        self.context.__enter__()
+        return self.context
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.context.__exit__(exc_type, exc_value, traceback)
+        if exc_type is None and len(self.context) > self.max_queries:
+            raise AssertionError(
+                f'{len(self.context)} queries exceed the budget of '
+                f'{self.max_queries}.\n'
+                + describe_queries(self.context.captured_queries)
+            )
+
+
+def assert_constant_queries(call, setup=None, sizes=(2, 10), budget=None,
+                            using='default'):
+    """
+    Fail unless call runs the same number of queries for every size,
+    within budget if given. setup(size) adds the rows of a size before
+    call(size) is measured, its queries are not counted.
+    """
+    counts = []
+    for size in sizes:
+        if setup is not None:
+            setup(size)
+        with CaptureQueriesContext(connections[using]) as context:
+            call(size)
+        counts.append(len(context))
+
+        if counts[0] != counts[-1]:
+            raise AssertionError(
+                f'Queries grow with size: {counts[0]} for {sizes[0]}, '
+                f'{counts[-1]} for {size}.\n'
+                + describe_queries(context.captured_queries)
+            )
+        if budget is not None and counts[-1] > budget:
+            raise AssertionError(
+                f'{counts[-1]} queries for {size} exceed the budget of '
+                f'{budget}.\n'
+                + describe_queries(context.captured_queries)
+            )
+
+    return counts[0]
+
+
+@contextmanager
+def committed(using='default'):
+    """
+    Run commit hooks of the block as if its writes were committed, which
+    TestCase never does, including work queued before the block.
+    """
+    with TestCase.captureOnCommitCallbacks(using=using, execute=True):
+        yield
+    flush_pending()
+
+
+class QueryBudgetMixin:
+    """Query budget assertions for test cases"""
+
+    def assertQueryBudget(self, max_queries, using='default'):
+        return query_budget(max_queries, using)
+
+    def assertConstantQueries(self, call, setup=None, sizes=(2, 10),
+                              budget=None, using='default'):
+        return assert_constant_queries(call, setup, sizes, budget, using)
@@ -1,11 +1,15 @@
+from io import StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2Error
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import SimpleTestCase
 
+from core.management.commands.wait_for_db import Command
+
 
 @patch('core.management.commands.wait_for_db.Command.check')
 class CommandTest(SimpleTestCase):
@@ -29,3 +33,92 @@ class CommandTest(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+    @patch('time.sleep')
+    def test_wait_for_db_backoff(self, patched_sleep, patched_check):
+        """test delays start below a second and grow up to the maximum"""
+        patched_check.side_effect = [OperationalError] * 5 + [True]
+
+        call_command('wait_for_db', jitter=0, max_delay=1, stdout=StringIO())
+
+        self.assertEqual(
+            [args[0] for args, kwargs in patched_sleep.call_args_list],
+            [0.1, 0.2, 0.4, 0.8, 1],
+        )
+
+    def test_delays_jitter(self, patched_check):
+        """test jitter only shortens delays by the given fraction"""
+        delays = Command().delays({
+            'initial_delay': 1,
+            'backoff': 2,
+            'max_delay': 8,
+            'jitter': 0.5,
+        })
+
+        for expected in [1, 2, 4, 8, 8]:
+            delay = next(delays)
+            self.assertGreaterEqual(delay, expected * 0.5)
+            self.assertLessEqual(delay, expected)
+
+    @patch('time.sleep')
+    def test_wait_for_db_timeout(self, patched_sleep, patched_check):
+        """test giving up once the timeout would be exceeded"""
+        patched_check.side_effect = OperationalError
+
+        with self.assertRaisesMessage(CommandError, 'unavailable'):
+            call_command(
+                'wait_for_db',
+                timeout=0.5,
+                jitter=0,
+                stdout=StringIO(),
+            )
+
+        self.assertEqual(patched_sleep.call_count, 3)
+
+    @patch('core.management.commands.wait_for_db.connections')
+    def test_wait_for_several_databases(self, patched_connections,
+                                        patched_check):
+        """test every given database is checked"""
+        call_command(
+            'wait_for_db',
+            databases=['default', 'replica'],
+            stdout=StringIO(),
+        )
+
+        patched_check.assert_any_call(databases=['default'])
+        patched_check.assert_any_call(databases=['replica'])
+
+    @patch('time.sleep')
+    @patch('core.management.commands.wait_for_db.MigrationExecutor')
+    def test_wait_for_migrations(self, patched_executor, patched_sleep,
+                                 patched_check):
+        """test waiting until no migration is left to apply"""
+        plan = patched_executor.return_value.migration_plan
+        plan.side_effect = [['0011_data_versions'], []]
+
+        call_command('wait_for_db', migrations=True, stdout=StringIO())
+
+        self.assertEqual(plan.call_count, 2)
+        self.assertEqual(patched_sleep.call_count, 1)
+
+    @patch('core.management.commands.wait_for_db.connections')
+    def test_wait_for_db_warm(self, patched_connections, patched_check):
+        """test warming the connection pool after db is ready"""
+        connection = patched_connections.__getitem__.return_value
+        connection.warm_pool.return_value = 3
+        out = StringIO()
+
+        call_command('wait_for_db', warm=True, stdout=out)
+
+        patched_connections.__getitem__.assert_called_with('default')
+        self.assertIn('Warmed 3', out.getvalue())
+
+    @patch('core.management.commands.wait_for_db.connections')
+    def test_wait_for_db_warm_unhealthy(self, patched_connections,
+                                        patched_check):
+        """test warming fails without any healthy connection"""
+        connection = patched_connections.__getitem__.return_value
+        connection.warm_pool.return_value = 0
+
+        with self.assertRaises(CommandError):
+            call_command('wait_for_db', warm=True, stdout=StringIO())
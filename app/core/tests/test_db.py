@@ -0,0 +1,250 @@
+"""
+Tests for the PostgreSQL backend, its connection pool and commit hooks
+"""
+from unittest.mock import Mock, patch
+
+from psycopg2.extensions import (
+    TRANSACTION_STATUS_IDLE,
+    TRANSACTION_STATUS_INERROR,
+    TRANSACTION_STATUS_UNKNOWN,
+)
+
+from django.db import transaction
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase, TestCase
+
+from core.db import commit
+from core.db.pool import ConnectionPool, PoolTimeout, close_pools, get_pool
+
+
+def fake_connection(status=TRANSACTION_STATUS_IDLE):
+    """Return a stand in for a psycopg2 connection"""
+    connection = Mock(closed=0)
+    connection.get_transaction_status.return_value = status
+    return connection
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test the in-process connection pool"""
+
+    def test_reuses_released_connections(self):
+        """Test a released connection is handed out again"""
+        pool = ConnectionPool(max_size=2)
+        connect = Mock(side_effect=fake_connection)
+
+        connection = pool.acquire(connect)
+        pool.release(connection)
+
+        self.assertIs(pool.acquire(connect), connection)
+        self.assertEqual(connect.call_count, 1)
+        self.assertEqual(pool.in_use, 1)
+
+    def test_waits_for_free_connection(self):
+        """Test acquiring times out when all connections are in use"""
+        pool = ConnectionPool(max_size=1, timeout=0.01)
+        connection = pool.acquire(fake_connection)
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(fake_connection)
+
+        pool.release(connection)
+        self.assertIs(pool.acquire(fake_connection), connection)
+
+    def test_failed_connect_frees_slot(self):
+        """Test a connection error does not use up the pool"""
+        pool = ConnectionPool(max_size=1, timeout=0.01)
+
+        with self.assertRaises(OSError):
+            pool.acquire(Mock(side_effect=OSError))
+
+        self.assertIsNotNone(pool.acquire(fake_connection))
+
+    def test_release_rolls_back_open_transaction(self):
+        """Test connections released in a transaction are rolled back"""
+        pool = ConnectionPool(max_size=1)
+        connection = fake_connection(TRANSACTION_STATUS_INERROR)
+
+        pool.release(pool.acquire(lambda: connection))
+
+        connection.rollback.assert_called_once()
+        self.assertEqual(pool.idle, 1)
+
+    def test_release_discards_broken_connections(self):
+        """Test broken or discarded connections are closed"""
+        pool = ConnectionPool(max_size=3)
+        broken = fake_connection(TRANSACTION_STATUS_UNKNOWN)
+        failed = fake_connection()
+
+        pool.release(pool.acquire(lambda: broken))
+        pool.release(pool.acquire(lambda: failed), discard=True)
+
+        broken.close.assert_called_once()
+        failed.close.assert_called_once()
+        self.assertEqual(pool.idle, 0)
+
+    def test_check_before_reuse(self):
+        """Test idle connections failing the check are replaced"""
+        pool = ConnectionPool(max_size=1, check=lambda connection: False)
+        stale = fake_connection()
+        pool.release(pool.acquire(lambda: stale))
+
+        fresh = pool.acquire(fake_connection)
+
+        self.assertIsNot(fresh, stale)
+        stale.close.assert_called_once()
+
+    def test_warm(self):
+        """Test warming opens and checks the minimum connections"""
+        pool = ConnectionPool(max_size=5, min_size=3, check=bool)
+
+        self.assertEqual(pool.warm(fake_connection), 3)
+        self.assertEqual(pool.idle, 3)
+        self.assertEqual(pool.in_use, 0)
+
+    def test_get_pool_per_database(self):
+        """Test pools are shared per database and closed by name"""
+        settings_dict = {'NAME': 'pool_test', 'POOL': {'MAX_SIZE': 2}}
+        pool = get_pool(settings_dict)
+        pool.release(pool.acquire(fake_connection))
+
+        self.assertIs(get_pool(dict(settings_dict)), pool)
+        self.assertIsNot(get_pool(dict(settings_dict, NAME='other')), pool)
+        close_pools('pool_test')
+        self.assertEqual(pool.idle, 0)
+
+
+class DatabaseWrapperTests(SimpleTestCase):
+    """Test health checks and pooling of the PostgreSQL backend"""
+
+    def get_connection(self, **settings):
+        handler = ConnectionHandler({'default': {
+            'ENGINE': 'core.db.backends.postgresql',
+            'NAME': 'wrapper_test',
+            **settings,
+        }})
+        return handler['default']
+
+    def test_health_check_closes_unusable_connection(self):
+        """Test a broken persistent connection is replaced"""
+        connection = self.get_connection(CONN_HEALTH_CHECKS=True)
+        broken = fake_connection()
+        connection.connection = broken
+
+        with patch.object(connection, 'is_usable', return_value=False), \
+                patch.object(connection, 'connect') as connect:
+            connection.ensure_connection()
+
+        broken.close.assert_called_once()
+        connect.assert_called_once()
+        self.assertTrue(connection.health_check_done)
+
+    def test_health_check_once_per_request(self):
+        """Test usable connections are checked once until next request"""
+        connection = self.get_connection(
+            CONN_HEALTH_CHECKS=True,
+            CONN_MAX_AGE=None,
+        )
+        connection.connection = fake_connection()
+        connection.autocommit = True
+
+        with patch.object(connection, 'is_usable') as is_usable:
+            connection.ensure_connection()
+            connection.ensure_connection()
+            self.assertEqual(is_usable.call_count, 1)
+
+            connection.close_if_unusable_or_obsolete()
+            connection.ensure_connection()
+            self.assertEqual(is_usable.call_count, 2)
+
+    def test_pooled_connection_returned_on_close(self):
+        """Test closing a pooled connection releases it to the pool"""
+        connection = self.get_connection(POOL={'MAX_SIZE': 1})
+        raw = fake_connection()
+        connection.connection = connection.pool.acquire(lambda: raw)
+
+        connection.close()
+
+        raw.close.assert_not_called()
+        self.assertEqual(connection.pool.idle, 1)
+        close_pools('wrapper_test')
+
+
+class OnCommitBatchTests(TestCase):
+    """Test work collected in a transaction is done once on commit"""
+
+    def make_batch(self, order=0):
+        handler = Mock()
+        batch = commit.OnCommitBatch(handler, order)
+        self.addCleanup(commit._batches.remove, batch)
+        return batch, handler
+
+    def test_handled_once_on_commit(self):
+        """Test keys added during a transaction are handled together"""
+        batch, handler = self.make_batch()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            batch.add('users', [1, 2])
+            with transaction.atomic():
+                batch.add('users', [2, 3])
+                batch.add('tags', [])
+                batch.add('tags', [4])
+            handler.assert_not_called()
+
+        self.assertEqual(len(callbacks), 1)
+        handler.assert_called_once_with({'users': {1, 2, 3}, 'tags': {4}})
+
+    def test_rolled_back_keys_dropped(self):
+        """Test keys added in a rolled back savepoint are not handled"""
+        batch, handler = self.make_batch()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    batch.add('users', [1])
+                    raise ValueError
+            except ValueError:
+                pass
+            batch.add('users', [2])
+
+        handler.assert_called_once_with({'users': {2}})
+
+    def test_flush_skips_rolled_back_keys(self):
+        """Test flushing never handles keys of a rolled back savepoint"""
+        batch, handler = self.make_batch()
+        try:
+            with transaction.atomic():
+                batch.add('users', [1])
+                raise ValueError
+        except ValueError:
+            pass
+
+        commit.flush_pending()
+
+        handler.assert_not_called()
+
+    def test_batches_handled_in_order(self):
+        """Test batches are handled by order, not by first key added"""
+        calls = []
+        last, _ = self.make_batch(order=10)
+        first, _ = self.make_batch(order=-10)
+        last.handler = lambda pending: calls.append('last')
+        first.handler = lambda pending: calls.append('first')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            last.add('users', [1])
+            first.add('users', [1])
+
+        self.assertEqual(calls, ['first', 'last'])
+
+
+class OnCommitBatchAutocommitTests(SimpleTestCase):
+    """Test work outside transactions is done right away"""
+
+    def test_handled_immediately(self):
+        handler = Mock()
+        batch = commit.OnCommitBatch(handler)
+        self.addCleanup(commit._batches.remove, batch)
+
+        batch.add('users', [1])
+
+        handler.assert_called_once_with({'users': {1}})
@@ -0,0 +1,77 @@
+"""
+Tests for the gunicorn configuration
+"""
+import importlib
+import os
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+from django.test import SimpleTestCase
+
+from app import gunicorn_conf
+
+
+class SizingTests(SimpleTestCase):
+    """Test workers and threads are sized from the environment"""
+
+    def test_thread_count(self):
+        """Test threads cover the time requests wait on the database"""
+        self.assertEqual(gunicorn_conf.thread_count(10, 0), 1)
+        self.assertEqual(gunicorn_conf.thread_count(10, 20), 3)
+        self.assertEqual(gunicorn_conf.thread_count(10, 25), 4)
+        self.assertEqual(gunicorn_conf.thread_count(1, 1000), 32)
+
+    def test_fit_connections(self):
+        """Test threads are reduced to fit the database connections"""
+        self.assertEqual(gunicorn_conf.fit_connections(4, 8, 0), 8)
+        self.assertEqual(gunicorn_conf.fit_connections(4, 8, 20), 5)
+        self.assertEqual(gunicorn_conf.fit_connections(4, 8, 2), 1)
+
+    def test_cpu_count(self):
+        self.assertGreaterEqual(gunicorn_conf.cpu_count(), 1)
+
+    def test_settings_from_env(self):
+        """Test environment variables override the computed settings"""
+        env = {
+            'WEB_CONCURRENCY': '3',
+            'GUNICORN_CPU_MS': '5',
+            'GUNICORN_DB_WAIT_MS': '15',
+            'GUNICORN_MAX_DB_CONNECTIONS': '9',
+            'GUNICORN_PRELOAD': '0',
+            'GUNICORN_KEEPALIVE': '10',
+        }
+        try:
+            with patch.dict(os.environ, env):
+                conf = importlib.reload(gunicorn_conf)
+                self.assertEqual(conf.workers, 3)
+                self.assertEqual(conf.threads, 3)
+                self.assertFalse(conf.preload_app)
+                self.assertEqual(conf.keepalive, 10)
+        finally:
+            importlib.reload(gunicorn_conf)
+
+
+class RecycleTests(SimpleTestCase):
+    """Test workers are recycled by memory"""
+
+    def make_worker(self):
+        return SimpleNamespace(pid=1, alive=True, log=Mock())
+
+    def test_memory_usage(self):
+        self.assertGreater(gunicorn_conf.memory_usage(), 1024 ** 2)
+
+    def test_worker_under_limit_kept(self):
+        worker = self.make_worker()
+
+        gunicorn_conf.post_request(worker, None, {}, None)
+
+        self.assertTrue(worker.alive)
+
+    @patch.object(gunicorn_conf, 'max_worker_memory', 1024)
+    def test_worker_over_limit_restarted(self):
+        worker = self.make_worker()
+
+        gunicorn_conf.post_request(worker, None, {}, None)
+
+        self.assertFalse(worker.alive)
+        worker.log.info.assert_called_once()
@@ -0,0 +1,184 @@
+"""
+Tests for password hashers
+"""
+import threading
+from contextlib import contextmanager
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import (
+    check_password,
+    identify_hasher,
+    make_password,
+)
+from django.core.management import call_command
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import hashers
+from core.hashers import HashingBusy, ScryptPasswordHasher, run_bounded
+
+
+TOKEN_URL = reverse('user:token')
+FAST_SCRYPT = {'WORK_FACTOR': 2 ** 8, 'BLOCK_SIZE': 8, 'PARALLELISM': 1}
+
+
+@contextmanager
+def full_pool():
+    """Occupy the only worker of a pool without queue"""
+    release = threading.Event()
+    with override_settings(
+        PASSWORD_HASHING_WORKERS=1,
+        PASSWORD_HASHING_QUEUE=0,
+        PASSWORD_HASHING_TIMEOUT=0.01,
+    ):
+        blocker = threading.Thread(target=run_bounded, args=(release.wait,))
+        blocker.start()
+        try:
+            while hashers._pool is None or hashers._pool[1]._value:
+                pass
+            yield
+        finally:
+            release.set()
+            blocker.join()
+
+
+@override_settings(PASSWORD_SCRYPT=FAST_SCRYPT)
+class ScryptPasswordHasherTests(SimpleTestCase):
+    """Test the scrypt hasher"""
+
+    def test_encode_and_check(self):
+        """Test passwords are hashed with scrypt and verified"""
+        encoded = make_password('secret-pass')
+
+        self.assertTrue(encoded.startswith('scrypt$256$'))
+        self.assertTrue(check_password('secret-pass', encoded))
+        self.assertFalse(check_password('wrong-pass', encoded))
+
+    def test_decode(self):
+        """Test parameters are read back from the encoded password"""
+        hasher = ScryptPasswordHasher()
+        decoded = hasher.decode(hasher.encode('secret-pass', 'salt'))
+
+        self.assertEqual(decoded['work_factor'], 256)
+        self.assertEqual(decoded['block_size'], 8)
+        self.assertEqual(decoded['parallelism'], 1)
+        self.assertEqual(decoded['salt'], 'salt')
+        self.assertIn('block size', hasher.safe_summary(
+            hasher.encode('secret-pass', 'salt'),
+        ))
+
+    def test_must_update_on_cost_change(self):
+        """Test hashes with other costs are upgraded"""
+        hasher = ScryptPasswordHasher()
+        encoded = hasher.encode('secret-pass', hasher.salt())
+
+        self.assertFalse(hasher.must_update(encoded))
+        with self.settings(PASSWORD_SCRYPT=dict(
+            FAST_SCRYPT,
+            WORK_FACTOR=2 ** 9,
+        )):
+            self.assertTrue(hasher.must_update(encoded))
+
+
+class BoundedHashingTests(SimpleTestCase):
+    """Test hashing runs in a bounded pool"""
+
+    def test_runs_in_pool(self):
+        """Test work runs in the pool, nested calls run inline"""
+        def thread_names():
+            return (
+                threading.current_thread().name,
+                run_bounded(lambda: threading.current_thread().name),
+            )
+
+        with self.settings(PASSWORD_HASHING_WORKERS=2):
+            outer, inner = run_bounded(thread_names)
+
+        self.assertTrue(outer.startswith('password-hash'))
+        self.assertEqual(inner, outer)
+
+    def test_inline_without_workers(self):
+        """Test hashing runs in the calling thread without workers"""
+        with self.settings(PASSWORD_HASHING_WORKERS=0):
+            name = run_bounded(lambda: threading.current_thread().name)
+
+        self.assertEqual(name, threading.current_thread().name)
+
+    def test_busy(self):
+        """Test callers give up when the pool and its queue are full"""
+        with full_pool():
+            with self.assertRaises(HashingBusy):
+                run_bounded(lambda: None)
+
+
+@override_settings(PASSWORD_SCRYPT=FAST_SCRYPT)
+class RehashOnLoginTests(TestCase):
+    """Test passwords are upgraded when users log in"""
+
+    def test_pbkdf2_upgraded_to_scrypt(self):
+        """Test a PBKDF2 hash is replaced on the next login"""
+        user = get_user_model().objects.create_user(
+            'user@example.com',
+            'temporary',
+        )
+        user.password = make_password('secret-pass', hasher='pbkdf2_sha256')
+        user.save()
+
+        res = APIClient().post(TOKEN_URL, {
+            'email': 'user@example.com',
+            'password': 'secret-pass',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertEqual(identify_hasher(user.password).algorithm, 'scrypt')
+        self.assertTrue(user.check_password('secret-pass'))
+
+    def test_login_busy(self):
+        """Test logins are throttled while the hashing pool is full"""
+        get_user_model().objects.create_user('user@example.com', 'pass123')
+
+        with full_pool():
+            res = APIClient().post(TOKEN_URL, {
+                'email': 'user@example.com',
+                'password': 'pass123',
+            })
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+        self.assertIn('password checks', res.data['detail'])
+
+    def test_admin_login_busy(self):
+        """Test admin logins, outside the API, are throttled too"""
+        get_user_model().objects.create_superuser(
+            'admin@example.com',
+            'pass123',
+        )
+
+        with full_pool():
+            res = Client().post(reverse('admin:login'), {
+                'username': 'admin@example.com',
+                'password': 'pass123',
+            })
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '1')
+
+    def test_benchmark_command(self):
+        """Test logins per second are reported for each hasher"""
+        out = StringIO()
+
+        call_command(
+            'benchmark_password_hashing',
+            '--hasher=scrypt',
+            '--logins=2',
+            '--threads=2',
+            stdout=out,
+        )
+
+        self.assertIn('scrypt:', out.getvalue())
+        self.assertIn('logins/s per core', out.getvalue())
@@ -0,0 +1,89 @@
+"""
+Tests for request metrics
+"""
+import re
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.metrics import REGISTRY, Histogram
+from recipe import cache
+
+
+METRICS_URL = reverse('metrics')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class HistogramTests(SimpleTestCase):
+    """Test histograms render in the Prometheus text format"""
+
+    def test_collect(self):
+        """Test buckets are cumulative and labels escaped"""
+        histogram = Histogram('latency', 'Latency.', ['path'], (0.1, 1))
+        histogram.observe(0.05, 'a"b')
+        histogram.observe(0.5, 'a"b')
+        histogram.observe(3, 'a"b')
+
+        self.assertEqual(list(histogram.collect()), [
+            '# HELP latency Latency.',
+            '# TYPE latency histogram',
+            'latency_bucket{path="a\\"b",le="0.1"} 1',
+            'latency_bucket{path="a\\"b",le="1"} 2',
+            'latency_bucket{path="a\\"b",le="+Inf"} 3',
+            'latency_sum{path="a\\"b"} 3.55',
+            'latency_count{path="a\\"b"} 3',
+        ])
+
+
+class MetricsMiddlewareTests(TestCase):
+    """Test requests are measured and exposed"""
+
+    def setUp(self):
+        REGISTRY.clear()
+        cache.stats.reset()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_metrics_per_endpoint(self):
+        """Test wall time, queries and serialization time are recorded"""
+        self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL)
+        self.client.get('/api/missing/')
+
+        res = self.client.get(METRICS_URL)
+        content = res.content.decode()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        labels = 'endpoint="recipe:recipe-list",method="GET"'
+        self.assertIn(
+            f'http_request_duration_seconds_count{{{labels}}} 2',
+            content,
+        )
+        self.assertIn(
+            f'http_request_db_queries_bucket{{{labels},le="0"}} 0',
+            content,
+        )
+        serialization = re.search(
+            rf'http_request_serialization_duration_seconds_sum'
+            rf'{{{labels}}} (\S+)',
+            content,
+        )
+        self.assertGreater(float(serialization.group(1)), 0)
+        self.assertIn('endpoint="unmatched",method="GET"', content)
+        self.assertIn('recipe_response_cache_hits_total 1', content)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.1'])
+    def test_metrics_restricted(self):
+        """Test only allowed addresses can read metrics"""
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
@@ -4,6 +4,7 @@ Tests for models.
 from unittest.mock import patch
 from decimal import Decimal
 
+from django.db import IntegrityError
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 
@@ -93,6 +94,38 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(ingredient), ingredient.name)
 
+    def test_tag_name_unique_per_user(self):
+        """Test user can not have two tags with the same name"""
+        user = create_user()
+        models.Tag.objects.create(user=user, name='Tag1')
+
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user, name='Tag1')
+
+    def test_get_or_create_many(self):
+        """Test resolving names creates only missing objects"""
+        user = create_user()
+        other_user = create_user(email='other@example.com')
+        existing = models.Ingredient.objects.create(user=user, name='Salt')
+        models.Ingredient.objects.create(user=other_user, name='Pepper')
+
+        with self.assertNumQueries(3):
+            ingredients = models.Ingredient.objects.get_or_create_many(
+                user,
+                ['Pepper', 'Salt', 'Pepper', 'Garlic'],
+            )
+
+        self.assertEqual(
+            [ingredient.name for ingredient in ingredients],
+            ['Pepper', 'Salt', 'Garlic'],
+        )
+        self.assertEqual(ingredients[1], existing)
+        self.assertTrue(all(i.user == user for i in ingredients))
+        self.assertEqual(
+            models.Ingredient.objects.filter(user=user).count(),
+            3,
+        )
+
     @patch('core.models.uuid.uuid4')
     def test_recipe_file_name_uuid(self, mock_uuid):
         """Test generating image path"""
@@ -0,0 +1,132 @@
+"""
+Tests for request profiling
+"""
+import json
+import os
+import pstats
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework import status
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class ProfilingMiddlewareTests(TestCase):
+    """Test staff users can profile requests"""
+
+    def setUp(self):
+        self.profile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.profile_dir.cleanup)
+        settings = override_settings(
+            PROFILING_ENABLED=True,
+            PROFILING_DIR=self.profile_dir.name,
+            PROFILING_SAMPLE_INTERVAL=0.001,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.client = APIClient()
+        self.staff = get_user_model().objects.create_user(
+            'staff@example.com',
+            'testpass123',
+            is_staff=True,
+        )
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+
+    def authenticate(self, user):
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_profile_staff_request(self):
+        """Test profile, stacks and SQL of the request are stored"""
+        self.authenticate(self.staff)
+
+        res = self.client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        path = os.path.join(self.profile_dir.name, res['X-Profile-Id'])
+        stats = pstats.Stats(os.path.join(path, 'profile.pstats'))
+        self.assertGreater(stats.total_calls, 0)
+        with open(os.path.join(path, 'stacks.txt')) as stacks_file:
+            for line in stacks_file:
+                self.assertRegex(line, r'^\S.* \d+$')
+        with open(os.path.join(path, 'queries.json')) as queries_file:
+            queries = json.load(queries_file)
+        self.assertEqual(len(queries), int(res['X-Profile-Queries']))
+        self.assertTrue(
+            any('core_recipe' in query['sql'] for query in queries)
+        )
+        self.assertNotIn('params', queries[0])
+
+    @override_settings(PROFILING_KEEP=2)
+    def test_old_profiles_pruned(self):
+        """Test only the newest profiles are kept"""
+        self.authenticate(self.staff)
+
+        profile_ids = [
+            self.client.get(RECIPES_URL, HTTP_X_PROFILE='1')['X-Profile-Id']
+            for _ in range(3)
+        ]
+
+        self.assertEqual(
+            sorted(os.listdir(self.profile_dir.name)),
+            sorted(profile_ids[1:]),
+        )
+
+    def test_unwritable_dir_answers(self):
+        """Test a profile that cannot be stored is logged, the request
+        is still answered"""
+        self.authenticate(self.staff)
+        path = os.path.join(self.profile_dir.name, 'file')
+        open(path, 'w').close()
+
+        with override_settings(PROFILING_DIR=path), \
+                self.assertLogs('core.middleware', 'ERROR'):
+            res = self.client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('X-Profile-Id', res)
+
+    def test_profile_query_flag(self):
+        """Test profiling is also requested with a query parameter"""
+        self.authenticate(self.staff)
+
+        res = self.client.get(RECIPES_URL, {'_profile': '1'})
+
+        self.assertIn('X-Profile-Id', res)
+
+    def test_profile_non_staff_ignored(self):
+        """Test requests of other users are not profiled"""
+        self.authenticate(self.user)
+
+        res = self.client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('X-Profile-Id', res)
+        self.assertEqual(os.listdir(self.profile_dir.name), [])
+
+    def test_profile_anonymous_ignored(self):
+        """Test requests without credentials are left to the view"""
+        res = self.client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertNotIn('X-Profile-Id', res)
+
+    def test_profile_invalid_token_ignored(self):
+        """Test an invalid token leaves the request to the view"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        res = self.client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertNotIn('X-Profile-Id', res)
@@ -0,0 +1,99 @@
+"""
+Tests for JSON renderers and parsers
+"""
+import datetime
+import io
+from decimal import Decimal
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from core import renderers
+from core.parsers import FastJSONParser
+
+
+PAYLOAD = {
+    'id': 1,
+    'title': 'Crêpes \u2028 and \u2029 "quotes"',
+    'price': Decimal('5.50'),
+    'created': datetime.datetime(
+        2022, 1, 2, 3, 4, 5, 6, tzinfo=datetime.timezone.utc,
+    ),
+    'label': gettext_lazy('Recipe'),
+    'tags': [{'id': 2, 'name': 'Vegan'}],
+    'errors': {0: ['Invalid row']},
+    'empty': None,
+}
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """Test the renderer encodes exactly like DRF's JSONRenderer"""
+
+    def assertSameAsDRF(self, data, media_type=None):
+        self.assertEqual(
+            renderers.FastJSONRenderer().render(data, media_type),
+            JSONRenderer().render(data, media_type),
+        )
+
+    def test_render_like_drf(self):
+        """Test decimals, datetimes, lazy strings and separators"""
+        self.assertSameAsDRF(PAYLOAD)
+        self.assertSameAsDRF([PAYLOAD] * 3)
+        self.assertSameAsDRF(None)
+
+    def test_render_large_integers(self):
+        """Test integers orjson cannot encode fall back to stdlib"""
+        self.assertSameAsDRF({'big': 2 ** 70})
+
+    def test_render_indent(self):
+        """Test indented output is left to DRF"""
+        self.assertSameAsDRF(PAYLOAD, 'application/json; indent=4')
+
+    def test_render_without_orjson(self):
+        """Test the stdlib is used when orjson is not installed"""
+        with patch('core.renderers.orjson', None):
+            self.assertSameAsDRF(PAYLOAD)
+
+    def test_iter_encoded_list(self):
+        """Test chunked encoding produces the same array"""
+        items = [dict(PAYLOAD, id=i) for i in range(7)]
+
+        for chunk_size in [1, 3, 10]:
+            content = b''.join(
+                renderers.iter_encoded_list(items, chunk_size=chunk_size),
+            )
+            self.assertEqual(content, renderers.dumps(items))
+        self.assertEqual(b''.join(renderers.iter_encoded_list([])), b'[]')
+
+
+class FastJSONParserTests(SimpleTestCase):
+    """Test the parser decodes like DRF's JSONParser"""
+
+    def parse(self, content):
+        return FastJSONParser().parse(
+            io.BytesIO(content),
+            parser_context={'encoding': 'utf-8'},
+        )
+
+    def test_parse(self):
+        """Test parsing a JSON document"""
+        self.assertEqual(
+            self.parse('{"name": "Crêpes", "price": "5.50"}'.encode()),
+            {'name': 'Crêpes', 'price': '5.50'},
+        )
+
+    def test_parse_error(self):
+        """Test invalid JSON raises ParseError"""
+        for content in [b'{"name":', b'NaN']:
+            with self.assertRaises(ParseError):
+                self.parse(content)
+
+    @skipIf(renderers.orjson is None, 'orjson is not installed')
+    def test_parse_large_integers(self):
+        """Test documents orjson rejects are parsed by the stdlib"""
+        self.assertEqual(self.parse(b'[18446744073709551616]'), [2 ** 64])
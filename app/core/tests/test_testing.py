@@ -0,0 +1,84 @@
+"""
+Tests for query budget assertions
+"""
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+
+from core.models import Tag
+from core.testing import QueryBudgetMixin, query_budget, sql_shape
+
+
+class SqlShapeTests(SimpleTestCase):
+    """Test SQL is reduced to its shape"""
+
+    def test_sql_shape(self):
+        """Test literals and parameter lists are replaced"""
+        self.assertEqual(
+            sql_shape(
+                "SELECT * FROM t WHERE a = 'it''s' AND b IN (%s, %s, %s) "
+                "AND c = 12 LIMIT 21"
+            ),
+            'SELECT * FROM t WHERE a = ? AND b IN (...) AND c = ? LIMIT ?',
+        )
+
+    def test_sql_shape_insert_rows(self):
+        """Test inserts of many rows share a shape"""
+        self.assertEqual(
+            sql_shape('INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)'),
+            sql_shape('INSERT INTO t (a, b) VALUES (%s, %s)'),
+        )
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test budgets fail on too many or growing queries"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+
+    def add_tags(self, count):
+        Tag.objects.bulk_create(
+            Tag(user=self.user, name=f'Tag {count} {i}')
+            for i in range(count)
+        )
+
+    def test_budget_exceeded(self):
+        """Test the message names the repeated query shape"""
+        with self.assertRaisesMessage(AssertionError, '3 queries exceed'):
+            with self.assertQueryBudget(2):
+                for i in range(3):
+                    Tag.objects.filter(name=f'Tag {i}').exists()
+
+        with self.assertRaisesMessage(AssertionError, '3x SELECT'):
+            with query_budget(2):
+                for i in range(3):
+                    Tag.objects.filter(name=f'Tag {i}').exists()
+
+    def test_budget_decorator(self):
+        """Test budgets decorate functions"""
+        @query_budget(1)
+        def count_tags():
+            return Tag.objects.count()
+
+        self.assertEqual(count_tags(), 0)
+
+    def test_constant_queries(self):
+        """Test queries independent of row count pass"""
+        count = self.assertConstantQueries(
+            lambda size: list(Tag.objects.all()),
+            setup=self.add_tags,
+            budget=1,
+        )
+
+        self.assertEqual(count, 1)
+
+    def test_growing_queries(self):
+        """Test an N+1 fails and reports the repeated query"""
+        def call(size):
+            for tag in Tag.objects.all():
+                tag.user.email
+
+        with self.assertRaisesRegex(AssertionError, r'grow[\s\S]*12x'):
+            self.assertConstantQueries(call, setup=self.add_tags)
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class RecipeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipe'
+
+    def ready(self):
+        from recipe import signals  # noqa: F401
+        from core.metrics import REGISTRY
+        from recipe.cache import collect_metrics
+
+        REGISTRY.register_collector(collect_metrics)
@@ -0,0 +1,85 @@
+"""
+Async handlers of recipe read endpoints for ASGI servers
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import URLPattern
+
+from core import metrics
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Return the worker pool running views and their queries"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.ASYNC_VIEW_WORKERS,
+                    thread_name_prefix='async-view',
+                )
+
+    return _executor
+
+
+def _run_view(view, request, args, kwargs):
+    """Run and render a sync view like a request of the WSGI handler"""
+    close_old_connections()
+    try:
+        with metrics.recording_queries():
+            response = view(request, *args, **kwargs)
+            if callable(getattr(response, 'render', None)):
+                response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_view(view):
+    """
+    Return a coroutine view running view in a worker pool of
+    ASYNC_VIEW_WORKERS threads. The event loop keeps accepting
+    connections while at most that many requests use the database,
+    each on the persistent or pooled connection of its worker.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            _get_executor(),
+            functools.partial(
+                context.run,
+                _run_view,
+                view,
+                request,
+                args,
+                kwargs,
+            ),
+        )
+
+    return wrapper
+
+
+def async_patterns(patterns, names):
+    """Return patterns with the views of routes in names made async"""
+    return [
+        URLPattern(
+            pattern.pattern,
+            async_view(pattern.callback),
+            pattern.default_args,
+            pattern.name,
+        )
+        if isinstance(pattern, URLPattern) and pattern.name in names
+        else pattern
+        for pattern in patterns
+    ]
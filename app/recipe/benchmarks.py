@@ -0,0 +1,279 @@
+"""
+Helpers for benchmark commands of the recipe API
+"""
+import itertools
+import random
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Max
+
+from rest_framework.authtoken.models import Token
+
+from core.models import Recipe, Tag, Ingredient, UserDataVersion
+
+from recipe import images, stats
+
+
+BENCHMARK_PASSWORD = 'benchmark-pass'
+DISHES = [
+    'Curry', 'Risotto', 'Lasagne', 'Pancakes', 'Salad', 'Soup', 'Stew',
+    'Tacos', 'Omelette', 'Burger', 'Pie', 'Noodles', 'Chili', 'Pizza',
+]
+STYLES = [
+    'Thai', 'Green', 'Spicy', 'Classic', 'Vegan', 'Creamy', 'Quick',
+    'Roasted', 'Smoky', 'Lemon', 'Garlic', 'Summer', 'Winter', 'Easy',
+]
+TAG_NAMES = [
+    'Dinner', 'Lunch', 'Breakfast', 'Dessert', 'Vegetarian', 'Vegan',
+    'Quick', 'Healthy', 'Comfort', 'Party', 'Spicy', 'Kids', 'Baking',
+]
+INGREDIENT_NAMES = [
+    'Salt', 'Pepper', 'Garlic', 'Onion', 'Tomato', 'Basil', 'Rice', 'Flour',
+    'Butter', 'Eggs', 'Milk', 'Chicken', 'Beef', 'Tofu', 'Lemon', 'Cheese',
+    'Carrot', 'Potato', 'Ginger', 'Chili', 'Coconut milk', 'Olive oil',
+]
+# Recipes kept per sample user for detail and update scenarios
+SAMPLE_RECIPES = 100
+
+
+class Rollback(Exception):
+    """Raised to discard the sample data"""
+
+
+@contextmanager
+def rolled_back():
+    """Run the block in a transaction that is always rolled back"""
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+def create_sample_recipes(count):
+    """Create a user owning count recipes with tags and ingredients"""
+    user = get_user_model().objects.create_user(
+        'benchmark@example.com',
+        'benchmark',
+    )
+    tags = Tag.objects.get_or_create_many(
+        user,
+        [f'Tag {i}' for i in range(10)],
+    )
+    ingredients = Ingredient.objects.get_or_create_many(
+        user,
+        [f'Ingredient {i}' for i in range(20)],
+    )
+    for i in range(count):
+        recipe = Recipe.objects.create(
+            user=user,
+            title=f'Recipe {i}',
+            time_minutes=i % 120,
+            price=Decimal(i % 10000) / 100,
+            link=f'https://example.com/{i}',
+        )
+        recipe.tags.add(*tags[i % 10:i % 10 + 3])
+        recipe.ingredients.add(*ingredients[i % 20:i % 20 + 5])
+
+    return Recipe.objects.filter(user=user).order_by('-id')
+
+
+def best_time(func, repeat):
+    """Return the fastest of repeat runs of func, in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+class SampleUser(NamedTuple):
+    """Credentials and data of a generated user used by scenarios"""
+    email: str
+    token: str
+    recipe_ids: list
+    tag_names: list
+    user_id: int = None
+
+
+def _names(words, count):
+    """Return count distinct names built from words"""
+    names = words[:count]
+    for i in range(len(words), count):
+        names.append(f'{words[i % len(words)]} {i // len(words)}')
+    return names
+
+
+def _ids_by_user(model, users):
+    """Return ids of rows owned by users, in insertion order per user"""
+    ids = defaultdict(list)
+    for user_id, pk in model.objects.filter(
+        user__in=users,
+    ).order_by('id').values_list('user_id', 'id'):
+        ids[user_id].append(pk)
+    return ids
+
+
+def _create_recipes(rng, chunk, tag_ids, ingredient_ids, batch_size):
+    """
+    Insert a recipe for each (user, index) pair of chunk, linked to
+    random tags and ingredients of its user, and return (user_id, id)
+    pairs of the inserted recipes in insertion order.
+    """
+    last_id = Recipe.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+    Recipe.objects.bulk_create([
+        Recipe(
+            user=user,
+            title=f'{rng.choice(STYLES)} {rng.choice(DISHES)}',
+            time_minutes=rng.randint(5, 240),
+            price=Decimal(rng.randint(100, 99999)) / 100,
+            description=' '.join(rng.choices(STYLES + DISHES, k=20)),
+            link=f'https://example.com/{user.pk}/{i}',
+        )
+        for user, i in chunk
+    ])
+    created = list(Recipe.objects.filter(
+        user__in={user for user, _ in chunk},
+        id__gt=last_id,
+    ).order_by('id').values_list('user_id', 'id'))
+
+    links, ingredient_links = [], []
+    for user_id, recipe_id in created:
+        user_tags = tag_ids[user_id]
+        links.extend(
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for tag_id in rng.sample(
+                user_tags,
+                min(len(user_tags), rng.randint(1, 4)),
+            )
+        )
+        user_ingredients = ingredient_ids[user_id]
+        ingredient_links.extend(
+            Recipe.ingredients.through(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+            )
+            for ingredient_id in rng.sample(
+                user_ingredients,
+                min(len(user_ingredients), rng.randint(2, 8)),
+            )
+        )
+    Recipe.tags.through.objects.bulk_create(links, batch_size=batch_size)
+    Recipe.ingredients.through.objects.bulk_create(
+        ingredient_links,
+        batch_size=batch_size,
+    )
+    return created
+
+
+def generate_dataset(users, recipes, tags=10, ingredients=30, seed=0,
+                     prefix='benchmark', batch_size=1000):
+    """
+    Bulk insert users with tokens, tags, ingredients and recipes linked
+    to random subsets of them, and return the users as SampleUser.
+    Model signals are skipped, so the search index is left empty and
+    recipe counts are computed once per batch.
+    """
+    rng = random.Random(seed)
+    password = make_password(BENCHMARK_PASSWORD)
+    users_per_batch = max(1, batch_size // max(recipes, 1))
+    tag_names = _names(TAG_NAMES, tags)
+    ingredient_names = _names(INGREDIENT_NAMES, ingredients)
+    samples = []
+
+    for start in range(0, users, users_per_batch):
+        emails = [
+            f'{prefix}-{i}@example.com'
+            for i in range(start, min(start + users_per_batch, users))
+        ]
+        get_user_model().objects.bulk_create([
+            get_user_model()(email=email, name=email, password=password)
+            for email in emails
+        ])
+        batch = list(get_user_model().objects.filter(email__in=emails))
+        UserDataVersion.objects.bulk_create([
+            UserDataVersion(user=user) for user in batch
+        ])
+        tokens = Token.objects.bulk_create([
+            Token(key=Token.generate_key(), user=user) for user in batch
+        ])
+
+        Tag.objects.bulk_create([
+            Tag(user=user, name=name)
+            for user in batch for name in tag_names
+        ], batch_size=batch_size)
+        Ingredient.objects.bulk_create([
+            Ingredient(user=user, name=name)
+            for user in batch for name in ingredient_names
+        ], batch_size=batch_size)
+        tag_ids = _ids_by_user(Tag, batch)
+        ingredient_ids = _ids_by_user(Ingredient, batch)
+        recipe_ids = defaultdict(list)
+        # Recipes of a batch are written batch_size at a time, so users
+        # with many recipes are never held in memory at once.
+        pending = ((user, i) for user in batch for i in range(recipes))
+        while True:
+            chunk = list(itertools.islice(pending, batch_size))
+            if not chunk:
+                break
+            created = _create_recipes(
+                rng,
+                chunk,
+                tag_ids,
+                ingredient_ids,
+                batch_size,
+            )
+            for user_id, recipe_id in created:
+                if len(recipe_ids[user_id]) < SAMPLE_RECIPES:
+                    recipe_ids[user_id].append(recipe_id)
+
+        for model in [Tag, Ingredient]:
+            stats.count_recipes(
+                model,
+                model.objects.filter(user__in=batch).values('pk'),
+            )
+        stats.refresh_user_stats(user.pk for user in batch)
+
+        keys = {token.user_id: token.key for token in tokens}
+        samples.extend(
+            SampleUser(
+                user.email,
+                keys[user.pk],
+                recipe_ids[user.pk],
+                tag_names,
+                user.pk,
+            )
+            for user in batch
+        )
+
+    return samples
+
+
+def delete_dataset(users, batch_size=1000):
+    """
+    Delete the users returned by generate_dataset, everything they own
+    and the image files uploaded to their recipes. Other users are left
+    alone, whatever their email.
+    """
+    user_ids = [user.user_id for user in users]
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        image_names = list(
+            Recipe.objects.filter(user__in=batch).exclude(
+                image='',
+            ).exclude(image__isnull=True).values_list('image', flat=True)
+        )
+        get_user_model().objects.filter(pk__in=batch).delete()
+        for name in image_names:
+            images.delete_derivatives(name)
+            default_storage.delete(name)
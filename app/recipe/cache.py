@@ -0,0 +1,91 @@
+"""
+Cache of rendered recipe API responses.
+
+Entries are keyed by the response ETag, which covers the user, their
+data version, the URL including scheme and host, and the media type.
+Writes bump the data version through signals, so stale entries are
+never looked up again and simply expire.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+KEY_PREFIX = 'recipe-response'
+
+
+class CacheStats:
+    """Thread safe hit and miss counters of this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        """Return counters and the ratio of lookups that hit"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else None,
+            }
+
+
+stats = CacheStats()
+
+
+def get_cache():
+    """Return the configured cache backend, None when disabled"""
+    alias = settings.RESPONSE_CACHE['ALIAS']
+    return caches[alias] if alias else None
+
+
+def make_key(etag):
+    etag = etag.strip('"')
+    return f'{KEY_PREFIX}:{etag}'
+
+
+def get_response(etag):
+    """Return cached (content, content type) of a response or None"""
+    cache = get_cache()
+    if cache is None:
+        return None
+
+    entry = cache.get(make_key(etag))
+    stats.record(entry is not None)
+    return entry
+
+
+def set_response(etag, response):
+    """Store rendered content of a response"""
+    cache = get_cache()
+    if cache is not None:
+        cache.set(
+            make_key(etag),
+            (response.content, response['Content-Type']),
+            settings.RESPONSE_CACHE['TIMEOUT'],
+        )
+
+
+def collect_metrics():
+    """Yield cache counters in the Prometheus text format"""
+    snapshot = stats.snapshot()
+    for name in ['hits', 'misses']:
+        metric = f'recipe_response_cache_{name}_total'
+        yield f'# HELP {metric} Response cache {name} of this process.'
+        yield f'# TYPE {metric} counter'
+        yield f'{metric} {snapshot[name]}'
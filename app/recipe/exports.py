@@ -0,0 +1,54 @@
+"""
+Streaming export of recipes
+"""
+from core.renderers import dumps, iter_encoded_list
+
+from recipe.serializers import RecipeDetailSerializer
+
+
+CHUNK_SIZE = 500
+
+
+def iter_recipe_chunks(queryset, chunk_size=None):
+    """
+    Yield lists of recipes newest first, one keyset query per chunk.
+    QuerySet.iterator() skips prefetch_related, so chunks are read with
+    id ranges instead, each chunk prefetching its own tags/ingredients.
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    queryset = queryset.order_by('-id')
+    last_id = None
+    while True:
+        if last_id is not None:
+            chunk = list(queryset.filter(id__lt=last_id)[:chunk_size])
+        else:
+            chunk = list(queryset[:chunk_size])
+        if not chunk:
+            return
+
+        yield chunk
+        last_id = chunk[-1].id
+
+
+def iter_recipe_data(queryset, context, chunk_size=None):
+    """Yield serialized recipes one by one"""
+    for chunk in iter_recipe_chunks(queryset, chunk_size):
+        serializer = RecipeDetailSerializer(chunk, many=True, context=context)
+        yield from serializer.data
+
+
+def render_ndjson(items):
+    """Yield one JSON document per line"""
+    for item in items:
+        yield dumps(item) + b'\n'
+
+
+def render_json(items):
+    """Yield a JSON array, encoding items in chunks"""
+    return iter_encoded_list(items)
+
+
+OUTPUTS = {
+    'ndjson': (render_ndjson, 'application/x-ndjson'),
+    'json': (render_json, 'application/json'),
+}
@@ -0,0 +1,170 @@
+"""
+Thumbnails and web optimized derivatives of recipe images
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from PIL import Image, ImageOps, features
+
+from core.models import Recipe
+
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES = {
+    'thumbnail': {
+        'size': (320, 320),
+        'format': 'JPEG',
+        'extension': '.jpg',
+        'options': {'quality': 80, 'optimize': True, 'progressive': True},
+    },
+    'web': {
+        'size': (1280, 1280),
+        'format': 'JPEG',
+        'extension': '.jpg',
+        'options': {'quality': 82, 'optimize': True, 'progressive': True},
+    },
+    'web_webp': {
+        'size': (1280, 1280),
+        'format': 'WEBP',
+        'extension': '.webp',
+        'options': {'quality': 80, 'method': 4},
+    },
+}
+
+
+def available_derivatives():
+    """Return derivatives whose format is supported by Pillow"""
+    return {
+        key: options for key, options in DERIVATIVES.items()
+        if options['format'] != 'WEBP' or features.check('webp')
+    }
+
+
+def derivative_path(name, key):
+    """Return path of a derivative, next to the original image"""
+    base = os.path.splitext(name)[0]
+    return f'{base}_{key}{DERIVATIVES[key]["extension"]}'
+
+
+def generate_derivatives(name, storage=default_storage):
+    """
+    Create every available derivative of the image stored at name.
+    Returns the keys of the derivatives created.
+    """
+    with storage.open(name) as image_file:
+        with Image.open(image_file) as original:
+            image = ImageOps.exif_transpose(original).convert('RGB')
+
+    for key, options in available_derivatives().items():
+        derivative = image.copy()
+        derivative.thumbnail(options['size'], Image.LANCZOS)
+        content = io.BytesIO()
+        derivative.save(content, options['format'], **options['options'])
+
+        path = derivative_path(name, key)
+        if storage.exists(path):
+            storage.delete(path)
+        storage.save(path, ContentFile(content.getvalue()))
+
+    return list(available_derivatives())
+
+
+def delete_derivatives(name, storage=default_storage):
+    """Delete derivatives of the image stored at name"""
+    for key in DERIVATIVES:
+        path = derivative_path(name, key)
+        if storage.exists(path):
+            storage.delete(path)
+
+
+def derivative_urls(name, keys, storage=default_storage):
+    """
+    Return URLs of the derivatives keys of the image stored at name,
+    derived from their paths without looking them up in storage.
+    """
+    return {
+        key: storage.url(derivative_path(name, key))
+        for key in keys if key in DERIVATIVES
+    }
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Return the worker pool generating derivatives"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.RECIPE_IMAGE_WORKERS,
+                    thread_name_prefix='recipe-image',
+                )
+
+    return _executor
+
+
+def _run_logged(func, name, *args):
+    """Run a derivative task, logging instead of raising errors"""
+    try:
+        func(name, *args)
+    except Exception:
+        logger.exception('Processing derivatives of %s failed', name)
+
+
+def _run_in_worker(func, name, *args):
+    """Run a task in a pool thread, which owns its DB connections"""
+    close_old_connections()
+    try:
+        _run_logged(func, name, *args)
+    finally:
+        close_old_connections()
+
+
+def _submit(func, name, *args):
+    """Run task in the worker pool, or inline when it has no workers"""
+    if settings.RECIPE_IMAGE_WORKERS:
+        _get_executor().submit(_run_in_worker, func, name, *args)
+    else:
+        _run_logged(func, name, *args)
+
+
+def _generate_for_user(name, user_id):
+    """
+    Generate derivatives and record them on the recipe, unless its image
+    was replaced meanwhile, then invalidate responses of the owner.
+    """
+    keys = generate_derivatives(name)
+    Recipe.objects.filter(image=name).update(
+        image_derivatives=keys,
+        updated_at=timezone.now(),
+    )
+    if user_id is not None:
+        get_user_model().objects.bump_data_version(user_id)
+
+
+def schedule_derivatives(name, previous_name=None, user_id=None):
+    """
+    Generate derivatives off the request thread once the upload is
+    committed, replacing those of the previous image if any. Cached and
+    conditional responses of user_id are refreshed once they exist.
+    """
+    def schedule():
+        if previous_name and previous_name != name:
+            _submit(delete_derivatives, previous_name)
+        _submit(_generate_for_user, name, user_id)
+
+    transaction.on_commit(schedule)
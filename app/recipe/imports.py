@@ -0,0 +1,125 @@
+"""
+Bulk import of recipes
+"""
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+
+from recipe import stats
+from recipe.search import index_recipes
+from recipe.serializers import RecipeImportSerializer
+
+
+BATCH_SIZE = 1000
+
+
+def _insert_recipes(recipes):
+    """Insert recipes, making sure primary keys are set afterwards"""
+    if connection.features.can_return_rows_from_bulk_insert:
+        Recipe.objects.bulk_create(recipes)
+    else:
+        for recipe in recipes:
+            recipe.save()
+
+
+def _link(through, column, recipes, names_per_recipe, objs_by_name):
+    """Insert through-table rows linking recipes to their attributes"""
+    through.objects.bulk_create([
+        through(recipe_id=recipe.id, **{column: objs_by_name[name].id})
+        for recipe, names in zip(recipes, names_per_recipe)
+        for name in dict.fromkeys(names)
+    ])
+
+
+def import_batch(rows, user, context):
+    """
+    Validate and insert one batch of rows.
+    Names of tags and ingredients are resolved once for the batch.
+    Returns the created recipes and errors keyed by row position.
+    """
+    valid = []
+    errors = {}
+    for index, row in rows:
+        serializer = RecipeImportSerializer(data=row, context=context)
+        if serializer.is_valid():
+            valid.append(serializer.validated_data)
+        else:
+            errors[index] = serializer.errors
+
+    tag_names = [
+        [tag['name'] for tag in data.pop('tags', [])] for data in valid
+    ]
+    ingredient_names = [
+        [ingredient['name'] for ingredient in data.pop('ingredients', [])]
+        for data in valid
+    ]
+    recipes = [Recipe(user=user, **data) for data in valid]
+
+    with transaction.atomic():
+        tags = Tag.objects.get_or_create_many(
+            user,
+            [name for names in tag_names for name in names],
+        )
+        ingredients = Ingredient.objects.get_or_create_many(
+            user,
+            [name for names in ingredient_names for name in names],
+        )
+        _insert_recipes(recipes)
+        _link(
+            Recipe.tags.through,
+            'tag_id',
+            recipes,
+            tag_names,
+            {tag.name: tag for tag in tags},
+        )
+        _link(
+            Recipe.ingredients.through,
+            'ingredient_id',
+            recipes,
+            ingredient_names,
+            {ingredient.name: ingredient for ingredient in ingredients},
+        )
+        # Bulk inserts send no signals, index the whole batch at once
+        index_recipes(recipe.id for recipe in recipes)
+        if recipes:
+            stats.refresh_user_stats([user.id])
+        stats.count_recipes(Tag, (tag.id for tag in tags))
+        stats.count_recipes(
+            Ingredient,
+            (ingredient.id for ingredient in ingredients),
+        )
+        if recipes or tags or ingredients:
+            get_user_model().objects.bump_data_version(user.id)
+
+    return recipes, errors
+
+
+def import_recipes(rows, user, context, batch_size=None):
+    """
+    Import an iterable of rows in batches.
+    Returns the number of created recipes and a list of row errors.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    rows = enumerate(rows)
+    created = 0
+    errors = []
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+
+        recipes, batch_errors = import_batch(batch, user, context)
+        created += len(recipes)
+        errors.extend(
+            {'row': index, 'errors': row_errors}
+            for index, row_errors in batch_errors.items()
+        )
+
+    return created, errors
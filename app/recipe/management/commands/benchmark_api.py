@@ -0,0 +1,186 @@
+"""
+Django command to load test the recipe API
+"""
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from recipe.benchmarks import delete_dataset, generate_dataset, rolled_back
+from recipe import scenarios
+
+
+class Command(BaseCommand):
+    """Django command to run load scenarios against the recipe API."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=10,
+            help='Number of generated users.',
+        )
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=100,
+            help='Number of generated recipes per user.',
+        )
+        parser.add_argument(
+            '--tags',
+            type=int,
+            default=10,
+            help='Number of generated tags per user.',
+        )
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            default=30,
+            help='Number of generated ingredients per user.',
+        )
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            choices=list(scenarios.SCENARIOS),
+            help='Scenario to run, can be repeated. Defaults to all.',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Number of measured requests per scenario.',
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=10,
+            help='Number of unmeasured requests run before each scenario.',
+        )
+        parser.add_argument(
+            '--url',
+            help='Base URL of a running server to send requests to over '
+                 'HTTP. The generated data is committed to the database '
+                 'and deleted afterwards.',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Number of threads sending requests, with --url only.',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Seed of the data generator and scenarios.',
+        )
+        parser.add_argument(
+            '--save-baseline',
+            metavar='PATH',
+            help='Write the results to a JSON baseline.',
+        )
+        parser.add_argument(
+            '--compare',
+            metavar='PATH',
+            help='Fail when results regress against a JSON baseline.',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.2,
+            help='Allowed relative slowdown before a regression is reported.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        dataset = {
+            key: options[key]
+            for key in ['users', 'recipes', 'tags', 'ingredients', 'seed']
+        }
+        baseline = options['compare'] and scenarios.load_baseline(
+            options['compare'],
+        )
+        if baseline and baseline['dataset'] != dataset:
+            self.stderr.write(
+                f'Baseline was measured on dataset {baseline["dataset"]}.'
+            )
+
+        if options['url']:
+            # The server only sees committed data, so the users generated
+            # here are deleted afterwards
+            users = self.generate(dataset)
+            try:
+                report = self.run(
+                    scenarios.HTTPClient(options['url']),
+                    users,
+                    options,
+                )
+            finally:
+                delete_dataset(users)
+        else:
+            if options['concurrency'] != 1:
+                raise CommandError('--concurrency requires --url.')
+            with tempfile.TemporaryDirectory() as media_root, \
+                    override_settings(
+                        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                        MEDIA_ROOT=media_root,
+                    ), \
+                    rolled_back():
+                report = self.run(
+                    scenarios.InProcessClient(),
+                    self.generate(dataset),
+                    options,
+                )
+
+        if options['save_baseline']:
+            scenarios.save_baseline(options['save_baseline'], report, dataset)
+        if baseline:
+            regressions = scenarios.compare(
+                report,
+                baseline,
+                options['tolerance'],
+            )
+            if regressions:
+                raise CommandError(
+                    'Regressions against baseline:\n' + '\n'.join(regressions)
+                )
+
+    def generate(self, dataset):
+        """Generate the data of the scenarios and return its users"""
+        self.stdout.write(
+            f'Generating {dataset["users"] * dataset["recipes"]} recipes...'
+        )
+        return generate_dataset(**dataset)
+
+    def run(self, client, users, options):
+        """Return results of every scenario run as users"""
+        report = {}
+        for name in options['scenario'] or scenarios.SCENARIOS:
+            scenario = scenarios.SCENARIOS[name]
+            if options['warmup']:
+                scenarios.run_scenario(
+                    scenario,
+                    client,
+                    users,
+                    options['warmup'],
+                    seed=options['seed'] - 1,
+                )
+            result = report[name] = scenarios.run_scenario(
+                scenario,
+                client,
+                users,
+                options['requests'],
+                options['concurrency'],
+                options['seed'],
+            )
+            queries = result['queries']
+            self.stdout.write(
+                f'{name:<13}{result["throughput"]:>9.1f} req/s'
+                f'  p50 {result["p50_ms"]:>8.2f} ms'
+                f'  p99 {result["p99_ms"]:>8.2f} ms'
+                f'  queries {"-" if queries is None else queries:>5}'
+                f'  errors {result["errors"]}'
+            )
+
+        return report
@@ -0,0 +1,246 @@
+"""
+Django command to compare the ASGI and WSGI applications under load
+"""
+import asyncio
+import io
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from recipe import scenarios
+from recipe.benchmarks import delete_dataset, generate_dataset
+
+
+class SlowInput(io.BytesIO):
+    """Request body arriving after a delay, like from a slow client"""
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+
+    def read(self, *args):
+        time.sleep(self.delay)
+        self.delay = 0
+        return super().read(*args)
+
+
+class WSGIClient:
+    """Send GET requests straight to a WSGI application"""
+
+    def __init__(self, application, client_delay=0):
+        self.application = application
+        self.client_delay = client_delay
+
+    def request(self, path, token=None):
+        """Return status code of a GET request"""
+        path, _, query = path.partition('?')
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1',
+            'HTTP_HOST': 'localhost',
+            'HTTP_ACCEPT': 'application/json',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': SlowInput(self.client_delay),
+            'wsgi.errors': io.StringIO(),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        if token:
+            environ['HTTP_AUTHORIZATION'] = f'Token {token}'
+        status = []
+        # Without a buffering proxy the thread waits for the client
+        environ['wsgi.input'].read()
+
+        def start_response(status_line, headers, exc_info=None):
+            status.append(int(status_line.split()[0]))
+
+        response = self.application(environ, start_response)
+        try:
+            b''.join(response)
+        finally:
+            response.close()
+        return status[0]
+
+
+@contextmanager
+def db_latency(seconds):
+    """Delay every query by seconds, in connections of all threads"""
+    def delay(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def add_delay(connection, **kwargs):
+        if delay not in connection.execute_wrappers:
+            connection.execute_wrappers.append(delay)
+
+    if not seconds:
+        yield
+        return
+
+    for connection in connections.all():
+        add_delay(connection)
+    connection_created.connect(add_delay)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(add_delay)
+        for connection in connections.all():
+            connection.execute_wrappers.remove(delay)
+
+
+class Command(BaseCommand):
+    """Django command to benchmark async views against WSGI threads."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=10,
+            help='Number of generated users.',
+        )
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=100,
+            help='Number of generated recipes per user.',
+        )
+        parser.add_argument(
+            '--endpoint',
+            choices=['list', 'detail'],
+            default='list',
+            help='Recipe endpoint to request.',
+        )
+        parser.add_argument(
+            '--connections',
+            type=int,
+            default=64,
+            help='Number of concurrently open connections.',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=512,
+            help='Number of measured requests per application.',
+        )
+        parser.add_argument(
+            '--wsgi-threads',
+            type=int,
+            default=8,
+            help='Number of threads of the simulated WSGI server.',
+        )
+        parser.add_argument(
+            '--client-delay',
+            type=float,
+            default=20,
+            help='Milliseconds clients take to send a request.',
+        )
+        parser.add_argument(
+            '--db-latency',
+            type=float,
+            default=1,
+            help='Milliseconds of network latency added to each query.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        # The ASGI application runs views in worker threads, which only
+        # see committed data, so the dataset is deleted afterwards.
+        users = generate_dataset(options['users'], options['recipes'])
+        client_delay = options['client_delay'] / 1000
+        try:
+            rng = random.Random(0)
+            requests = [
+                self.make_request(options['endpoint'], rng.choice(users), rng)
+                for _ in range(options['requests'])
+            ]
+            with db_latency(options['db_latency'] / 1000), \
+                    override_settings(
+                        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'localhost'],
+                    ):
+                results = {
+                    'wsgi': self.run_wsgi(
+                        requests,
+                        options['wsgi_threads'],
+                        client_delay,
+                    ),
+                    'asgi': asyncio.run(self.run_asgi(
+                        requests,
+                        options['connections'],
+                        client_delay,
+                    )),
+                }
+        finally:
+            delete_dataset(users)
+
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name}: {result["throughput"]:.1f} req/s'
+                f'  p50 {result["p50_ms"]:.2f} ms'
+                f'  p99 {result["p99_ms"]:.2f} ms'
+                f'  errors {result["errors"]}'
+                f'  connections served at once {result["concurrency"]}'
+            )
+
+    def make_request(self, endpoint, user, rng):
+        if endpoint == 'list':
+            return reverse('recipe:recipe-list'), user.token
+        path = reverse(
+            'recipe:recipe-detail',
+            args=[rng.choice(user.recipe_ids)],
+        )
+        return path, user.token
+
+    def run_wsgi(self, requests, threads, client_delay):
+        """Serve all requests at once from a fixed number of threads"""
+        client = WSGIClient(WSGIHandler(), client_delay)
+        start = time.perf_counter()
+
+        def timed(request):
+            status = client.request(*request)
+            return time.perf_counter() - start, status
+
+        with ThreadPoolExecutor(threads) as executor:
+            samples = [
+                (latency, None, status)
+                for latency, status in executor.map(timed, requests)
+            ]
+
+        result = scenarios.summarize(samples, time.perf_counter() - start)
+        result['concurrency'] = threads
+        return result
+
+    async def run_asgi(self, requests, connections, client_delay):
+        """Serve all requests, keeping the given connections open"""
+        from app.asgi import application
+
+        client = scenarios.ASGIClient(application, client_delay)
+        open_connections = asyncio.Semaphore(connections)
+        start = time.perf_counter()
+
+        async def timed(request):
+            async with open_connections:
+                status = await client.request(*request)
+            return time.perf_counter() - start, None, status
+
+        samples = await asyncio.gather(*[
+            timed(request) for request in requests
+        ])
+        result = scenarios.summarize(samples, time.perf_counter() - start)
+        result['concurrency'] = connections
+        return result
@@ -0,0 +1,56 @@
+"""
+Django command to compare JSON encoders on recipe list payloads
+"""
+from django.core.management.base import BaseCommand
+
+from rest_framework.renderers import JSONRenderer
+
+from core import renderers
+from recipe.benchmarks import best_time, create_sample_recipes, rolled_back
+from recipe.serializers import RecipeSerializer
+
+
+class Command(BaseCommand):
+    """Django command to benchmark JSON encoding of recipes."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=1000,
+            help='Number of sample recipes to encode.',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Number of timed runs per encoder, the best one is reported.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        with rolled_back():
+            recipes = create_sample_recipes(options['recipes'])
+            data = RecipeSerializer(recipes.for_list(), many=True).data
+
+        encoders = {
+            'stdlib': lambda: JSONRenderer().render(data),
+            'renderer': lambda: renderers.FastJSONRenderer().render(data),
+            'chunked': lambda: b''.join(renderers.iter_encoded_list(data)),
+        }
+        expected = encoders['stdlib']()
+        self.stdout.write(
+            f'Encoding {len(data)} recipes, {len(expected)} bytes, '
+            f'orjson {"installed" if renderers.orjson else "missing"}'
+        )
+        baseline = None
+        for name, encode in encoders.items():
+            if encode() != expected:
+                self.stderr.write(f'{name}: output differs from stdlib.')
+            seconds = best_time(encode, options['repeat'])
+            baseline = baseline or seconds
+            self.stdout.write(
+                f'{name}: {seconds * 1000:.2f} ms, '
+                f'{len(expected) / seconds / 2 ** 20:.0f} MB/s, '
+                f'{baseline / seconds:.1f}x'
+            )
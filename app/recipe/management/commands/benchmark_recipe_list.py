@@ -0,0 +1,57 @@
+"""
+Django command to compare recipe list serialization paths
+"""
+from django.core.management.base import BaseCommand
+
+from rest_framework.renderers import JSONRenderer
+
+from recipe.benchmarks import best_time, create_sample_recipes, rolled_back
+from recipe.serializers import RecipeSerializer, RecipeListFastSerializer
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the recipe list fast path."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=1000,
+            help='Number of sample recipes to list.',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Number of timed runs per path, the best one is reported.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        renderer = JSONRenderer()
+        with rolled_back():
+            recipes = create_sample_recipes(options['recipes'])
+
+            def serializer_path():
+                return renderer.render(
+                    RecipeSerializer(recipes.for_list(), many=True).data,
+                )
+
+            def fast_path():
+                return renderer.render(RecipeListFastSerializer(
+                    list(recipes.values(
+                        *RecipeListFastSerializer.value_fields,
+                    )),
+                ).data)
+
+            if serializer_path() != fast_path():
+                self.stderr.write('Outputs of both paths differ.')
+            slow = best_time(serializer_path, options['repeat'])
+            fast = best_time(fast_path, options['repeat'])
+
+        self.stdout.write(
+            f'{options["recipes"]} recipes: '
+            f'serializer {slow * 1000:.1f} ms, '
+            f'fast path {fast * 1000:.1f} ms, '
+            f'{slow / fast:.1f}x faster'
+        )
@@ -0,0 +1,61 @@
+"""
+Django command to rebuild recipe counts and per user recipe totals
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Tag, Ingredient
+
+from recipe import stats
+
+
+class Command(BaseCommand):
+    """Django command to recompute denormalized recipe statistics."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows updated per transaction.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        batch_size = options['batch_size']
+        for model in [Tag, Ingredient]:
+            counted = self.in_batches(
+                model,
+                lambda ids: stats.count_recipes(model, ids),
+                batch_size,
+            )
+            self.stdout.write(
+                f'Counted recipes of {counted} '
+                f'{model._meta.verbose_name_plural}.'
+            )
+
+        refreshed = self.in_batches(
+            get_user_model(),
+            stats.refresh_user_stats,
+            batch_size,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt recipe stats of {refreshed} users.'
+        ))
+
+    def in_batches(self, model, update, batch_size):
+        """Call update with ids of all rows of model, batch by batch"""
+        ids = model.objects.order_by('id').values_list('id', flat=True)
+        last_id = 0
+        total = 0
+        while True:
+            batch = list(ids.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                update(batch)
+            total += len(batch)
+            last_id = batch[-1]
+
+        return total
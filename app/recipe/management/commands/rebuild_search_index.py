@@ -0,0 +1,38 @@
+"""
+Django command to rebuild the recipe search index
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Recipe
+
+from recipe.search import index_recipes
+
+
+class Command(BaseCommand):
+    """Django command to rebuild search documents of all recipes."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of recipes indexed per transaction.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        batch_size = options['batch_size']
+        ids = Recipe.objects.order_by('id').values_list('id', flat=True)
+        last_id = 0
+        indexed = 0
+        while True:
+            batch = list(ids.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                index_recipes(batch)
+            indexed += len(batch)
+            last_id = batch[-1]
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} recipes.'))
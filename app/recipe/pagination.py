@@ -0,0 +1,17 @@
+"""
+Pagination for the Recipe APIs
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Keyset pagination for recipes, newest first"""
+    ordering = '-id'
+    page_size = 25
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class RecipeAttrCursorPagination(RecipeCursorPagination):
+    """Keyset pagination for recipe attributes, ordered by name"""
+    ordering = ['-name', 'id']
@@ -0,0 +1,87 @@
+"""
+Parsers for recipe import payloads and image uploads
+"""
+import codecs
+import csv
+import json
+
+from django.conf import settings
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, MultiPartParser
+
+from recipe.uploads import BoundedImageUploadHandler
+
+
+CSV_LIST_SEPARATOR = '|'
+CSV_LIST_FIELDS = ['tags', 'ingredients']
+
+
+def _text_lines(stream, encoding):
+    """Decode a binary stream line by line"""
+    return codecs.getreader(encoding or settings.DEFAULT_CHARSET)(stream)
+
+
+def iter_ndjson_rows(stream, encoding=None):
+    """
+    Yield one decoded document per non blank line.
+    Lines that are not valid JSON are yielded as text, so they are
+    reported as invalid rows instead of aborting the whole import.
+    """
+    for line in _text_lines(stream, encoding):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield line
+
+
+def iter_csv_rows(stream, encoding=None):
+    """
+    Yield one dict per CSV row.
+    Tags and ingredients columns hold names separated by '|'.
+    """
+    for row in csv.DictReader(_text_lines(stream, encoding)):
+        for field in CSV_LIST_FIELDS:
+            names = row.pop(field, None) or ''
+            row[field] = [
+                {'name': name.strip()}
+                for name in names.split(CSV_LIST_SEPARATOR)
+                if name.strip()
+            ]
+        yield row
+
+
+class NDJSONParser(BaseParser):
+    """Parse newline delimited JSON into a list of documents"""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding')
+        try:
+            return list(iter_ndjson_rows(stream, encoding))
+        except UnicodeDecodeError as exc:
+            raise ParseError(f'NDJSON parse error - {exc}')
+
+
+class CSVParser(BaseParser):
+    """Parse CSV with a header row into a list of dicts"""
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding')
+        try:
+            return list(iter_csv_rows(stream, encoding))
+        except (UnicodeDecodeError, csv.Error) as exc:
+            raise ParseError(f'CSV parse error - {exc}')
+
+
+class ImageUploadParser(MultiPartParser):
+    """Multipart parser streaming files through the bounded image handler"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = parser_context['request']
+        request.upload_handlers = [BoundedImageUploadHandler(request)]
+        return super().parse(stream, media_type, parser_context)
@@ -0,0 +1,328 @@
+"""
+Load scenarios for the recipe API, run in process or over HTTP
+"""
+import asyncio
+import io
+import json
+import math
+import random
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from PIL import Image
+
+from rest_framework.test import APIClient
+
+from recipe.benchmarks import BENCHMARK_PASSWORD, DISHES, INGREDIENT_NAMES
+
+
+class InProcessClient:
+    """Send requests through the Django test client, counting queries"""
+
+    def __init__(self):
+        self.client = APIClient()
+
+    def request(self, method, path, token=None, data=None, multipart=False):
+        """Return status code and number of queries of a request"""
+        extra = {'HTTP_AUTHORIZATION': f'Token {token}'} if token else {}
+        send = getattr(self.client, method.lower())
+        with CaptureQueriesContext(connection) as queries:
+            if method == 'GET':
+                response = send(path, data, **extra)
+            else:
+                response = send(
+                    path,
+                    data,
+                    format='multipart' if multipart else 'json',
+                    **extra,
+                )
+        return response.status_code, len(queries)
+
+
+class HTTPClient:
+    """Send requests to a running server, queries are not counted"""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, path, token=None, data=None, multipart=False):
+        """Return status code of a request and None for the queries"""
+        headers = {'Accept': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Token {token}'
+        body = None
+        if multipart:
+            body = encode_multipart(BOUNDARY, data)
+            headers['Content-Type'] = MULTIPART_CONTENT
+        elif data is not None:
+            body = json.dumps(data).encode()
+            headers['Content-Type'] = 'application/json'
+
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=body,
+            headers=headers,
+            method=method,
+        )
+        try:
+            with urllib.request.urlopen(
+                request,
+                timeout=self.timeout,
+            ) as response:
+                response.read()
+                return response.status, None
+        except urllib.error.HTTPError as error:
+            error.read()
+            return error.code, None
+
+
+class ASGIClient:
+    """Send GET requests straight to an ASGI application"""
+
+    def __init__(self, application, client_delay=0):
+        self.application = application
+        self.client_delay = client_delay
+
+    async def request(self, path, token=None):
+        """Return status code of a GET request"""
+        headers = [(b'host', b'localhost'), (b'accept', b'application/json')]
+        if token:
+            headers.append((b'authorization', f'Token {token}'.encode()))
+        path, _, query = path.partition('?')
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': headers,
+            'client': ('127.0.0.1', 50000),
+            'server': ('localhost', 80),
+        }
+        response = {}
+
+        async def receive():
+            # The request body arrives after the client delay
+            await asyncio.sleep(self.client_delay)
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+
+        await self.application(scope, receive, send)
+        return response['status']
+
+
+@lru_cache(maxsize=None)
+def sample_image():
+    """Return the bytes of a JPEG photo sized image"""
+    content = io.BytesIO()
+    Image.effect_mandelbrot(
+        (1200, 800),
+        (-2, -1.2, 1, 1.2),
+        100,
+    ).convert('RGB').save(
+        content,
+        'JPEG',
+        quality=85,
+    )
+    return content.getvalue()
+
+
+def _recipe_payload(user, rng):
+    return {
+        'title': f'{rng.choice(DISHES)} {rng.randrange(10000)}',
+        'time_minutes': rng.randint(5, 240),
+        'price': f'{rng.randint(100, 99999) / 100:.2f}',
+        'tags': [
+            {'name': rng.choice(user.tag_names)},
+            {'name': f'New tag {rng.randrange(10000)}'},
+        ],
+        'ingredients': [
+            {'name': name} for name in rng.sample(INGREDIENT_NAMES, 3)
+        ],
+    }
+
+
+def list_recipes(client, user, rng):
+    return client.request('GET', reverse('recipe:recipe-list'), user.token)
+
+
+def recipe_detail(client, user, rng):
+    return client.request(
+        'GET',
+        reverse('recipe:recipe-detail', args=[rng.choice(user.recipe_ids)]),
+        user.token,
+    )
+
+
+def create_recipe(client, user, rng):
+    return client.request(
+        'POST',
+        reverse('recipe:recipe-list'),
+        user.token,
+        _recipe_payload(user, rng),
+    )
+
+
+def update_recipe(client, user, rng):
+    return client.request(
+        'PATCH',
+        reverse('recipe:recipe-detail', args=[rng.choice(user.recipe_ids)]),
+        user.token,
+        {
+            'title': f'{rng.choice(DISHES)} {rng.randrange(10000)}',
+            'tags': [{'name': rng.choice(user.tag_names)}],
+        },
+    )
+
+
+def upload_image(client, user, rng):
+    return client.request(
+        'POST',
+        reverse(
+            'recipe:recipe-upload-image',
+            args=[rng.choice(user.recipe_ids)],
+        ),
+        user.token,
+        {'image': SimpleUploadedFile(
+            'recipe.jpg',
+            sample_image(),
+            content_type='image/jpeg',
+        )},
+        multipart=True,
+    )
+
+
+def obtain_token(client, user, rng):
+    return client.request(
+        'POST',
+        reverse('user:token'),
+        data={'email': user.email, 'password': BENCHMARK_PASSWORD},
+    )
+
+
+SCENARIOS = {
+    'list': list_recipes,
+    'detail': recipe_detail,
+    'create': create_recipe,
+    'update': update_recipe,
+    'upload_image': upload_image,
+    'token': obtain_token,
+}
+
+
+def percentile(values, percent):
+    """Return the nearest rank percentile of sorted values"""
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+def summarize(samples, elapsed):
+    """Return throughput, latency and query statistics of samples"""
+    latencies = sorted(latency for latency, _, _ in samples)
+    queries = [count for _, count, _ in samples if count is not None]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, _, status in samples if status >= 400),
+        'throughput': round(len(samples) / elapsed, 1),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'queries': (
+            round(sum(queries) / len(queries), 1) if queries else None
+        ),
+    }
+
+
+def run_scenario(scenario, client, users, requests, concurrency=1, seed=0):
+    """
+    Send requests of scenario as random users from concurrency threads
+    and return their statistics.
+    """
+    def worker(index):
+        rng = random.Random(seed + index)
+        samples = []
+        for _ in range(index, requests, concurrency):
+            user = users[rng.randrange(len(users))]
+            start = time.perf_counter()
+            status, queries = scenario(client, user, rng)
+            samples.append((time.perf_counter() - start, queries, status))
+        return samples
+
+    start = time.perf_counter()
+    if concurrency == 1:
+        samples = worker(0)
+    else:
+        with ThreadPoolExecutor(concurrency) as executor:
+            samples = [
+                sample
+                for batch in executor.map(worker, range(concurrency))
+                for sample in batch
+            ]
+    return summarize(samples, time.perf_counter() - start)
+
+
+def save_baseline(path, report, dataset):
+    """Write a report and the dataset it was measured on as JSON"""
+    with open(path, 'w') as baseline_file:
+        json.dump(
+            {'dataset': dataset, 'scenarios': report},
+            baseline_file,
+            indent=2,
+            sort_keys=True,
+        )
+
+
+def load_baseline(path):
+    with open(path) as baseline_file:
+        return json.load(baseline_file)
+
+
+def compare(report, baseline, tolerance=0.2):
+    """Return messages describing regressions of report against baseline"""
+    regressions = []
+    for name, result in report.items():
+        previous = baseline['scenarios'].get(name)
+        if previous is None:
+            continue
+
+        for key in ['p50_ms', 'p99_ms']:
+            if result[key] > previous[key] * (1 + tolerance):
+                regressions.append(
+                    f'{name}: {key} {result[key]} > {previous[key]}'
+                )
+        if result['throughput'] < previous['throughput'] * (1 - tolerance):
+            regressions.append(
+                f'{name}: throughput {result["throughput"]} '
+                f'< {previous["throughput"]}'
+            )
+        if (
+            result['queries'] is not None
+            and previous['queries'] is not None
+            and result['queries'] > previous['queries']
+        ):
+            regressions.append(
+                f'{name}: queries {result["queries"]} '
+                f'> {previous["queries"]}'
+            )
+        if result['errors'] > previous['errors']:
+            regressions.append(
+                f'{name}: errors {result["errors"]} > {previous["errors"]}'
+            )
+
+    return regressions
@@ -0,0 +1,215 @@
+"""
+Full text search of recipes.
+
+Every recipe has a denormalized RecipeSearchDocument. On PostgreSQL the
+document carries a weighted tsvector column with a GIN index plus a
+trigram index for typo tolerance. Other backends use an inverted index
+of RecipeSearchTerm rows built in Python.
+"""
+import difflib
+import re
+from collections import defaultdict
+
+from django.db import connection
+
+from core.db.commit import OnCommitBatch
+from core.models import (
+    Recipe,
+    RecipeSearchDocument,
+    RecipeSearchTerm,
+)
+
+
+TOKEN_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 8
+WEIGHTS = {
+    'title': 3,
+    'ingredients': 2,
+    'description': 1,
+}
+# Fields of recipes their search document is built from, besides
+# the names of their ingredients
+DOCUMENT_FIELDS = {'user', 'title', 'description'}
+FUZZY_MIN_LENGTH = 4
+FUZZY_CUTOFF = 0.75
+
+
+def tokenize(text):
+    """Split text into lower case terms"""
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall(text.lower())
+    ]
+
+
+def build_document(recipe):
+    """Build the search document of a recipe with ingredients loaded"""
+    return RecipeSearchDocument(
+        recipe=recipe,
+        user_id=recipe.user_id,
+        title=recipe.title,
+        ingredients=' '.join(
+            ingredient.name for ingredient in recipe.ingredients.all()
+        ),
+        description=recipe.description,
+    )
+
+
+def build_terms(document):
+    """Build inverted index rows, keeping the best weight per term"""
+    weights = {}
+    for field, weight in WEIGHTS.items():
+        for term in tokenize(getattr(document, field)):
+            weights[term] = max(weights.get(term, 0), weight)
+
+    return [
+        RecipeSearchTerm(
+            document=document,
+            user_id=document.user_id,
+            term=term,
+            weight=weight,
+        )
+        for term, weight in weights.items()
+    ]
+
+
+def uses_full_text():
+    """Whether the database has the full text search columns"""
+    return connection.vendor == 'postgresql'
+
+
+def index_recipes(recipe_ids):
+    """(Re)build search documents of the given recipes"""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+
+    recipes = Recipe.objects.filter(id__in=recipe_ids).prefetch_related(
+        'ingredients',
+    )
+    documents = [build_document(recipe) for recipe in recipes]
+    RecipeSearchDocument.objects.filter(recipe_id__in=recipe_ids).delete()
+    RecipeSearchDocument.objects.bulk_create(documents)
+    if not uses_full_text():
+        RecipeSearchTerm.objects.bulk_create([
+            term for document in documents for term in build_terms(document)
+        ])
+
+
+def _index_pending(pending):
+    index_recipes(pending['recipes'])
+
+
+pending = OnCommitBatch(_index_pending)
+
+
+def index_on_commit(recipe_ids):
+    """Rebuild search documents of recipes once, after the commit"""
+    pending.add('recipes', recipe_ids)
+
+
+def _full_text_search(user, terms, limit):
+    """Rank documents with PostgreSQL full text search"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT recipe_id
+            FROM core_recipesearchdocument,
+                 to_tsquery('simple', %s) query
+            WHERE user_id = %s AND search_vector @@ query
+            ORDER BY ts_rank(search_vector, query) DESC, recipe_id DESC
+            LIMIT %s
+            """,
+            [' & '.join(f'{term}:*' for term in terms), user.id, limit],
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            text = ' '.join(terms)
+            cursor.execute(
+                """
+                SELECT recipe_id
+                FROM core_recipesearchdocument
+                WHERE user_id = %s
+                  AND %s <%% (title || ' ' || ingredients)
+                ORDER BY word_similarity(%s, title || ' ' || ingredients)
+                         DESC, recipe_id DESC
+                LIMIT %s
+                """,
+                [user.id, text, text, limit],
+            )
+            rows = cursor.fetchall()
+
+    return [recipe_id for recipe_id, in rows]
+
+
+def _matching_terms(user, term):
+    """
+    Return index terms matching a query term with a score factor.
+    Exact matches count fully, prefixes and close spellings count half.
+    """
+    terms = RecipeSearchTerm.objects.filter(user=user)
+    matches = {
+        match: (1.0 if match == term else 0.5)
+        for match in terms.filter(
+            term__gte=term,
+            term__lt=term + '\uffff',
+        ).values_list('term', flat=True).distinct()
+    }
+    if not matches and len(term) >= FUZZY_MIN_LENGTH:
+        vocabulary = terms.filter(
+            term__gte=term[0],
+            term__lt=term[0] + '\uffff',
+        ).values_list('term', flat=True).distinct()
+        matches = {
+            match: 0.5
+            for match in difflib.get_close_matches(
+                term,
+                vocabulary,
+                n=3,
+                cutoff=FUZZY_CUTOFF,
+            )
+        }
+
+    return matches
+
+
+def _inverted_index_search(user, terms, limit):
+    """Rank documents containing every term using the inverted index"""
+    scores = None
+    for term in terms:
+        matches = _matching_terms(user, term)
+        term_scores = defaultdict(float)
+        for document_id, match, weight in RecipeSearchTerm.objects.filter(
+            user=user,
+            term__in=matches,
+        ).values_list('document_id', 'term', 'weight'):
+            term_scores[document_id] = max(
+                term_scores[document_id],
+                weight * matches[match],
+            )
+
+        if scores is None:
+            scores = term_scores
+        else:
+            scores = {
+                document_id: score + term_scores[document_id]
+                for document_id, score in scores.items()
+                if document_id in term_scores
+            }
+        if not scores:
+            return []
+
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+    return [document_id for document_id, score in ranked[:limit]]
+
+
+def search_recipes(user, query, limit):
+    """Return ids of the user's recipes matching query, best first"""
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return []
+
+    if uses_full_text():
+        return _full_text_search(user, terms, limit)
+    return _inverted_index_search(user, terms, limit)
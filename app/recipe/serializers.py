@@ -1,30 +1,66 @@
 """
 Serializer for the user API View
 """
+from django.db import transaction
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
-from core.models import Recipe, Tag, Ingredient
+from core.metrics import time_serialization
+from core.models import Recipe, RecipeStats, Tag, Ingredient
+
+from recipe.images import derivative_urls
 
 
 class TagSerializer(serializers.ModelSerializer):
     """Serializer for tag object"""
     class Meta:
         model = Tag
-        fields = ['id', 'name']
-        read_only_fields = ['id']
+        fields = ['id', 'name', 'recipe_count']
+        read_only_fields = ['id', 'recipe_count']
 
 
 class IngredientSerializer(serializers.ModelSerializer):
     """Serializer for ingredient object"""
     class Meta:
         model = Ingredient
+        fields = ['id', 'name', 'recipe_count']
+        read_only_fields = ['id', 'recipe_count']
+
+
+class RecipeTagSerializer(TagSerializer):
+    """Serializer for tags nested in recipes"""
+    class Meta(TagSerializer.Meta):
         fields = ['id', 'name']
-        read_only_fields = ['id']
+
+
+class RecipeIngredientSerializer(IngredientSerializer):
+    """Serializer for ingredients nested in recipes"""
+    class Meta(IngredientSerializer.Meta):
+        fields = ['id', 'name']
+
+
+class RecipeStatsSerializer(serializers.ModelSerializer):
+    """Serializer for recipe totals of a user"""
+    class Meta:
+        model = RecipeStats
+        fields = ['recipe_count', 'average_time_minutes', 'min_price',
+                  'max_price']
+        read_only_fields = fields
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    """List serializer recording serialization time of the request"""
+
+    @property
+    def data(self):
+        with time_serialization():
+            return super().data
 
 
 class RecipeSerializer(serializers.ModelSerializer):
     """Serializer for recipe object"""
-    tags = TagSerializer(many=True, required=False)
-    ingredients = IngredientSerializer(many=True, required=False)
+    tags = RecipeTagSerializer(many=True, required=False)
+    ingredients = RecipeIngredientSerializer(many=True, required=False)
 
     class Meta:
         model = Recipe
@@ -33,64 +69,166 @@ class RecipeSerializer(serializers.ModelSerializer):
             'price', 'link', 'tags', 'ingredients'
         ]
         read_only_fields = ['id']
+        list_serializer_class = TimedListSerializer
+
+    @property
+    def data(self):
+        with time_serialization():
+            return super().data
 
-    def _get_or_create_tags(self, tags, recipe):
+    def _get_or_create_tags(self, tags):
         """
         Handle getting or creating tags as needed.
         """
         auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
-            )
-            recipe.tags.add(tag_obj)
+        return Tag.objects.get_or_create_many(
+            auth_user,
+            [tag['name'] for tag in tags],
+        )
 
-    def _get_or_create_ingredients(self, ingredients, recipe):
+    def _get_or_create_ingredients(self, ingredients):
         """
         Handle getting or creating ingredients as needed.
         """
         auth_user = self.context['request'].user
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient,
-            )
-            recipe.ingredients.add(ingredient_obj)
+        return Ingredient.objects.get_or_create_many(
+            auth_user,
+            [ingredient['name'] for ingredient in ingredients],
+        )
 
+    def _set_related(self, related, objs):
+        """
+        Update a related set by only removing and adding the difference.
+        """
+        current = set(related.values_list('id', flat=True))
+        wanted = {obj.id for obj in objs}
+        if current - wanted:
+            related.remove(*(current - wanted))
+        if wanted - current:
+            related.add(*(wanted - current))
+
+    @transaction.atomic
     def create(self, validated_data):
         """Create a recipe override method"""
         tags = validated_data.pop('tags', [])
         ingredients = validated_data.pop('ingredients', [])
         recipe = Recipe.objects.create(**validated_data)
-        self._get_or_create_tags(tags, recipe)
-        self._get_or_create_ingredients(ingredients, recipe)
+        if tags:
+            recipe.tags.add(*self._get_or_create_tags(tags))
+        if ingredients:
+            recipe.ingredients.add(
+                *self._get_or_create_ingredients(ingredients)
+            )
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Override update method to update recipe"""
         tags = validated_data.pop('tags', None)
-        if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
-
         ingredients = validated_data.pop('ingredients', None)
-        if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
-
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
-        instance.save()
+        # Only changed fields are saved, so unchanged totals and search
+        # documents are left alone
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        if tags is not None:
+            self._set_related(instance.tags, self._get_or_create_tags(tags))
+        if ingredients is not None:
+            self._set_related(
+                instance.ingredients,
+                self._get_or_create_ingredients(ingredients),
+            )
+
         return instance
 
 
+class RecipeListFastSerializer:
+    """
+    Read only equivalent of RecipeSerializer(many=True) for listing.
+    Works on values() rows and loads tags and ingredients with one grouped
+    query each, skipping DRF field machinery per recipe.
+    """
+    value_fields = ['id', 'title', 'time_minutes', 'price', 'link']
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @staticmethod
+    def _group_related(field_name, recipe_ids):
+        """Return {'id', 'name'} dicts of related objects per recipe id"""
+        field = Recipe._meta.get_field(field_name)
+        related = field.m2m_reverse_field_name()
+        grouped = {}
+        for recipe_id, related_id, name in (
+            field.remote_field.through.objects
+            .filter(recipe_id__in=recipe_ids)
+            .order_by(f'{related}_id')
+            .values_list('recipe_id', f'{related}_id', f'{related}__name')
+        ):
+            grouped.setdefault(recipe_id, []).append(
+                {'id': related_id, 'name': name}
+            )
+
+        return grouped
+
+    @property
+    def data(self):
+        with time_serialization():
+            return self._to_representation()
+
+    def _to_representation(self):
+        recipe_ids = [row['id'] for row in self.rows]
+        if not recipe_ids:
+            return []
+
+        tags = self._group_related('tags', recipe_ids)
+        ingredients = self._group_related('ingredients', recipe_ids)
+        price = RecipeSerializer().fields['price'].to_representation
+        return [
+            {
+                'id': row['id'],
+                'title': row['title'],
+                'time_minutes': row['time_minutes'],
+                'price': price(row['price']),
+                'link': row['link'],
+                'tags': tags.get(row['id'], []),
+                'ingredients': ingredients.get(row['id'], []),
+            }
+            for row in self.rows
+        ]
+
+
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for recipe detail, to include description"""
+    image_variants = serializers.SerializerMethodField()
+
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['description', 'image']
+        fields = RecipeSerializer.Meta.fields + [
+            'description', 'image', 'image_variants'
+        ]
+
+    @extend_schema_field(OpenApiTypes.OBJECT)
+    def get_image_variants(self, recipe):
+        """Return URLs of thumbnails and web optimized image versions"""
+        if not recipe.image:
+            return {}
+
+        request = self.context.get('request')
+        urls = derivative_urls(recipe.image.name, recipe.image_derivatives)
+        if request is not None:
+            urls = {
+                key: request.build_absolute_uri(url)
+                for key, url in urls.items()
+            }
+        return urls
+
+
+class RecipeImportSerializer(RecipeSerializer):
+    """Serializer for validating rows of a recipe import"""
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ['description']
 
 
 class RecipeImageSerializer(serializers.ModelSerializer):
@@ -101,3 +239,12 @@ class RecipeImageSerializer(serializers.ModelSerializer):
         fields = ['id', 'image']
         read_only_fields = ['id']
         extra_kwargs = {'image': {'required': 'True'}}
+
+    def update(self, instance, validated_data):
+        """Save the image alone, leaving totals and search untouched"""
+        instance.image = validated_data['image']
+        instance.image_derivatives = []
+        instance.save(
+            update_fields=['image', 'image_derivatives', 'updated_at'],
+        )
+        return instance
@@ -0,0 +1,116 @@
+"""
+Signal handlers for the recipe app
+"""
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from core.models import Recipe, Tag, Ingredient
+
+from recipe import search, stats
+
+
+def changes_fields(update_fields, fields):
+    """Whether a save with update_fields may change any of fields"""
+    return update_fields is None or not fields.isdisjoint(update_fields)
+
+
+@receiver(post_save, sender=Recipe)
+def index_saved_recipe(sender, instance, created, raw=False,
+                       update_fields=None, **kwargs):
+    """Rebuild search document of saved recipe"""
+    if raw:
+        return
+    if created or changes_fields(update_fields, search.DOCUMENT_FIELDS):
+        search.index_on_commit([instance.id])
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def index_recipe_ingredients(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    """Rebuild search documents when ingredients are linked or unlinked"""
+    if action == 'pre_clear' and reverse:
+        instance._recipe_ids = list(
+            instance.recipe_set.values_list('id', flat=True)
+        )
+    elif action in ['post_add', 'post_remove', 'post_clear']:
+        if not reverse:
+            search.index_on_commit([instance.id])
+        elif action == 'post_clear':
+            search.index_on_commit(getattr(instance, '_recipe_ids', []))
+        else:
+            search.index_on_commit(pk_set)
+
+
+@receiver(post_save, sender=Ingredient)
+def index_renamed_ingredient(sender, instance, created, raw=False,
+                             update_fields=None, **kwargs):
+    """Rebuild search documents of recipes using a changed ingredient"""
+    if not created and not raw and changes_fields(update_fields, {'name'}):
+        search.index_on_commit(
+            instance.recipe_set.values_list('id', flat=True),
+        )
+
+
+@receiver(pre_delete, sender=Ingredient)
+def collect_ingredient_recipes(sender, instance, **kwargs):
+    """Remember recipes using an ingredient before it is deleted"""
+    instance._recipe_ids = list(
+        instance.recipe_set.values_list('id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Ingredient)
+def index_ingredient_recipes(sender, instance, **kwargs):
+    """Rebuild search documents of recipes that used deleted ingredient"""
+    search.index_on_commit(getattr(instance, '_recipe_ids', []))
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_saved_recipe_stats(sender, instance, created, raw=False,
+                               update_fields=None, **kwargs):
+    """Recompute recipe totals of the owner of a saved recipe"""
+    if raw:
+        return
+    if created or changes_fields(update_fields, stats.RECIPE_STATS_FIELDS):
+        stats.refresh_user_stats_on_commit([instance.user_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def count_linked_recipes(sender, instance, action, reverse, model, pk_set,
+                         **kwargs):
+    """Update recipe counts of tags or ingredients linked or unlinked"""
+    if reverse:
+        if action in ['post_add', 'post_remove', 'post_clear']:
+            stats.count_recipes_on_commit(type(instance), [instance.pk])
+    elif action == 'pre_clear':
+        instance._cleared_ids = stats.linked_ids(instance, model)
+    elif action in ['post_add', 'post_remove']:
+        stats.count_recipes_on_commit(model, pk_set)
+    elif action == 'post_clear':
+        stats.count_recipes_on_commit(
+            model,
+            getattr(instance, '_cleared_ids', []),
+        )
+
+
+@receiver(pre_delete, sender=Recipe)
+def collect_recipe_links(sender, instance, **kwargs):
+    """Remember tags and ingredients of a recipe before it is deleted"""
+    instance._linked_ids = {
+        model: stats.linked_ids(instance, model)
+        for model in [Tag, Ingredient]
+    }
+
+
+@receiver(post_delete, sender=Recipe)
+def refresh_deleted_recipe_stats(sender, instance, **kwargs):
+    """Update counts and totals that included a deleted recipe"""
+    stats.refresh_user_stats_on_commit([instance.user_id])
+    for model, ids in getattr(instance, '_linked_ids', {}).items():
+        stats.count_recipes_on_commit(model, ids)
@@ -0,0 +1,142 @@
+"""
+Denormalized recipe counts of tags and ingredients and totals per user
+"""
+from django.db import transaction
+from django.db.models import (
+    Avg,
+    Count,
+    Max,
+    Min,
+    OuterRef,
+    QuerySet,
+    Subquery,
+)
+from django.db.models.functions import Coalesce
+
+from core.db.commit import OnCommitBatch
+from core.models import (
+    Recipe,
+    RecipeStats,
+    Tag,
+    Ingredient,
+)
+
+
+RECIPE_FIELDS = {Tag: 'tags', Ingredient: 'ingredients'}
+STATS_FIELDS = ['recipe_count', 'average_time_minutes', 'min_price',
+                'max_price']
+# Fields of recipes the totals of their user are computed from
+RECIPE_STATS_FIELDS = {'user', 'time_minutes', 'price'}
+
+
+def linked_ids(recipe, model):
+    """Return ids of tags or ingredients linked to recipe"""
+    return list(
+        getattr(recipe, RECIPE_FIELDS[model]).values_list('id', flat=True)
+    )
+
+
+def count_recipes(model, ids):
+    """
+    Set recipe_count of tags or ingredients from their links, ids is an
+    iterable or a queryset of primary keys.
+    """
+    if not isinstance(ids, QuerySet):
+        ids = list(ids)
+        if not ids:
+            return
+
+    field = Recipe._meta.get_field(RECIPE_FIELDS[model])
+    through = field.remote_field.through
+    column = f'{model._meta.model_name}_id'
+    links = through.objects.filter(
+        **{column: OuterRef('pk')},
+    ).order_by().values(column).annotate(count=Count('*')).values('count')
+    with transaction.atomic(savepoint=False):
+        # Rows are locked in pk order before counting, so the count
+        # sees links committed by writers that held the lock before.
+        locked = list(
+            model.objects.select_for_update().filter(pk__in=ids)
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        model.objects.filter(pk__in=locked).update(
+            recipe_count=Coalesce(Subquery(links), 0),
+        )
+
+
+def refresh_user_stats(user_ids):
+    """
+    Recompute recipe totals of users in a transaction of their own when
+    called outside one. Existing rows are locked first, so concurrent
+    writes of a user are summed one after the other. Rows are only
+    created for users with recipes.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+
+    with transaction.atomic(savepoint=False):
+        _refresh_user_stats(user_ids)
+
+
+def _refresh_user_stats(user_ids):
+    existing = {
+        stats.user_id: stats
+        for stats in RecipeStats.objects.select_for_update().filter(
+            user_id__in=user_ids,
+        ).order_by('user_id')
+    }
+    totals = {
+        row.pop('user_id'): row
+        for row in Recipe.objects.filter(user_id__in=user_ids).order_by()
+        .values('user_id').annotate(
+            recipe_count=Count('id'),
+            average_time_minutes=Avg('time_minutes'),
+            min_price=Min('price'),
+            max_price=Max('price'),
+        )
+    }
+
+    for stats in existing.values():
+        values = totals.get(stats.user_id, {'recipe_count': 0})
+        for field in STATS_FIELDS:
+            setattr(stats, field, values.get(field))
+    if existing:
+        RecipeStats.objects.bulk_update(existing.values(), STATS_FIELDS)
+
+    missing = [
+        RecipeStats(user_id=user_id, **values)
+        for user_id, values in totals.items() if user_id not in existing
+    ]
+    if missing:
+        RecipeStats.objects.bulk_create(missing, ignore_conflicts=True)
+
+
+def _refresh_pending(pending):
+    """Recount what writes of a committed transaction changed"""
+    # Same lock order as writes: user stats, tags, then ingredients
+    with transaction.atomic(savepoint=False):
+        refresh_user_stats(pending.get('users', ()))
+        for model in RECIPE_FIELDS:
+            count_recipes(model, pending.get(model, ()))
+
+
+pending = OnCommitBatch(_refresh_pending)
+
+
+def refresh_user_stats_on_commit(user_ids):
+    """Recompute recipe totals of users once the transaction commits"""
+    pending.add('users', user_ids)
+
+
+def count_recipes_on_commit(model, ids):
+    """Set recipe_count of tags or ingredients once it commits"""
+    pending.add(model, ids)
+
+
+def user_stats(user):
+    """Return recipe totals of user, empty when no recipe was written"""
+    try:
+        return RecipeStats.objects.get(user=user)
+    except RecipeStats.DoesNotExist:
+        return RecipeStats(user=user)
@@ -0,0 +1,158 @@
+"""
+Tests for the async views served by the ASGI application
+"""
+import asyncio
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import (
+    SimpleTestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import resolve, reverse
+
+from core.metrics import REGISTRY
+from core.models import Recipe, Tag, User
+from recipe import cache
+from recipe.scenarios import ASGIClient
+
+from rest_framework.authtoken.models import Token
+
+
+ASGI_URLS = 'app.asgi_urls'
+
+
+class AsyncURLTests(SimpleTestCase):
+    """Test which routes of the ASGI application are coroutines"""
+
+    def test_read_routes_async(self):
+        """Test list and detail routes resolve to coroutine views"""
+        for path in [
+            reverse('recipe:recipe-list'),
+            reverse('recipe:recipe-detail', args=[1]),
+            reverse('recipe:tag-list'),
+            reverse('recipe:ingredient-detail', args=[1]),
+        ]:
+            match = resolve(path, urlconf=ASGI_URLS)
+            self.assertTrue(
+                asyncio.iscoroutinefunction(match.func),
+                path,
+            )
+
+    def test_other_routes_sync(self):
+        """Test other routes keep their sync views"""
+        for path in [
+            reverse('recipe:recipe-search'),
+            reverse('recipe:recipe-upload-image', args=[1]),
+            reverse('user:token'),
+        ]:
+            match = resolve(path, urlconf=ASGI_URLS)
+            self.assertFalse(
+                asyncio.iscoroutinefunction(match.func),
+                path,
+            )
+
+    def test_same_urls(self):
+        """Test routes reverse to the same paths as under WSGI"""
+        self.assertEqual(
+            reverse('recipe:recipe-list', urlconf=ASGI_URLS),
+            reverse('recipe:recipe-list'),
+        )
+        self.assertEqual(
+            resolve(reverse('recipe:recipe-detail', args=[3]),
+                    urlconf=ASGI_URLS).url_name,
+            'recipe-detail',
+        )
+
+
+@override_settings(ALLOWED_HOSTS=['localhost'])
+class ASGIApplicationTests(TransactionTestCase):
+    """Test requests through the ASGI application"""
+
+    def setUp(self):
+        from app.asgi import application
+
+        REGISTRY.clear()
+        cache.stats.reset()
+        self.client = ASGIClient(application)
+        self.user = User.objects.create_user('user@example.com', 'pass1234')
+        self.token = Token.objects.create(user=self.user).key
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Soup',
+            time_minutes=10,
+            price=Decimal('2.50'),
+        )
+        Tag.objects.create(user=self.user, name='Vegan')
+
+    def request(self, path, token=None):
+        return asyncio.run(self.client.request(path, token))
+
+    def test_read_endpoints(self):
+        """Test async list and detail views answer requests"""
+        for path in [
+            reverse('recipe:recipe-list'),
+            reverse('recipe:recipe-detail', args=[self.recipe.id]),
+            reverse('recipe:tag-list'),
+            reverse('recipe:ingredient-list'),
+            reverse('recipe:recipe-search'),
+        ]:
+            self.assertEqual(self.request(path, self.token), 200, path)
+
+    def test_auth_required(self):
+        """Test async views still authenticate requests"""
+        self.assertEqual(self.request(reverse('recipe:recipe-list')), 401)
+
+    def test_concurrent_requests(self):
+        """Test many requests served at once all succeed"""
+        path = reverse('recipe:recipe-detail', args=[self.recipe.id])
+
+        async def send():
+            return await asyncio.gather(*[
+                self.client.request(path, self.token) for _ in range(10)
+            ])
+
+        self.assertEqual(asyncio.run(send()), [200] * 10)
+
+    def test_metrics_recorded(self):
+        """Test queries of async views are counted in the request"""
+        self.request(reverse('recipe:tag-list'), self.token)
+
+        content = REGISTRY.render()
+        labels = 'endpoint="recipe:tag-list",method="GET"'
+        self.assertIn(
+            f'http_request_duration_seconds_count{{{labels}}} 1',
+            content,
+        )
+        self.assertIn(
+            f'http_request_db_queries_bucket{{{labels},le="0"}} 0',
+            content,
+        )
+
+
+class BenchmarkASGICommandTests(TransactionTestCase):
+    """Test the ASGI and WSGI comparison command"""
+
+    def test_benchmark_asgi(self):
+        """Test both applications are measured without errors"""
+        out = StringIO()
+        call_command(
+            'benchmark_asgi',
+            users=2,
+            recipes=3,
+            endpoint='detail',
+            connections=4,
+            requests=8,
+            wsgi_threads=2,
+            client_delay=0,
+            db_latency=0.1,
+            stdout=out,
+        )
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split(':')[0] for line in lines],
+                         ['wsgi', 'asgi'])
+        self.assertTrue(all('errors 0' in line for line in lines))
+        self.assertFalse(Recipe.objects.exists())
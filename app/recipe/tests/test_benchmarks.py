@@ -0,0 +1,264 @@
+"""
+Tests for the recipe API benchmark suite
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import LiveServerTestCase, SimpleTestCase, TestCase
+
+from core.models import Recipe, Tag, Ingredient, User
+from recipe import scenarios
+from recipe.benchmarks import SampleUser, delete_dataset, generate_dataset
+from recipe.images import derivative_path
+
+
+class GenerateDatasetTests(TestCase):
+    """Test bulk generation of sample data"""
+
+    def test_generate_dataset(self):
+        """Test users own recipes linked to their tags and ingredients"""
+        users = generate_dataset(users=3, recipes=7, tags=4, ingredients=5,
+                                 batch_size=10)
+
+        self.assertEqual(len(users), 3)
+        self.assertEqual(Recipe.objects.count(), 21)
+        self.assertEqual(Tag.objects.count(), 12)
+        self.assertEqual(Ingredient.objects.count(), 15)
+        for sample in users:
+            user = User.objects.get(email=sample.email)
+            self.assertEqual(user.auth_token.key, sample.token)
+            self.assertEqual(len(sample.recipe_ids), 7)
+            recipes = Recipe.objects.filter(id__in=sample.recipe_ids)
+            self.assertTrue(all(recipe.user == user for recipe in recipes))
+            self.assertFalse(
+                Tag.objects.filter(recipe__in=recipes).exclude(user=user)
+            )
+            self.assertTrue(
+                all(recipe.ingredients.count() >= 2 for recipe in recipes)
+            )
+
+    def test_generate_dataset_chunks_recipes(self):
+        """Test recipes of a single user are inserted batch_size at once"""
+        with patch.object(
+            Recipe.objects,
+            'bulk_create',
+            wraps=Recipe.objects.bulk_create,
+        ) as bulk_create:
+            users = generate_dataset(users=1, recipes=25, tags=3,
+                                     ingredients=3, batch_size=10)
+
+        self.assertEqual(
+            [len(call.args[0]) for call in bulk_create.call_args_list],
+            [10, 10, 5],
+        )
+        self.assertEqual(Recipe.objects.count(), 25)
+        self.assertEqual(
+            users[0].recipe_ids,
+            list(Recipe.objects.order_by('id').values_list('id', flat=True)
+                 [:len(users[0].recipe_ids)]),
+        )
+        self.assertFalse(Recipe.objects.filter(tags=None).exists())
+        self.assertEqual(Tag.objects.filter(recipe_count=0).count(), 0)
+
+    def test_generate_dataset_reproducible(self):
+        """Test the same seed generates the same recipes"""
+        users = generate_dataset(users=1, recipes=5, seed=3)
+        first = list(Recipe.objects.values_list('title', 'price'))
+        delete_dataset(users)
+        self.assertFalse(Recipe.objects.exists())
+
+        generate_dataset(users=1, recipes=5, seed=3)
+
+        self.assertEqual(
+            list(Recipe.objects.values_list('title', 'price')),
+            first,
+        )
+
+    def test_delete_dataset_only_generated(self):
+        """Test users that were not generated are kept, even with an
+        email like the generated ones"""
+        existing = User.objects.create_user(
+            'benchmark-99@example.com',
+            'testpass123',
+        )
+        users = generate_dataset(users=2, recipes=1)
+
+        delete_dataset(users)
+
+        self.assertEqual(list(User.objects.all()), [existing])
+
+    def test_delete_dataset_images(self):
+        """Test image files of generated recipes are deleted"""
+        users = generate_dataset(users=1, recipes=1)
+        recipe = Recipe.objects.get(pk=users[0].recipe_ids[0])
+        with tempfile.TemporaryDirectory() as media_root, \
+                self.settings(MEDIA_ROOT=media_root):
+            recipe.image.save('photo.jpg', ContentFile(b'image'))
+            thumbnail = default_storage.save(
+                derivative_path(recipe.image.name, 'thumbnail'),
+                ContentFile(b'thumbnail'),
+            )
+
+            delete_dataset(users)
+
+            self.assertFalse(default_storage.exists(recipe.image.name))
+            self.assertFalse(default_storage.exists(thumbnail))
+
+
+class ScenarioTests(TestCase):
+    """Test scenarios run in process"""
+
+    def setUp(self):
+        self.users = generate_dataset(users=2, recipes=5)
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+
+    def test_scenarios(self):
+        """Test every scenario succeeds and reports statistics"""
+        with self.settings(MEDIA_ROOT=self.media_root.name):
+            for name, scenario in scenarios.SCENARIOS.items():
+                with self.subTest(name):
+                    result = scenarios.run_scenario(
+                        scenario,
+                        scenarios.InProcessClient(),
+                        self.users,
+                        requests=3,
+                    )
+
+                    self.assertEqual(result['requests'], 3)
+                    self.assertEqual(result['errors'], 0)
+                    self.assertGreater(result['queries'], 0)
+                    self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+
+class BenchmarkCommandTests(TestCase):
+    """Test the benchmark_api command"""
+
+    def test_command_saves_baseline(self):
+        """Test the command writes results and leaves no data behind"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'baseline.json')
+
+        call_command(
+            'benchmark_api',
+            '--users=1',
+            '--recipes=3',
+            '--requests=2',
+            '--scenario=list',
+            '--scenario=detail',
+            f'--save-baseline={path}',
+            stdout=StringIO(),
+        )
+
+        with open(path) as baseline_file:
+            baseline = json.load(baseline_file)
+        self.assertEqual(set(baseline['scenarios']), {'list', 'detail'})
+        self.assertEqual(baseline['dataset']['recipes'], 3)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_command_concurrency_requires_url(self):
+        """Test threads are only used over HTTP"""
+        with self.assertRaises(CommandError):
+            call_command('benchmark_api', '--concurrency=2')
+
+
+class CompareTests(SimpleTestCase):
+    """Test results are compared with a baseline"""
+
+    baseline = {'scenarios': {'list': {
+        'errors': 0,
+        'throughput': 100.0,
+        'p50_ms': 10.0,
+        'p99_ms': 20.0,
+        'queries': 3.0,
+    }}}
+
+    def test_compare_within_tolerance(self):
+        """Test small slowdowns are not regressions"""
+        report = {'list': dict(
+            self.baseline['scenarios']['list'],
+            p50_ms=11.0,
+            throughput=90.0,
+        )}
+
+        self.assertEqual(scenarios.compare(report, self.baseline, 0.2), [])
+
+    def test_compare_regressions(self):
+        """Test slower responses and extra queries are reported"""
+        report = {'list': {
+            'errors': 1,
+            'throughput': 50.0,
+            'p50_ms': 10.0,
+            'p99_ms': 40.0,
+            'queries': 4.0,
+        }, 'detail': self.baseline['scenarios']['list']}
+
+        regressions = scenarios.compare(report, self.baseline, 0.2)
+
+        self.assertEqual(len(regressions), 4)
+        self.assertTrue(all(r.startswith('list:') for r in regressions))
+
+
+class RecordingClient:
+    """Client answering every request, recording the calling threads"""
+
+    def __init__(self):
+        self.threads = set()
+
+    def request(self, method, path, token=None, data=None, multipart=False):
+        self.threads.add(threading.get_ident())
+        time.sleep(0.01)
+        return 200, None
+
+
+class RunScenarioTests(SimpleTestCase):
+    """Test requests are spread over threads"""
+
+    def test_concurrency(self):
+        """Test every request is sent once from several threads"""
+        client = RecordingClient()
+        users = [SampleUser('user@example.com', 'key', [1], ['Tag'])]
+
+        result = scenarios.run_scenario(
+            scenarios.list_recipes,
+            client,
+            users,
+            requests=9,
+            concurrency=3,
+        )
+
+        self.assertEqual(result['requests'], 9)
+        self.assertEqual(len(client.threads), 3)
+        self.assertGreaterEqual(result['p50_ms'], 10)
+
+
+class HTTPScenarioTests(LiveServerTestCase):
+    """Test scenarios run against a server over HTTP"""
+
+    def test_scenarios_over_http(self):
+        """Test requests reach the server"""
+        users = generate_dataset(users=2, recipes=3)
+        client = scenarios.HTTPClient(self.live_server_url)
+
+        for name in ['list', 'create']:
+            result = scenarios.run_scenario(
+                scenarios.SCENARIOS[name],
+                client,
+                users,
+                requests=4,
+            )
+
+            self.assertEqual(result['requests'], 4)
+            self.assertEqual(result['errors'], 0)
+            self.assertIsNone(result['queries'])
+        self.assertEqual(Recipe.objects.count(), 10)
@@ -9,6 +9,7 @@ from rest_framework.test import APIClient
 from rest_framework import status
 
 from core.models import Ingredient
+from core.testing import QueryBudgetMixin
 
 from recipe.serializers import IngredientSerializer
 
@@ -39,7 +40,7 @@ class PublicIngredientApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateIngredientsApiTests(TestCase):
+class PrivateIngredientsApiTests(QueryBudgetMixin, TestCase):
     """Test authenticated API requests"""
 
     def setUp(self):
@@ -58,7 +59,7 @@ class PrivateIngredientsApiTests(TestCase):
         serializer = IngredientSerializer(ingredients, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_ingredients_limited_to_user(self):
         """Test list of ingredients only accessible to auth user"""
@@ -69,9 +70,9 @@ class PrivateIngredientsApiTests(TestCase):
         res = self.client.get(INGREDIENT_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], ingredient.name)
-        self.assertEqual(res.data[0]['id'], ingredient.id)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], ingredient.name)
+        self.assertEqual(res.data['results'][0]['id'], ingredient.id)
 
     def test_update_ingredient(self):
         """Test updating a ingredient"""
@@ -84,6 +85,18 @@ class PrivateIngredientsApiTests(TestCase):
         ingredient.refresh_from_db()
         self.assertEqual(ingredient.name, payload['name'])
 
+    def test_update_ingredient_existing_name_error(self):
+        """Test renaming an ingredient to a name already used returns error"""
+        Ingredient.objects.create(user=self.user, name='Salt')
+        ingredient = Ingredient.objects.create(user=self.user, name='Chilli')
+        payload = {'name': 'Salt'}
+
+        res = self.client.patch(detail_url(ingredient.id), payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        ingredient.refresh_from_db()
+        self.assertEqual(ingredient.name, 'Chilli')
+
     def test_delete_ingredient(self):
         """Test deleting a ingredient"""
         ingredient = Ingredient.objects.create(user=self.user, name='Chilli')
@@ -93,3 +106,29 @@ class PrivateIngredientsApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
         ingredients = Ingredient.objects.filter(user=self.user)
         self.assertFalse(ingredients.exists())
+
+    def test_list_ingredients_query_count_constant(self):
+        """Test listing ingredients runs the same queries for any count"""
+        def add_ingredients(count):
+            Ingredient.objects.get_or_create_many(
+                self.user,
+                [f'Ingredient {count} {i}' for i in range(count)],
+            )
+
+        def list_ingredients(count):
+            res = self.client.get(INGREDIENT_URL)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertConstantQueries(list_ingredients, add_ingredients, budget=2)
+
+    def test_update_ingredient_query_budget(self):
+        """Test updating a ingredient stays within the query budget"""
+        ingredient = Ingredient.objects.create(user=self.user, name='Sugar')
+
+        with self.assertQueryBudget(6):
+            res = self.client.patch(
+                detail_url(ingredient.id),
+                {'name': 'Salt'},
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -1,16 +1,29 @@
 """
 Tests for recipe APIs
 """
+from datetime import timedelta
 from decimal import Decimal
+from unittest import skipUnless
+from unittest.mock import patch
+from io import StringIO
 import tempfile
+import csv
+import json
 import os
 
 from PIL import Image
 
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
 
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 from rest_framework import status
 
@@ -18,12 +31,26 @@ from core.models import (
     Recipe,
     Tag,
     Ingredient,
+    UserDataVersion,
 )
+from core.testing import QueryBudgetMixin, committed
+from recipe import cache
+from recipe.images import (
+    available_derivatives,
+    delete_derivatives,
+    derivative_path,
+)
+from recipe.pagination import RecipeCursorPagination
 from recipe.serializers import (
-    RecipeSerializer, RecipeDetailSerializer
+    RecipeSerializer,
+    RecipeListFastSerializer,
+    RecipeDetailSerializer,
 )
 
 RECIPES_URL = reverse('recipe:recipe-list')
+EXPORT_URL = reverse('recipe:recipe-export')
+IMPORT_URL = reverse('recipe:recipe-bulk-import')
+CACHE_STATS_URL = reverse('recipe:cache-stats')
 
 
 def detail_url(recipe_id):
@@ -86,7 +113,7 @@ class PrivateRecipeApiTests(TestCase):
         res = self.client.get(RECIPES_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_recipe_list_limited_to_user(self):
         """Test user should be able to see own recipe list"""
@@ -103,7 +130,108 @@ class PrivateRecipeApiTests(TestCase):
         serializer = RecipeSerializer(own_recipe, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
+
+    def test_recipe_list_paginated(self):
+        """Test recipes are listed page by page using the next cursor"""
+        recipes = [create_recipe(self.user) for _ in range(5)]
+        expected = [recipe.id for recipe in reversed(recipes)]
+
+        ids = []
+        url = f'{RECIPES_URL}?page_size=2'
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(res.data['results']), 2)
+            ids.extend(recipe['id'] for recipe in res.data['results'])
+            url = res.data['next']
+
+        self.assertEqual(ids, expected)
+
+    def test_recipe_list_page_size_capped(self):
+        """Test client selected page size is capped by the server"""
+        paginator = RecipeCursorPagination
+        for _ in range(paginator.max_page_size + 1):
+            create_recipe(self.user)
+
+        res = self.client.get(
+            RECIPES_URL,
+            {'page_size': paginator.max_page_size + 1},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), paginator.max_page_size)
+        self.assertIsNotNone(res.data['next'])
+
+    def test_filter_by_tags(self):
+        """Test filtering recipes by any of the given tags"""
+        r1 = create_recipe(user=self.user, title='Thai Vegetable Curry')
+        r2 = create_recipe(user=self.user, title='Aubergine with Tahini')
+        r3 = create_recipe(user=self.user, title='Fish and chips')
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Vegetarian')
+        r1.tags.add(tag1, tag2)
+        r2.tags.add(tag2)
+
+        params = {'tags': f'{tag1.id},{tag2.id}'}
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [r2.id, r1.id])
+        self.assertNotIn(r3.id, ids)
+
+    def test_filter_by_all_tags(self):
+        """Test filtering recipes having all of the given tags"""
+        r1 = create_recipe(user=self.user, title='Thai Vegetable Curry')
+        r2 = create_recipe(user=self.user, title='Aubergine with Tahini')
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Vegetarian')
+        r1.tags.add(tag1, tag2)
+        r2.tags.add(tag2)
+
+        params = {'tags': f'{tag1.id},{tag2.id}', 'match': 'all'}
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [r1.id])
+
+    def test_filter_by_ingredients(self):
+        """Test filtering recipes by ingredients"""
+        r1 = create_recipe(user=self.user, title='Posh Beans on Toast')
+        r2 = create_recipe(user=self.user, title='Chicken Cacciatore')
+        create_recipe(user=self.user, title='Red Lentil Daal')
+        in1 = Ingredient.objects.create(user=self.user, name='Feta Cheese')
+        in2 = Ingredient.objects.create(user=self.user, name='Chicken')
+        r1.ingredients.add(in1)
+        r2.ingredients.add(in2)
+        r1.tags.add(Tag.objects.create(user=self.user, name='Breakfast'))
+
+        params = {'ingredients': f'{in1.id},{in2.id}'}
+        res = self.client.get(RECIPES_URL, params)
+
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [r2.id, r1.id])
+
+        tag = r1.tags.get()
+        res = self.client.get(RECIPES_URL, dict(params, tags=tag.id))
+
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [r1.id])
+
+    def test_filter_invalid_params_error(self):
+        """Test invalid filter parameters return error"""
+        for params in [
+            {'tags': '1,abc'},
+            {'tags': '1', 'match': 'some'},
+            {'tags': '99999999999999999999999'},
+            {'ingredients': '0'},
+            {'ingredients': '1,-2'},
+        ]:
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_get_recipe_details(self):
         """Test get detail of recipe"""
@@ -299,6 +427,42 @@ class PrivateRecipeApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(recipe.tags.count(), 0)
 
+    def test_create_recipe_with_duplicate_tags(self):
+        """Test repeated tag names in payload are assigned once"""
+        payload = {
+            'title': 'Thai Prawn Curry',
+            'time_minutes': 30,
+            'price': Decimal('5.50'),
+            'tags': [{'name': 'Thai'}, {'name': 'Thai'}],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(recipe.tags.count(), 1)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    def test_update_recipe_tags_keeps_unchanged(self):
+        """Test updating tags only changes the difference"""
+        tag_thai = Tag.objects.create(user=self.user, name='Thai')
+        tag_spicy = Tag.objects.create(user=self.user, name='Spicy')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag_thai, tag_spicy)
+        through = Recipe.tags.through
+        kept = through.objects.get(recipe=recipe, tag=tag_thai)
+
+        payload = {'tags': [{'name': 'Thai'}, {'name': 'Dinner'}]}
+        url = detail_url(recipe.id)
+        res = self.client.patch(url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(through.objects.filter(id=kept.id).exists())
+        self.assertEqual(
+            set(recipe.tags.values_list('name', flat=True)),
+            {'Thai', 'Dinner'},
+        )
+
     def test_create_recipe_with_new_ingredients(self):
         """Test creating a recipe with new ingredients"""
         payload = {
@@ -390,6 +554,761 @@ class PrivateRecipeApiTests(TestCase):
         self.assertEqual(recipe.ingredients.count(), 0)
 
 
+class RecipeQueryCountTests(QueryBudgetMixin, TestCase):
+    """Test number of queries for recipe endpoints is bounded"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='testuser@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def _create_recipes_with_attrs(self, count):
+        """Create recipes each having own tags and ingredients"""
+        recipes = []
+        with committed():
+            for i in range(count):
+                recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+                name = f'Attr {recipe.id}'
+                recipe.tags.add(Tag.objects.create(user=self.user, name=name))
+                recipe.ingredients.add(
+                    Ingredient.objects.create(user=self.user, name=name),
+                )
+                recipes.append(recipe)
+
+        return recipes
+
+    def test_list_recipes_query_count_constant(self):
+        """Test listing recipes uses same queries for any recipe count"""
+        for count in [1, 10]:
+            self._create_recipes_with_attrs(count)
+            # Data version, recipes, tags and ingredients
+            with self.assertNumQueries(4):
+                res = self.client.get(RECIPES_URL)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertTrue(all(r['tags'] for r in res.data['results']))
+            self.assertTrue(all(r['ingredients'] for r in res.data['results']))
+
+    def test_create_recipe_query_count_constant(self):
+        """Test creating recipe queries do not grow with tag count"""
+        def create(count):
+            payload = {
+                'title': f'Recipe {count}',
+                'time_minutes': 30,
+                'price': Decimal('5.50'),
+                'tags': [{'name': f'Tag {i}'} for i in range(count)],
+                'ingredients': [
+                    {'name': f'Ing {i}'} for i in range(count)
+                ],
+            }
+            with committed():
+                res = self.client.post(RECIPES_URL, payload, format='json')
+
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(len(res.data['tags']), count)
+            self.assertEqual(len(res.data['ingredients']), count)
+
+        # Commit hooks index, count and bump the data version once each
+        self.assertConstantQueries(create, sizes=(2, 20), budget=28)
+
+    def test_recipe_detail_query_count(self):
+        """Test retrieving recipe prefetches tags and ingredients"""
+        recipe = self._create_recipes_with_attrs(1)[0]
+
+        with self.assertNumQueries(4):
+            res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['tags']), 1)
+        self.assertEqual(len(res.data['ingredients']), 1)
+
+    def test_recipe_detail_query_count_constant(self):
+        """Test retrieving recipe queries do not grow with tag count"""
+        recipe = create_recipe(user=self.user)
+
+        def add_attrs(count):
+            names = [f'Attr {count} {i}' for i in range(count)]
+            with committed():
+                recipe.tags.add(
+                    *Tag.objects.get_or_create_many(self.user, names),
+                )
+                recipe.ingredients.add(
+                    *Ingredient.objects.get_or_create_many(self.user, names),
+                )
+
+        def retrieve(count):
+            res = self.client.get(detail_url(recipe.id))
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertConstantQueries(retrieve, add_attrs, budget=4)
+
+    def test_filter_recipes_query_count_constant(self):
+        """Test filtering by tags runs the same queries for any count"""
+        def filter_by_tags(count):
+            tag_ids = ','.join(
+                str(tag.id) for tag in Tag.objects.filter(user=self.user)
+            )
+            res = self.client.get(RECIPES_URL, {
+                'tags': tag_ids,
+                'match': 'all' if count % 2 else 'any',
+            })
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertConstantQueries(
+            filter_by_tags,
+            self._create_recipes_with_attrs,
+            sizes=(2, 10),
+            budget=5,
+        )
+
+    def test_update_recipe_query_count_constant(self):
+        """Test updating recipe queries do not grow with tag count"""
+        with committed():
+            recipe = create_recipe(user=self.user)
+
+        def update(count):
+            with committed():
+                res = self.client.patch(detail_url(recipe.id), {
+                    'tags': [{'name': f'Tag {i}'} for i in range(count)],
+                    'ingredients': [
+                        {'name': f'Ing {i}'} for i in range(count)
+                    ],
+                }, format='json')
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(res.data['tags']), count)
+
+        self.assertConstantQueries(update, budget=31)
+
+    def test_delete_recipe_query_budget(self):
+        """Test deleting a recipe with many links stays within budget"""
+        recipe = self._create_recipes_with_attrs(1)[0]
+
+        with self.assertQueryBudget(17), committed():
+            res = self.client.delete(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+
+@override_settings(RESPONSE_CACHE={'ALIAS': '', 'TIMEOUT': 60})
+class RecipeListFastPathTests(TestCase):
+    """Test the fast list path renders exactly like the serializers"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com', password='test123')
+        self.client.force_authenticate(self.user)
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        dinner = Tag.objects.create(user=self.user, name='Dinner')
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        for price, link in [
+            (Decimal('5'), ''),
+            (Decimal('10.50'), 'https://example.com/recipe'),
+            (Decimal('0.05'), 'Ünïcode "link"'),
+        ]:
+            recipe = create_recipe(user=self.user, price=price, link=link)
+            recipe.tags.add(dinner, vegan)
+        recipe.ingredients.add(salt)
+        create_recipe(user=self.user, title='No attributes')
+
+    def test_parity_with_serializer(self):
+        """Test fast serializer output matches RecipeSerializer"""
+        recipes = Recipe.objects.filter(user=self.user).order_by('-id')
+        renderer = JSONRenderer()
+
+        expected = renderer.render(
+            RecipeSerializer(recipes.for_list(), many=True).data,
+        )
+        fast = renderer.render(RecipeListFastSerializer(
+            list(recipes.values(*RecipeListFastSerializer.value_fields)),
+        ).data)
+
+        self.assertEqual(fast, expected)
+
+    def test_api_parity(self):
+        """Test list responses are byte identical with the fast path"""
+        tag = Tag.objects.get(name='Vegan')
+        for url in [
+            RECIPES_URL,
+            f'{RECIPES_URL}?page_size=2',
+            f'{RECIPES_URL}?tags={tag.id}',
+        ]:
+            with self.settings(RECIPE_LIST_FAST_PATH=False):
+                expected = self.client.get(url)
+            with self.settings(RECIPE_LIST_FAST_PATH=True):
+                res = self.client.get(url)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res.content, expected.content)
+
+    def test_next_page_parity(self):
+        """Test cursors of the fast path continue where expected"""
+        with self.settings(RECIPE_LIST_FAST_PATH=True):
+            url = self.client.get(f'{RECIPES_URL}?page_size=2').data['next']
+            res = self.client.get(url)
+        with self.settings(RECIPE_LIST_FAST_PATH=False):
+            expected = self.client.get(url)
+
+        self.assertEqual(res.content, expected.content)
+
+    def test_benchmark_command(self):
+        """Test the benchmark command reports both paths"""
+        out = StringIO()
+        call_command(
+            'benchmark_recipe_list',
+            recipes=3,
+            repeat=1,
+            stdout=out,
+            stderr=out,
+        )
+
+        self.assertIn('faster', out.getvalue())
+        self.assertNotIn('differ', out.getvalue())
+        self.assertFalse(
+            get_user_model().objects.filter(
+                email='benchmark@example.com',
+            ).exists()
+        )
+
+    def test_benchmark_json_command(self):
+        """Test the JSON benchmark command compares encoders"""
+        out = StringIO()
+        call_command(
+            'benchmark_json',
+            recipes=3,
+            repeat=1,
+            stdout=out,
+            stderr=out,
+        )
+
+        self.assertIn('chunked', out.getvalue())
+        self.assertNotIn('differs', out.getvalue())
+        self.assertFalse(
+            get_user_model().objects.filter(
+                email='benchmark@example.com',
+            ).exists()
+        )
+
+
+class ConditionalRequestTests(TestCase):
+    """Test conditional GET requests of recipes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com', password='test123')
+        self.client.force_authenticate(self.user)
+        with committed():
+            self.recipe = create_recipe(user=self.user)
+
+    def assertNotModified(self, url, etag):
+        with self.assertNumQueries(1):
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+        self.assertEqual(res.content, b'')
+
+    def later(self, seconds=1):
+        """Pretend the request is served seconds after the last write"""
+        return patch(
+            'recipe.views.timezone.now',
+            return_value=timezone.now() + timedelta(seconds=seconds),
+        )
+
+    def test_list_not_modified(self):
+        """Test matching ETag is answered without loading recipes"""
+        with self.later():
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', res)
+        self.assertNotModified(RECIPES_URL, res['ETag'])
+
+    def test_not_modified_since(self):
+        """Test If-Modified-Since alone is answered once the second of
+        the last write is over"""
+        with self.later():
+            last_modified = self.client.get(RECIPES_URL)['Last-Modified']
+            res = self.client.get(
+                RECIPES_URL,
+                HTTP_IF_MODIFIED_SINCE=last_modified,
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_modified_in_same_second(self):
+        """Test a date of the second of the last write is never trusted,
+        another write may follow within that second"""
+        modified = UserDataVersion.objects.get(user=self.user).modified
+
+        res = self.client.get(
+            RECIPES_URL,
+            HTTP_IF_MODIFIED_SINCE=http_date(modified.timestamp()),
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('Last-Modified', res)
+
+    def test_detail_not_modified(self):
+        """Test matching ETag of recipe detail returns 304"""
+        url = detail_url(self.recipe.id)
+        res = self.client.get(url)
+
+        self.assertNotModified(url, res['ETag'])
+
+    def test_etag_depends_on_query(self):
+        """Test different filters get different ETags"""
+        res1 = self.client.get(RECIPES_URL)
+        res2 = self.client.get(RECIPES_URL, {'match': 'all'})
+
+        self.assertNotEqual(res1['ETag'], res2['ETag'])
+
+    def test_etag_changes_on_write(self):
+        """Test creating, updating, linking and deleting change ETag"""
+        etags = [self.client.get(RECIPES_URL)['ETag']]
+        with committed():
+            recipe = create_recipe(user=self.user)
+        etags.append(self.client.get(RECIPES_URL)['ETag'])
+        with committed():
+            self.client.patch(detail_url(recipe.id), {'title': 'New title'})
+        etags.append(self.client.get(RECIPES_URL)['ETag'])
+        with committed():
+            recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        etags.append(self.client.get(RECIPES_URL)['ETag'])
+        with committed():
+            recipe.delete()
+        etags.append(self.client.get(RECIPES_URL)['ETag'])
+
+        self.assertEqual(len(set(etags)), len(etags))
+
+    def test_linking_touches_recipe(self):
+        """Test linking a tag updates the recipe timestamp"""
+        updated_at = self.recipe.updated_at
+        with committed():
+            self.recipe.tags.add(
+                Tag.objects.create(user=self.user, name='Vegan'),
+            )
+        self.recipe.refresh_from_db()
+
+        self.assertGreater(self.recipe.updated_at, updated_at)
+
+    def test_write_bumps_version_once(self):
+        """Test a create with links bumps the data version once, without
+        touching the recipe it just saved"""
+        bump = patch.object(
+            UserDataVersion.objects,
+            'bump',
+            wraps=UserDataVersion.objects.bump,
+        )
+        with bump as bump, CaptureQueriesContext(connection) as queries:
+            with committed():
+                self.client.post(RECIPES_URL, {
+                    'title': 'Curry',
+                    'time_minutes': 10,
+                    'price': '4.00',
+                    'tags': [{'name': 'Vegan'}, {'name': 'Dinner'}],
+                    'ingredients': [{'name': 'Rice'}],
+                }, format='json')
+
+        bump.assert_called_once_with(self.user.id)
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE "core_recipe"')
+        ])
+
+    def test_other_user_write_keeps_etag(self):
+        """Test changes of another user do not change the ETag"""
+        etag = self.client.get(RECIPES_URL)['ETag']
+        with committed():
+            create_recipe(user=create_user(email='other@example.com'))
+
+        self.assertNotModified(RECIPES_URL, etag)
+
+    def test_stale_user_save_keeps_version(self):
+        """Test saving an outdated user object keeps the new version"""
+        # Loaded like a cached user, before the next write
+        self.user.refresh_from_db()
+        etag = self.client.get(RECIPES_URL)['ETag']
+        with committed():
+            create_recipe(user=self.user)
+        self.client.patch(
+            reverse('user:me'),
+            {'name': 'New name'},
+            format='json',
+        )
+
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_import_changes_etag(self):
+        """Test bulk imports, which send no signals, change the ETag"""
+        etag = self.client.get(RECIPES_URL)['ETag']
+        self.client.post(
+            IMPORT_URL,
+            [{'title': 'Imported', 'time_minutes': 5, 'price': '1.00'}],
+            format='json',
+        )
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class ResponseCacheTests(TestCase):
+    """Test caching of rendered recipe responses"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com', password='test123')
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(user=self.user)
+        cache.stats.reset()
+
+    def test_list_served_from_cache(self):
+        """Test repeated list requests are served from the cache"""
+        res1 = self.client.get(RECIPES_URL)
+        with self.assertNumQueries(1):
+            res2 = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res2.status_code, status.HTTP_200_OK)
+        self.assertEqual(res2.content, res1.content)
+        self.assertEqual(res2['ETag'], res1['ETag'])
+        self.assertEqual(
+            cache.stats.snapshot(),
+            {'hits': 1, 'misses': 1, 'hit_ratio': 0.5},
+        )
+
+    @override_settings(ALLOWED_HOSTS=['a.example.com', 'b.example.com'])
+    def test_cached_per_host(self):
+        """Test responses with links to one host are not served to
+        another"""
+        res1 = self.client.get(RECIPES_URL, HTTP_HOST='a.example.com')
+        res2 = self.client.get(RECIPES_URL, HTTP_HOST='b.example.com')
+
+        self.assertNotEqual(res2['ETag'], res1['ETag'])
+        self.assertEqual(cache.stats.snapshot()['hits'], 0)
+
+    def test_write_invalidates_cache(self):
+        """Test updates are visible on the next request"""
+        url = detail_url(self.recipe.id)
+        self.client.get(url)
+        with committed():
+            self.client.patch(url, {'title': 'New title'})
+        res = self.client.get(url)
+
+        self.assertEqual(res.data['title'], 'New title')
+
+    def test_linking_invalidates_cache(self):
+        """Test linking tags is visible on the next request"""
+        url = detail_url(self.recipe.id)
+        self.client.get(url)
+        with committed():
+            self.recipe.tags.add(
+                Tag.objects.create(user=self.user, name='Vegan'),
+            )
+        res = self.client.get(url)
+
+        self.assertEqual(res.data['tags'][0]['name'], 'Vegan')
+
+    def test_cache_per_user(self):
+        """Test users never get responses cached for someone else"""
+        self.client.get(RECIPES_URL)
+        other = create_user(email='other@example.com', password='test123')
+        self.client.force_authenticate(other)
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.data['results'], [])
+
+    @override_settings(RESPONSE_CACHE={'ALIAS': '', 'TIMEOUT': 60})
+    def test_cache_disabled(self):
+        """Test responses are not cached without a cache alias"""
+        self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL)
+
+        self.assertEqual(cache.stats.snapshot()['hits'], 0)
+
+    def test_stats_require_staff(self):
+        """Test cache statistics are only available to staff"""
+        res = self.client.get(CACHE_STATS_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.client.get(RECIPES_URL)
+        res = self.client.get(CACHE_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['misses'], 1)
+
+
+class RecipeExportTests(QueryBudgetMixin, TestCase):
+    """Tests for the recipe export API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='testuser@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def _export(self, **params):
+        """Export recipes and return response with its content"""
+        res = self.client.get(EXPORT_URL, params)
+        content = b''.join(res.streaming_content).decode()
+
+        return res, content
+
+    def test_export_ndjson(self):
+        """Test exporting recipes as one JSON document per line"""
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Thai'))
+        create_recipe(user=self.user)
+        other_user = create_user(email='other@example.com', password='pw12345')
+        create_recipe(user=other_user)
+
+        res, content = self._export()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        recipes = Recipe.objects.filter(user=self.user).order_by('-id')
+        serializer = RecipeDetailSerializer(recipes, many=True)
+        lines = content.splitlines()
+        self.assertEqual([json.loads(line) for line in lines], json.loads(
+            json.dumps(serializer.data)
+        ))
+
+    def test_export_json(self):
+        """Test exporting recipes as a JSON array"""
+        create_recipe(user=self.user)
+        create_recipe(user=self.user)
+
+        res, content = self._export(output='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/json')
+        data = json.loads(content)
+        self.assertEqual(len(data), 2)
+        self.assertIn('description', data[0])
+        self.assertIn('image', data[0])
+
+    def test_export_json_empty(self):
+        """Test exporting no recipes gives an empty JSON array"""
+        res, content = self._export(output='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(content), [])
+
+    def test_export_invalid_output_error(self):
+        """Test unknown export output returns error"""
+        res = self.client.get(EXPORT_URL, {'output': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @patch('recipe.exports.CHUNK_SIZE', 2)
+    def test_export_reads_in_chunks(self):
+        """Test export runs a fixed number of queries per chunk"""
+        for i in range(5):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Tag {i}'),
+            )
+
+        with self.assertNumQueries(3 * 3 + 1):
+            res, content = self._export()
+
+        ids = [json.loads(line)['id'] for line in content.splitlines()]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        self.assertEqual(len(ids), 5)
+
+    def test_export_query_count_constant(self):
+        """Test export queries do not grow with recipes in one chunk"""
+        def add_recipes(count):
+            for i in range(count):
+                recipe = create_recipe(user=self.user)
+                recipe.tags.add(
+                    Tag.objects.create(user=self.user, name=f'{count} {i}'),
+                )
+
+        def export(count):
+            res, content = self._export()
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertConstantQueries(export, add_recipes, budget=4)
+
+
+class RecipeImportTests(QueryBudgetMixin, TestCase):
+    """Tests for the recipe bulk import API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='testuser@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def _rows(self, count):
+        """Return valid import rows sharing tags and ingredients"""
+        return [
+            {
+                'title': f'Recipe {i}',
+                'time_minutes': 10 + i,
+                'price': '5.50',
+                'description': 'Imported recipe',
+                'tags': [{'name': 'Imported'}, {'name': f'Tag {i % 3}'}],
+                'ingredients': [{'name': 'Salt'}],
+            }
+            for i in range(count)
+        ]
+
+    def test_import_json(self):
+        """Test importing a JSON array of recipes"""
+        Tag.objects.create(user=self.user, name='Imported')
+        rows = self._rows(4)
+
+        res = self.client.post(IMPORT_URL, rows, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data, {'created': 4, 'errors': []})
+        recipes = Recipe.objects.filter(user=self.user).order_by('id')
+        self.assertEqual(
+            [recipe.title for recipe in recipes],
+            [row['title'] for row in rows],
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 4)
+        self.assertEqual(recipes[1].description, 'Imported recipe')
+        self.assertEqual(
+            set(recipes[1].tags.values_list('name', flat=True)),
+            {'Imported', 'Tag 1'},
+        )
+        self.assertEqual(recipes[3].ingredients.get().name, 'Salt')
+
+    def test_import_reports_row_errors(self):
+        """Test invalid rows are reported and valid rows imported"""
+        rows = self._rows(3)
+        rows[1]['price'] = 'free'
+        del rows[2]['title']
+
+        res = self.client.post(IMPORT_URL, rows, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['created'], 1)
+        self.assertEqual(
+            [error['row'] for error in res.data['errors']],
+            [1, 2],
+        )
+        self.assertIn('price', res.data['errors'][0]['errors'])
+        self.assertIn('title', res.data['errors'][1]['errors'])
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 1)
+
+    def test_import_all_invalid_error(self):
+        """Test import with no valid rows returns error"""
+        res = self.client.post(IMPORT_URL, [{'title': ''}], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['created'], 0)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_import_not_a_list_error(self):
+        """Test import of a single object returns error"""
+        res = self.client.post(IMPORT_URL, self._rows(1)[0], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_ndjson(self):
+        """Test importing newline delimited JSON"""
+        body = '\n'.join(json.dumps(row) for row in self._rows(2))
+
+        res = self.client.post(
+            IMPORT_URL,
+            body + '\nnot json\n',
+            content_type='application/x-ndjson',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['created'], 2)
+        self.assertEqual(res.data['errors'][0]['row'], 2)
+
+    def test_import_csv_file(self):
+        """Test importing an uploaded CSV file"""
+        content = (
+            'title,time_minutes,price,tags,ingredients\n'
+            'Curry,30,5.50,Thai|Dinner,Chilli|Garlic\n'
+            'Toast,5,1.00,,\n'
+        )
+        with tempfile.NamedTemporaryFile(suffix='.csv') as csv_file:
+            csv_file.write(content.encode())
+            csv_file.seek(0)
+            res = self.client.post(
+                IMPORT_URL,
+                {'file': csv_file},
+                format='multipart',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['created'], 2)
+        curry = Recipe.objects.get(user=self.user, title='Curry')
+        self.assertEqual(
+            set(curry.tags.values_list('name', flat=True)),
+            {'Thai', 'Dinner'},
+        )
+        self.assertEqual(curry.ingredients.count(), 2)
+        toast = Recipe.objects.get(user=self.user, title='Toast')
+        self.assertEqual(toast.tags.count(), 0)
+
+    def test_import_undecodable_file_error(self):
+        """Test uploads that are not valid text are rejected"""
+        for suffix in ('.csv', '.ndjson'):
+            with tempfile.NamedTemporaryFile(suffix=suffix) as upload:
+                upload.write(b'\xff\xfe')
+                upload.seek(0)
+                res = self.client.post(
+                    IMPORT_URL,
+                    {'file': upload},
+                    format='multipart',
+                )
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('parse error', res.data['detail'])
+
+    def test_import_malformed_csv_error(self):
+        """Test CSV the csv module cannot read is rejected"""
+        with tempfile.NamedTemporaryFile(suffix='.csv') as upload:
+            upload.write(b'title\n' + b'x' * (csv.field_size_limit() + 1))
+            upload.seek(0)
+            res = self.client.post(
+                IMPORT_URL,
+                {'file': upload},
+                format='multipart',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @skipUnless(
+        connection.features.can_return_rows_from_bulk_insert,
+        'Backend saves imported recipes one by one',
+    )
+    def test_import_query_count_constant(self):
+        """Test import queries do not grow with number of rows"""
+        def remove_attrs(count):
+            Tag.objects.filter(user=self.user).delete()
+            Ingredient.objects.filter(user=self.user).delete()
+
+        def bulk_import(count):
+            res = self.client.post(
+                IMPORT_URL,
+                self._rows(count),
+                format='json',
+            )
+            self.assertEqual(res.data['created'], count)
+
+        self.assertConstantQueries(bulk_import, remove_attrs, sizes=(2, 20))
+
+
 class ImageUploadTests(TestCase):
     """Tests for the image upload API"""
 
@@ -403,6 +1322,8 @@ class ImageUploadTests(TestCase):
         self.recipe = create_recipe(user=self.user)
 
     def tearDown(self):
+        if self.recipe.image:
+            delete_derivatives(self.recipe.image.name)
         self.recipe.image.delete()
 
     def test_upload_image(self):
@@ -420,6 +1341,119 @@ class ImageUploadTests(TestCase):
         self.assertIn('image', res.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    @override_settings(RECIPE_IMAGE_WORKERS=0)
+    def test_upload_image_creates_derivatives(self):
+        """Test uploading an image generates resized derivatives"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            img = Image.new('RGB', (2000, 1000))
+            img.save(image_file, format='JPEG')
+            image_file.seek(0)
+            with self.captureOnCommitCallbacks(execute=True):
+                res = self.client.post(
+                    url,
+                    {'image': image_file},
+                    format='multipart',
+                )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        for key, options in available_derivatives().items():
+            path = os.path.join(
+                os.path.dirname(self.recipe.image.path),
+                os.path.basename(derivative_path(self.recipe.image.name, key)),
+            )
+            with Image.open(path) as derivative:
+                self.assertEqual(derivative.format, options['format'])
+                self.assertLessEqual(derivative.width, options['size'][0])
+                self.assertEqual(derivative.width, derivative.height * 2)
+
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(
+            set(res.data['image_variants']),
+            set(available_derivatives()),
+        )
+        self.assertTrue(
+            res.data['image_variants']['thumbnail'].endswith('_thumbnail.jpg')
+        )
+
+    @override_settings(RECIPE_IMAGE_WORKERS=0)
+    def test_detail_reads_no_storage(self):
+        """Test image variants are listed without looking up files"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+            image_file.seek(0)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(
+                    url,
+                    {'image': image_file},
+                    format='multipart',
+                )
+
+        with patch.object(default_storage, 'exists') as exists:
+            res = self.client.get(detail_url(self.recipe.id))
+
+        exists.assert_not_called()
+        self.assertEqual(
+            set(res.data['image_variants']),
+            set(available_derivatives()),
+        )
+
+    @override_settings(RECIPE_IMAGE_WORKERS=0)
+    def test_derivatives_refresh_cached_detail(self):
+        """Test responses served before derivatives exist are replaced"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+            image_file.seek(0)
+            with self.captureOnCommitCallbacks() as callbacks:
+                self.client.post(
+                    url,
+                    {'image': image_file},
+                    format='multipart',
+                )
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertEqual(res.data['image_variants'], {})
+
+        for callback in callbacks:
+            callback()
+        res = self.client.get(
+            detail_url(self.recipe.id),
+            HTTP_IF_NONE_MATCH=res['ETag'],
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('thumbnail', res.json()['image_variants'])
+        self.recipe.refresh_from_db()
+
+    @override_settings(RECIPE_IMAGE_WORKERS=0)
+    def test_replace_image_deletes_old_derivatives(self):
+        """Test uploading a new image removes old derivatives"""
+        url = image_upload_url(self.recipe.id)
+        names = []
+        for _ in range(2):
+            with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+                Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+                image_file.seek(0)
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.client.post(
+                        url,
+                        {'image': image_file},
+                        format='multipart',
+                    )
+            self.recipe.refresh_from_db()
+            names.append(self.recipe.image.name)
+
+        self.assertFalse(
+            default_storage.exists(derivative_path(names[0], 'thumbnail'))
+        )
+        self.assertTrue(
+            default_storage.exists(derivative_path(names[1], 'thumbnail'))
+        )
+        default_storage.delete(names[0])
+
     def test_upload_image_bad_request(self):
         """Test uploading non image data to a recipe"""
         url = image_upload_url(self.recipe.id)
@@ -0,0 +1,270 @@
+"""
+Tests for recipe search
+"""
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import (
+    Recipe,
+    Ingredient,
+    RecipeSearchDocument,
+)
+from core.testing import QueryBudgetMixin
+from recipe import search
+from recipe.search import search_recipes, tokenize
+
+
+SEARCH_URL = reverse('recipe:recipe-search')
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """Create and return a new user"""
+    return get_user_model().objects.create_user(email, password)
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 22,
+        'price': Decimal('5.25'),
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class SearchIndexTests(TestCase):
+    """Test search documents and ranking"""
+
+    def setUp(self):
+        self.user = create_user()
+
+    def test_tokenize(self):
+        """Test text is split into lower case words"""
+        self.assertEqual(
+            tokenize('Thai Green-Curry, 2 bowls!'),
+            ['thai', 'green', 'curry', '2', 'bowls'],
+        )
+
+    def test_document_created_on_save(self):
+        """Test saving a recipe stores its search document"""
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = create_recipe(self.user, title='Pad Thai')
+
+        document = RecipeSearchDocument.objects.get(recipe=recipe)
+        self.assertEqual(document.title, 'Pad Thai')
+        self.assertEqual(document.user, self.user)
+
+    def test_search_ranks_title_first(self):
+        """Test matches in title rank above ingredients and description"""
+        with self.captureOnCommitCallbacks(execute=True):
+            in_description = create_recipe(
+                self.user,
+                title='Soup',
+                description='Add basil at the end',
+            )
+            in_ingredients = create_recipe(self.user, title='Pasta')
+            in_ingredients.ingredients.add(
+                Ingredient.objects.create(user=self.user, name='Basil'),
+            )
+            in_title = create_recipe(self.user, title='Basil Pesto')
+            create_recipe(self.user, title='Toast')
+
+        ids = search_recipes(self.user, 'basil', 10)
+
+        self.assertEqual(
+            ids,
+            [in_title.id, in_ingredients.id, in_description.id],
+        )
+
+    def test_search_all_terms_required(self):
+        """Test every search term must match"""
+        with self.captureOnCommitCallbacks(execute=True):
+            curry = create_recipe(self.user, title='Thai Curry')
+            create_recipe(self.user, title='Thai Salad')
+
+        ids = search_recipes(self.user, 'thai curry', 10)
+
+        self.assertEqual(ids, [curry.id])
+
+    def test_search_prefix(self):
+        """Test partial words match"""
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = create_recipe(self.user, title='Chocolate Brownies')
+
+        self.assertEqual(search_recipes(self.user, 'choc', 10), [recipe.id])
+
+    def test_search_typo(self):
+        """Test misspelled words still match"""
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = create_recipe(self.user, title='Spaghetti Carbonara')
+
+        ids = search_recipes(self.user, 'spagetti', 10)
+
+        self.assertEqual(ids, [recipe.id])
+
+    def test_search_limited_to_user(self):
+        """Test search only returns recipes of the user"""
+        other_user = create_user(email='other@example.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            create_recipe(other_user, title='Pancakes')
+
+        self.assertEqual(search_recipes(self.user, 'pancakes', 10), [])
+
+    def test_search_limit(self):
+        """Test number of results is limited"""
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(3):
+                create_recipe(self.user, title='Omelette')
+
+        self.assertEqual(len(search_recipes(self.user, 'omelette', 2)), 2)
+
+    def test_index_updated_on_ingredient_changes(self):
+        """Test renaming, removing and deleting ingredients reindexes"""
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = create_recipe(self.user, title='Salad')
+            ingredient = Ingredient.objects.create(
+                user=self.user,
+                name='Feta',
+            )
+            recipe.ingredients.add(ingredient)
+        self.assertEqual(search_recipes(self.user, 'feta', 10), [recipe.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ingredient.name = 'Halloumi'
+            ingredient.save()
+        self.assertEqual(search_recipes(self.user, 'feta', 10), [])
+        self.assertEqual(
+            search_recipes(self.user, 'halloumi', 10),
+            [recipe.id],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ingredient.recipe_set.clear()
+        self.assertEqual(search_recipes(self.user, 'halloumi', 10), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.ingredients.add(ingredient)
+            ingredient.delete()
+        self.assertEqual(search_recipes(self.user, 'halloumi', 10), [])
+
+    def test_indexed_once_per_transaction(self):
+        """Test a recipe saved and linked in a transaction is indexed once,
+        after commit, and saves of other fields do not reindex it"""
+        with patch(
+            'recipe.search.index_recipes',
+            wraps=search.index_recipes,
+        ) as index:
+            with self.captureOnCommitCallbacks(execute=True):
+                recipe = create_recipe(self.user, title='Curry')
+                recipe.ingredients.add(
+                    Ingredient.objects.create(user=self.user, name='Rice'),
+                    Ingredient.objects.create(user=self.user, name='Lime'),
+                )
+                recipe.ingredients.remove(Ingredient.objects.get(
+                    name='Lime',
+                ))
+                self.assertFalse(RecipeSearchDocument.objects.exists())
+            index.assert_called_once_with({recipe.id})
+
+            with self.captureOnCommitCallbacks(execute=True):
+                recipe.price = Decimal('9.00')
+                recipe.save(update_fields=['price'])
+            index.assert_called_once()
+
+        self.assertEqual(search_recipes(self.user, 'rice', 10), [recipe.id])
+        self.assertEqual(search_recipes(self.user, 'lime', 10), [])
+
+    def test_rebuild_search_index(self):
+        """Test rebuilding the index restores missing documents"""
+        recipe = create_recipe(self.user, title='Risotto')
+        RecipeSearchDocument.objects.all().delete()
+
+        call_command('rebuild_search_index', stdout=StringIO())
+
+        self.assertEqual(search_recipes(self.user, 'risotto', 10), [recipe.id])
+
+
+class SearchApiTests(QueryBudgetMixin, TestCase):
+    """Test the recipe search API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def test_search(self):
+        """Test searching recipes returns ranked recipes"""
+        with self.captureOnCommitCallbacks(execute=True):
+            curry = create_recipe(self.user, title='Green Curry')
+            create_recipe(self.user, title='Fried Rice')
+
+        res = self.client.get(SEARCH_URL, {'q': 'curry'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data], [curry.id])
+        self.assertEqual(res.data[0]['title'], 'Green Curry')
+
+    def test_search_query_count_constant(self):
+        """Test search queries do not grow with number of matches"""
+        def add_recipes(count):
+            with self.captureOnCommitCallbacks(execute=True):
+                for i in range(count):
+                    recipe = create_recipe(self.user, title=f'Curry {i}')
+                    recipe.ingredients.add(
+                        Ingredient.objects.create(
+                            user=self.user,
+                            name=f'Rice {count} {i}',
+                        ),
+                    )
+
+        def search(count):
+            res = self.client.get(SEARCH_URL, {'q': 'curry'})
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertConstantQueries(search, add_recipes, budget=6)
+
+    def test_search_empty_query(self):
+        """Test empty query returns no recipes"""
+        create_recipe(self.user)
+
+        res = self.client.get(SEARCH_URL, {'q': ''})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [])
+
+    def test_search_invalid_limit_error(self):
+        """Test invalid limit returns error"""
+        for limit in ['x', '0', '-1']:
+            res = self.client.get(SEARCH_URL, {'q': 'curry', 'limit': limit})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_imported_recipes(self):
+        """Test imported recipes are indexed"""
+        rows = [{
+            'title': 'Imported Lasagne',
+            'time_minutes': 60,
+            'price': '8.00',
+            'ingredients': [{'name': 'Ricotta'}],
+        }]
+        self.client.post(
+            reverse('recipe:recipe-bulk-import'),
+            rows,
+            format='json',
+        )
+
+        res = self.client.get(SEARCH_URL, {'q': 'ricotta'})
+
+        self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data[0]['title'], 'Imported Lasagne')
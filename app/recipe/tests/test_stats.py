@@ -0,0 +1,371 @@
+"""
+Tests for denormalized recipe counts and stats
+"""
+import importlib
+import io
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import Mock, patch
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from PIL import Image
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import (
+    Recipe,
+    RecipeStats,
+    Tag,
+    Ingredient,
+)
+
+from recipe import stats
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+STATS_URL = reverse('recipe:stats')
+IMPORT_URL = reverse('recipe:recipe-bulk-import')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """Create and return a new user"""
+    return get_user_model().objects.create_user(email, password)
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 20,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def recipe_counts(model):
+    return dict(model.objects.values_list('name', 'recipe_count'))
+
+
+class RecipeCountTests(TestCase):
+    """Test recipe counts follow writes"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self, title, tags, ingredients=(), **params):
+        payload = {
+            'title': title,
+            'time_minutes': 10,
+            'price': '4.00',
+            'tags': [{'name': name} for name in tags],
+            'ingredients': [{'name': name} for name in ingredients],
+        }
+        payload.update(params)
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(RECIPES_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data['id']
+
+    def test_counts_on_create_update_delete(self):
+        """Test counts change with recipes created, updated and deleted"""
+        first = self.create('Curry', ['Dinner', 'Vegan'], ['Rice'])
+        second = self.create('Salad', ['Vegan'], ['Rice', 'Lime'])
+        self.assertEqual(recipe_counts(Tag), {'Dinner': 1, 'Vegan': 2})
+        self.assertEqual(recipe_counts(Ingredient), {'Rice': 2, 'Lime': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(detail_url(first), {
+                'tags': [{'name': 'Dinner'}],
+                'ingredients': [],
+            }, format='json')
+        self.assertEqual(recipe_counts(Tag), {'Dinner': 1, 'Vegan': 1})
+        self.assertEqual(recipe_counts(Ingredient), {'Rice': 1, 'Lime': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(detail_url(second))
+        self.assertEqual(recipe_counts(Tag), {'Dinner': 1, 'Vegan': 0})
+        self.assertEqual(recipe_counts(Ingredient), {'Rice': 0, 'Lime': 0})
+
+    def test_counts_on_reverse_links(self):
+        """Test linking recipes from the tag side updates its count"""
+        with self.captureOnCommitCallbacks(execute=True):
+            tag = Tag.objects.create(user=self.user, name='Quick')
+            recipes = [create_recipe(self.user) for _ in range(3)]
+            tag.recipe_set.add(*recipes)
+        tag.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.recipe_set.clear()
+        tag.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 0)
+
+    def test_counts_on_clear(self):
+        """Test clearing the tags of a recipe updates their counts"""
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = create_recipe(self.user)
+            recipe.tags.add(
+                *Tag.objects.get_or_create_many(self.user, ['A', 'B']),
+            )
+        self.assertEqual(recipe_counts(Tag), {'A': 1, 'B': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.tags.clear()
+
+        self.assertEqual(recipe_counts(Tag), {'A': 0, 'B': 0})
+
+    def test_counts_on_import(self):
+        """Test bulk imports, which send no signals, update counts"""
+        res = self.client.post(IMPORT_URL, [
+            {'title': 'Soup', 'time_minutes': 30, 'price': '2.00',
+             'tags': [{'name': 'Winter'}]},
+            {'title': 'Stew', 'time_minutes': 90, 'price': '8.00',
+             'tags': [{'name': 'Winter'}], 'ingredients': [{'name': 'Beef'}]},
+        ], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(recipe_counts(Tag), {'Winter': 2})
+        self.assertEqual(recipe_counts(Ingredient), {'Beef': 1})
+        stats = RecipeStats.objects.get(user=self.user)
+        self.assertEqual(stats.recipe_count, 2)
+        self.assertEqual(stats.average_time_minutes, 60)
+
+    def test_count_in_tag_list(self):
+        """Test tags are listed with their recipe count"""
+        self.create('Curry', ['Vegan'])
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.data['results'][0]['recipe_count'], 1)
+
+    def test_nested_tags_without_count(self):
+        """Test recipes list their tags without recipe counts"""
+        recipe_id = self.create('Curry', ['Vegan'], ['Rice'])
+
+        res = self.client.get(detail_url(recipe_id))
+
+        self.assertEqual(list(res.data['tags'][0]), ['id', 'name'])
+        self.assertEqual(list(res.data['ingredients'][0]), ['id', 'name'])
+
+
+class RecipeStatsTests(TestCase):
+    """Test recipe totals of users and their endpoint"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_auth_required(self):
+        res = APIClient().get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_empty_stats(self):
+        """Test users without recipes get zero totals"""
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {
+            'recipe_count': 0,
+            'average_time_minutes': None,
+            'min_price': None,
+            'max_price': None,
+            'top_tags': [],
+            'top_ingredients': [],
+        })
+
+    def test_stats(self):
+        """Test totals cover the user's recipes only"""
+        with self.captureOnCommitCallbacks(execute=True):
+            create_recipe(self.user, time_minutes=10, price=Decimal('2.50'))
+            recipe = create_recipe(self.user, time_minutes=30,
+                                   price=Decimal('7.25'))
+            recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+            Tag.objects.create(user=self.user, name='Unused')
+            create_recipe(create_user('other@example.com'),
+                          price=Decimal('99'))
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['recipe_count'], 2)
+        self.assertEqual(res.data['average_time_minutes'], 20)
+        self.assertEqual(res.data['min_price'], '2.50')
+        self.assertEqual(res.data['max_price'], '7.25')
+        self.assertEqual(res.data['top_tags'], [
+            {'id': recipe.tags.get().id, 'name': 'Vegan', 'recipe_count': 1},
+        ])
+
+    def test_stats_on_update_and_delete(self):
+        """Test totals follow updated and deleted recipes"""
+        with self.captureOnCommitCallbacks(execute=True):
+            cheap = create_recipe(self.user, price=Decimal('1.00'))
+            create_recipe(self.user, price=Decimal('3.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cheap.price = Decimal('2.00')
+            cheap.save()
+        stats = RecipeStats.objects.get(user=self.user)
+        self.assertEqual(stats.min_price, Decimal('2.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cheap.delete()
+        stats.refresh_from_db()
+        self.assertEqual(stats.min_price, Decimal('3.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.filter(user=self.user).delete()
+        stats.refresh_from_db()
+        self.assertEqual(stats.recipe_count, 0)
+        self.assertIsNone(stats.min_price)
+
+    def test_refreshed_once_per_transaction(self):
+        """Test a write with many links recounts once, after commit"""
+        refresh = patch(
+            'recipe.stats.refresh_user_stats',
+            wraps=stats.refresh_user_stats,
+        )
+        count = patch('recipe.stats.count_recipes', wraps=stats.count_recipes)
+        with refresh as refresh, count as count:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(RECIPES_URL, {
+                    'title': 'Curry',
+                    'time_minutes': 10,
+                    'price': '4.00',
+                    'tags': [{'name': 'Vegan'}, {'name': 'Dinner'}],
+                    'ingredients': [{'name': 'Rice'}, {'name': 'Lime'}],
+                }, format='json')
+                refresh.assert_not_called()
+
+        refresh.assert_called_once_with({self.user.id})
+        self.assertEqual(count.call_count, 2)
+        self.assertEqual(RecipeStats.objects.get().recipe_count, 1)
+        self.assertEqual(recipe_counts(Ingredient), {'Rice': 1, 'Lime': 1})
+
+    def test_unrelated_save_keeps_stats(self):
+        """Test saving fields the totals ignore recomputes nothing"""
+        recipe = create_recipe(self.user)
+
+        with patch('recipe.stats.refresh_user_stats') as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                recipe.title = 'Renamed'
+                recipe.save(update_fields=['title', 'updated_at'])
+
+        refresh.assert_not_called()
+
+    def test_delete_user(self):
+        """Test deleting a user with recipes deletes their stats"""
+        create_recipe(self.user)
+
+        self.user.delete()
+
+        self.assertFalse(RecipeStats.objects.exists())
+
+
+class BackfillRecipeStatsMigrationTests(TestCase):
+    """Test the migration filling in counts of existing recipes"""
+
+    def test_backfill(self):
+        user = create_user()
+        recipe = create_recipe(user, time_minutes=40)
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=user, name='Salt'),
+        )
+        Ingredient.objects.update(recipe_count=0)
+        RecipeStats.objects.all().delete()
+        migration = importlib.import_module(
+            'core.migrations.0014_backfill_recipe_stats',
+        )
+
+        migration.backfill_recipe_stats(apps, None)
+
+        self.assertEqual(recipe_counts(Ingredient), {'Salt': 1})
+        stats = RecipeStats.objects.get(user=user)
+        self.assertEqual(stats.recipe_count, 1)
+        self.assertEqual(stats.average_time_minutes, 40)
+
+
+class RebuildRecipeStatsCommandTests(TestCase):
+    """Test rebuilding counts and stats in bulk"""
+
+    def test_rebuild(self):
+        """Test stale counts and totals are recomputed"""
+        user = create_user()
+        recipe = create_recipe(user, time_minutes=15)
+        recipe.tags.add(Tag.objects.create(user=user, name='Vegan'))
+        Tag.objects.update(recipe_count=7)
+        RecipeStats.objects.all().delete()
+        out = StringIO()
+
+        call_command('rebuild_recipe_stats', batch_size=1, stdout=out)
+
+        self.assertEqual(recipe_counts(Tag), {'Vegan': 1})
+        stats = RecipeStats.objects.get(user=user)
+        self.assertEqual(stats.recipe_count, 1)
+        self.assertEqual(stats.average_time_minutes, 15)
+        self.assertIn('Rebuilt recipe stats of 1 users.', out.getvalue())
+
+
+# SQLite ignores select_for_update(), make it fail outside transactions
+# like PostgreSQL does, without adding FOR UPDATE it cannot parse.
+@patch.object(connection.features, 'has_select_for_update', True)
+@patch.object(connection.ops, 'for_update_sql', Mock(return_value=''))
+@override_settings(RECIPE_IMAGE_WORKERS=0)
+class RecipeStatsAutocommitTests(TransactionTestCase):
+    """Test stats are refreshed by writes outside transactions"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(self.user)
+
+    def tearDown(self):
+        self.recipe.refresh_from_db()
+        if self.recipe.image:
+            self.recipe.image.delete()
+
+    def test_upload_image(self):
+        """Test uploading an image, saved in autocommit mode, succeeds"""
+        content = io.BytesIO()
+        Image.new('RGB', (10, 10)).save(content, format='JPEG')
+        content.seek(0)
+        content.name = 'recipe.jpg'
+
+        with patch('recipe.views.images.schedule_derivatives'):
+            res = self.client.post(
+                reverse('recipe:recipe-upload-image', args=[self.recipe.id]),
+                {'image': content},
+                format='multipart',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            RecipeStats.objects.get(user=self.user).recipe_count,
+            1,
+        )
+
+    def test_count_recipes(self):
+        """Test counting recipes locks tags in a transaction of its own"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+
+        self.recipe.tags.add(tag)
+
+        tag.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 1)
@@ -9,6 +9,7 @@ from rest_framework.test import APIClient
 from rest_framework import status
 
 from core.models import Tag
+from core.testing import QueryBudgetMixin, committed
 
 from recipe.serializers import TagSerializer
 
@@ -39,7 +40,7 @@ class PublicTagsApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateTagsApiTests(TestCase):
+class PrivateTagsApiTests(QueryBudgetMixin, TestCase):
     """Test authenticated API requests"""
 
     def setUp(self):
@@ -58,7 +59,25 @@ class PrivateTagsApiTests(TestCase):
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
+
+    def test_tags_paginated_by_name(self):
+        """Test tags are listed page by page ordered by name"""
+        for name in ['Breakfast', 'Dessert', 'Lunch', 'Vegan', 'Dinner']:
+            Tag.objects.create(user=self.user, name=name)
+
+        names = []
+        url = f'{TAGS_URL}?page_size=2'
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            names.extend(tag['name'] for tag in res.data['results'])
+            url = res.data['next']
+
+        self.assertEqual(
+            names,
+            ['Vegan', 'Lunch', 'Dinner', 'Dessert', 'Breakfast'],
+        )
 
     def test_tags_limited_to_user(self):
         """Test list of tags only accessible to auth user"""
@@ -69,9 +88,9 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.get(TAGS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
-        self.assertEqual(res.data[0]['id'], tag.id)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
+        self.assertEqual(res.data['results'][0]['id'], tag.id)
 
     def test_update_tag(self):
         """Test updating a tag"""
@@ -84,6 +103,18 @@ class PrivateTagsApiTests(TestCase):
         tag.refresh_from_db()
         self.assertEqual(tag.name, payload['name'])
 
+    def test_update_tag_existing_name_error(self):
+        """Test renaming a tag to a name already used returns error"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        tag = Tag.objects.create(user=self.user, name='Dessert')
+        payload = {'name': 'Vegan'}
+
+        res = self.client.patch(detail_url(tag.id), payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'Dessert')
+
     def test_delete_tag(self):
         """Test deleting a tag"""
         tag = Tag.objects.create(user=self.user, name='Test1')
@@ -93,3 +124,39 @@ class PrivateTagsApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
         tags = Tag.objects.filter(user=self.user)
         self.assertFalse(tags.exists())
+
+    def test_tags_not_modified(self):
+        """Test listing tags with a matching ETag returns 304"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        etag = self.client.get(TAGS_URL)['ETag']
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with committed():
+            self.client.patch(detail_url(tag.id), {'name': 'Dessert'})
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_list_tags_query_count_constant(self):
+        """Test listing tags runs the same queries for any count"""
+        def add_tags(count):
+            Tag.objects.get_or_create_many(
+                self.user,
+                [f'Tag {count} {i}' for i in range(count)],
+            )
+
+        def list_tags(count):
+            res = self.client.get(TAGS_URL)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertConstantQueries(list_tags, add_tags, budget=2)
+
+    def test_update_tag_query_budget(self):
+        """Test updating a tag stays within the query budget"""
+        tag = Tag.objects.create(user=self.user, name='Sugar')
+
+        with self.assertQueryBudget(5):
+            res = self.client.patch(detail_url(tag.id), {'name': 'Salt'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
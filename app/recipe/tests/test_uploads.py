@@ -0,0 +1,126 @@
+"""
+Tests for streaming recipe image uploads
+"""
+import io
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Recipe
+from recipe.uploads import BoundedImageUploadHandler, ImageUploadRejected
+
+
+def image_upload_url(recipe_id):
+    """Create and return an image upload URL"""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def image_bytes(size, format='PNG'):
+    """Return an encoded blank image"""
+    content = io.BytesIO()
+    Image.new('RGB', size).save(content, format=format)
+    return content.getvalue()
+
+
+class BoundedImageUploadHandlerTests(TestCase):
+    """Tests for the bounded image upload handler"""
+
+    def start_file(self):
+        handler = BoundedImageUploadHandler()
+        handler.new_file('image', 'image.png', 'image/png', None)
+        return handler
+
+    def test_accepts_image_within_limits(self):
+        """Test a valid image is streamed to a temporary file"""
+        data = image_bytes((100, 50))
+        handler = self.start_file()
+        handler.receive_data_chunk(data, 0)
+        uploaded = handler.file_complete(len(data))
+
+        self.assertEqual(uploaded.read(), data)
+        self.assertEqual(handler.image_size, (100, 50))
+
+    @override_settings(RECIPE_IMAGE_MAX_PIXELS=100)
+    def test_rejects_too_many_pixels_from_header(self):
+        """Test images are rejected from the first chunk alone"""
+        data = image_bytes((20, 20))
+        handler = self.start_file()
+
+        with self.assertRaisesMessage(ImageUploadRejected, 'pixels'):
+            handler.receive_data_chunk(data[:handler.chunk_size], 0)
+        self.assertTrue(handler.file.closed)
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=1000)
+    def test_rejects_oversized_request_before_reading(self):
+        """Test a declared body larger than the limit is rejected"""
+        handler = BoundedImageUploadHandler()
+
+        with self.assertRaises(ImageUploadRejected):
+            handler.handle_raw_input(None, {}, 10 ** 9, b'boundary')
+
+    def test_rejects_unrecognized_header(self):
+        """Test data that is not an image is rejected once complete"""
+        handler = self.start_file()
+        handler.receive_data_chunk(b'not an image', 0)
+
+        with self.assertRaisesMessage(ImageUploadRejected, 'valid image'):
+            handler.file_complete(12)
+
+
+class ImageUploadLimitsTests(TestCase):
+    """Tests for limits of the image upload API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
+
+    def upload(self, data, suffix='.png'):
+        with tempfile.NamedTemporaryFile(suffix=suffix) as image_file:
+            image_file.write(data)
+            image_file.seek(0)
+            return self.client.post(
+                image_upload_url(self.recipe.id),
+                {'image': image_file},
+                format='multipart',
+            )
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=1000)
+    def test_upload_too_large(self):
+        """Test uploads over the size limit are rejected"""
+        res = self.upload(b'\0' * 2000 + image_bytes((10, 10)))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    @override_settings(RECIPE_IMAGE_MAX_PIXELS=10_000)
+    def test_upload_too_many_pixels(self):
+        """Test uploads with too large dimensions are rejected"""
+        res = self.upload(image_bytes((200, 200)))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('pixels', str(res.data))
+
+    def test_upload_unsupported_format(self):
+        """Test uploads of formats other than web images are rejected"""
+        res = self.upload(image_bytes((10, 10), format='BMP'), '.bmp')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('BMP', str(res.data))
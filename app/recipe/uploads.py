@@ -0,0 +1,93 @@
+"""
+Streaming upload handling for recipe images
+"""
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http.multipartparser import MultiPartParserError
+
+from PIL import Image
+
+
+# Multipart boundaries and headers sent along with the image
+MULTIPART_OVERHEAD = 64 * 2 ** 10
+# Bytes read at most before the image header must be recognized
+MAX_HEADER_SIZE = 256 * 2 ** 10
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+
+
+class ImageUploadRejected(MultiPartParserError):
+    """Upload stopped because it is not an acceptable image"""
+
+
+class BoundedImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    Stream uploaded images to a temporary file chunk by chunk, rejecting
+    them as soon as the size limit is exceeded or the header read so far
+    describes an image with an unsupported format or too many pixels.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_size = settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE
+        self.max_pixels = settings.RECIPE_IMAGE_MAX_PIXELS
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        if content_length > self.max_size + MULTIPART_OVERHEAD:
+            raise ImageUploadRejected(self._too_large_message())
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.image_size = None
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self._reject(self._too_large_message())
+
+        super().receive_data_chunk(raw_data, start)
+        if self.image_size is None:
+            self._check_header(complete=False)
+
+    def file_complete(self, file_size):
+        if self.image_size is None:
+            self._check_header(complete=True)
+
+        return super().file_complete(file_size)
+
+    def _check_header(self, complete):
+        """Identify image from bytes written so far, without decoding it"""
+        try:
+            image_format, self.image_size = self._read_header()
+        except Image.DecompressionBombError:
+            self._reject('Image has too many pixels.')
+        except (OSError, SyntaxError, ValueError):
+            if complete or self.received >= MAX_HEADER_SIZE:
+                self._reject('Upload a valid image.')
+            return
+
+        width, height = self.image_size
+        if image_format not in ALLOWED_FORMATS:
+            self._reject(f'Image format {image_format} is not supported.')
+        if width * height > self.max_pixels:
+            self._reject('Image has too many pixels.')
+
+    def _read_header(self):
+        """Return format and size of the partially written image"""
+        temp_file = self.file.file
+        position = temp_file.tell()
+        temp_file.seek(0)
+        try:
+            with Image.open(temp_file) as image:
+                return image.format, image.size
+        finally:
+            temp_file.seek(position)
+
+    def _too_large_message(self):
+        return f'Image exceeds {self.max_size} bytes.'
+
+    def _reject(self, message):
+        """Discard the partial file and stop reading the upload"""
+        self.upload_interrupted()
+        raise ImageUploadRejected(message)
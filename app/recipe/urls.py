@@ -5,6 +5,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
 from recipe import views
+from recipe.async_views import async_patterns
 
 
 router = DefaultRouter()
@@ -15,5 +16,24 @@ router.register('ingredients', views.IngredientViewSet)
 app_name = 'recipe'
 
 urlpatterns = [
-    path('', include(router.urls))
+    path('stats/', views.RecipeStatsView.as_view(), name='stats'),
+    path(
+        'cache-stats/',
+        views.ResponseCacheStatsView.as_view(),
+        name='cache-stats',
+    ),
+    path('', include(router.urls)),
+]
+
+# Served by app.asgi, list and detail routes run as coroutines
+async_urlpatterns = [
+    path('', include(async_patterns(router.urls, [
+        'recipe-list',
+        'recipe-detail',
+        'tag-list',
+        'tag-detail',
+        'ingredient-list',
+        'ingredient-detail',
+    ]))),
+    *urlpatterns,
 ]
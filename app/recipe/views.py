@@ -1,81 +1,449 @@
 """
 Views for Recipe APIs
 """
+import csv
+import hashlib
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from drf_spectacular.utils import (
+    extend_schema_view,
+    extend_schema,
+    OpenApiParameter,
+    OpenApiTypes,
+)
+
+from core.parsers import FastJSONParser
 from core.models import (
     Recipe,
     Tag,
     Ingredient,
+    UserDataVersion,
 )
 
 from recipe.serializers import (
     RecipeSerializer,
+    RecipeListFastSerializer,
     RecipeDetailSerializer,
     TagSerializer,
     IngredientSerializer,
     RecipeImageSerializer,
+    RecipeStatsSerializer,
 )
 
 from rest_framework import (
     viewsets,
-    authentication,
     permissions,
     mixins,
     status,
+    serializers,
+)
+
+from recipe import cache, exports, images, imports, parsers, stats
+from recipe.search import search_recipes
+from recipe.pagination import (
+    RecipeCursorPagination,
+    RecipeAttrCursorPagination,
 )
 
 from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
+from rest_framework.views import APIView
+
+
+class EarlyResponse(Exception):
+    """Raised to answer a request without running the view"""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """
+    Answer conditional GET requests from the user's data version.
+    The version is read before any data, so a validator never describes
+    content newer than what is served with it.
+    """
+    conditional_actions = ['list', 'retrieve']
+
+    def get_validators(self, request):
+        """Return ETag and Last-Modified timestamp of the response"""
+        version, modified = UserDataVersion.objects.current(request.user.pk)
+        key = ':'.join([
+            str(request.user.pk),
+            str(version),
+            # Links in responses are absolute, built from these
+            request.scheme,
+            request.get_host(),
+            request.get_full_path(),
+            request.accepted_media_type,
+        ])
+        etag = f'"{hashlib.sha1(key.encode()).hexdigest()}"'
+
+        # HTTP dates are whole seconds, a write later in the second of
+        # the last one would get the same date. It is only sent once that
+        # second is over, until then clients revalidate with the ETag.
+        last_modified = None
+        if modified is not None:
+            timestamp = int(modified.timestamp())
+            if timestamp < int(timezone.now().timestamp()):
+                last_modified = timestamp
+
+        return etag, last_modified
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = self.last_modified = None
+        if self.action in self.conditional_actions:
+            self.etag, self.last_modified = self.get_validators(request)
+            response = get_conditional_response(
+                request,
+                etag=self.etag,
+                last_modified=self.last_modified,
+            )
+            if response is not None:
+                raise EarlyResponse(self.set_validators(response))
+
+    def handle_exception(self, exc):
+        if isinstance(exc, EarlyResponse):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request,
+            response,
+            *args,
+            **kwargs,
+        )
+        if getattr(self, 'etag', None) and response.status_code == 200:
+            self.set_validators(response)
+        return response
+
+    def set_validators(self, response):
+        """Add ETag and Last-Modified headers to response"""
+        response['ETag'] = self.etag
+        if self.last_modified:
+            response['Last-Modified'] = http_date(self.last_modified)
+        return response
+
+
+class CachedResponseMixin(ConditionalGetMixin):
+    """Serve rendered JSON responses of cached actions from the cache"""
+    cached_actions = ['list', 'retrieve']
+
+    def _is_cached(self, request):
+        return (
+            self.action in self.cached_actions
+            and request.accepted_renderer.format == 'json'
+        )
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self._is_cached(request):
+            entry = cache.get_response(self.etag)
+            if entry is not None:
+                content, content_type = entry
+                raise EarlyResponse(self.set_validators(
+                    HttpResponse(content, content_type=content_type),
+                ))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request,
+            response,
+            *args,
+            **kwargs,
+        )
+        if (
+            isinstance(response, Response)
+            and response.status_code == 200
+            and self._is_cached(request)
+        ):
+            cache.set_response(self.etag, response.render())
+        return response
 
 
-class RecipeViewset(viewsets.ModelViewSet):
+@extend_schema_view(
+    list=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'tags',
+                OpenApiTypes.STR,
+                description='Comma separated list of tag IDs to filter',
+            ),
+            OpenApiParameter(
+                'ingredients',
+                OpenApiTypes.STR,
+                description='Comma separated list of ingredient IDs to filter',
+            ),
+            OpenApiParameter(
+                'match',
+                OpenApiTypes.STR,
+                enum=['any', 'all'],
+                description='Match any (default) or all of the given IDs',
+            ),
+        ]
+    ),
+    search=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'q',
+                OpenApiTypes.STR,
+                description='Words to search in title, ingredients '
+                            'and description',
+            ),
+            OpenApiParameter(
+                'limit',
+                OpenApiTypes.INT,
+                description='Maximum number of results',
+            ),
+        ]
+    ),
+)
+class RecipeViewset(CachedResponseMixin, viewsets.ModelViewSet):
     """View for manage Recipe APIs"""
     serializer_class = RecipeDetailSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = [authentication.TokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    conditional_actions = ['list', 'retrieve', 'search']
+    pagination_class = RecipeCursorPagination
+    search_limit = 20
+    max_search_limit = 100
+    # Largest primary key the database can store
+    max_id = 2 ** 63 - 1
+
+    def _params_to_ints(self, name):
+        """Convert a comma separated query parameter to integers"""
+        try:
+            ids = [
+                int(str_id)
+                for str_id in self.request.query_params[name].split(',')
+            ]
+            if not all(1 <= id_ <= self.max_id for id_ in ids):
+                raise ValueError
+        except ValueError:
+            raise serializers.ValidationError(
+                {name: ['Must be a comma separated list of IDs.']}
+            )
+        return ids
+
+    def _filter_queryset(self, queryset):
+        """Filter recipes by tags and ingredients query parameters"""
+        match = self.request.query_params.get('match', 'any')
+        if match not in ['any', 'all']:
+            raise serializers.ValidationError(
+                {'match': ['Must be one of: any, all.']}
+            )
+
+        for name in ['tags', 'ingredients']:
+            if self.request.query_params.get(name):
+                queryset = queryset.filter_related(
+                    name,
+                    self._params_to_ints(name),
+                    match_all=(match == 'all'),
+                )
+
+        return queryset
 
     def get_queryset(self):
         """Function to retrieve recipe list for auth user"""
-        return self.queryset.filter(user=self.request.user).order_by('-id')
+        queryset = self.queryset.filter(user=self.request.user)
+        if self.action == 'list':
+            queryset = self._filter_queryset(queryset)
+            if settings.RECIPE_LIST_FAST_PATH:
+                queryset = queryset.values(
+                    *RecipeListFastSerializer.value_fields,
+                )
+            else:
+                queryset = queryset.for_list()
+        elif self.action == 'search':
+            queryset = queryset.for_list()
+        elif self.action in ['retrieve', 'export']:
+            queryset = queryset.for_detail()
+
+        return queryset.order_by('-id')
 
     def get_serializer_class(self):
         """Method to define serializer for endpoint action"""
-        if (self.action == 'list'):
+        if (self.action in ['list', 'search']):
             return RecipeSerializer
         elif (self.action == 'upload_image'):
             return RecipeImageSerializer
         return self.serializer_class
 
+    def list(self, request, *args, **kwargs):
+        """List recipes, skipping serializer fields when fast path is on"""
+        if not settings.RECIPE_LIST_FAST_PATH:
+            return super().list(request, *args, **kwargs)
+
+        page = self.paginate_queryset(self.get_queryset())
+        return self.get_paginated_response(
+            RecipeListFastSerializer(page).data,
+        )
+
     def perform_create(self, serializer):
         """Create new recipe, link with current user"""
         serializer.save(user=self.request.user)
 
-    @action(methods=['POST'], detail=True, url_path='upload_image')
+    @action(
+        methods=['POST'],
+        detail=True,
+        url_path='upload_image',
+        parser_classes=[parsers.ImageUploadParser],
+    )
     def upload_image(self, request, pk=None):
         """Upload an image to recipe"""
         recipe = self.get_object()
+        previous_image = recipe.image.name
         serializer = self.get_serializer(recipe, data=request.data)
 
         if serializer.is_valid():
             serializer.save()
+            images.schedule_derivatives(
+                recipe.image.name,
+                previous_image,
+                recipe.user_id,
+            )
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(methods=['GET'], detail=False, url_path='search')
+    def search(self, request):
+        """Search recipes by title, description and ingredients"""
+        try:
+            limit = int(request.query_params.get('limit', self.search_limit))
+        except ValueError:
+            return Response(
+                {'limit': ['A valid integer is required.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if limit < 1:
+            return Response(
+                {'limit': ['Ensure this value is greater than or equal '
+                           'to 1.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        limit = min(limit, self.max_search_limit)
+
+        ids = search_recipes(
+            request.user,
+            request.query_params.get('q', ''),
+            limit,
+        )
+        recipes = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids if pk in recipes],
+            many=True,
+        )
+        return Response(serializer.data)
+
+    @action(methods=['GET'], detail=False, url_path='export')
+    def export(self, request):
+        """Stream all recipes of the user as NDJSON or a JSON array"""
+        output = request.query_params.get('output', 'ndjson')
+        if output not in exports.OUTPUTS:
+            return Response(
+                {'output': [f'Must be one of: {", ".join(exports.OUTPUTS)}.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        render, content_type = exports.OUTPUTS[output]
+        items = exports.iter_recipe_data(
+            self.get_queryset(),
+            self.get_serializer_context(),
+        )
+        response = StreamingHttpResponse(
+            render(items),
+            content_type=content_type,
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="recipes.{output}"'
+        )
+        return response
+
+    @action(
+        methods=['POST'],
+        detail=False,
+        url_path='import',
+        parser_classes=[
+            FastJSONParser,
+            parsers.NDJSONParser,
+            parsers.CSVParser,
+            MultiPartParser,
+        ],
+    )
+    def bulk_import(self, request):
+        """Import many recipes from a JSON array, NDJSON or CSV"""
+        upload = request.FILES.get('file')
+        file_format = None
+        if upload is not None:
+            if upload.name.endswith('.csv'):
+                file_format = 'CSV'
+                rows = parsers.iter_csv_rows(upload)
+            else:
+                file_format = 'NDJSON'
+                rows = parsers.iter_ndjson_rows(upload)
+        elif isinstance(request.data, list):
+            rows = request.data
+        else:
+            return Response(
+                {'detail': 'Expected a list of recipes or a file upload.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Uploads are read while importing, batches before a line that
+        # fails to decode stay imported
+        try:
+            created, errors = imports.import_recipes(
+                rows,
+                request.user,
+                self.get_serializer_context(),
+            )
+        except (UnicodeDecodeError, csv.Error) as exc:
+            raise ParseError(f'{file_format} parse error - {exc}')
+        return Response(
+            {'created': created, 'errors': errors},
+            status=(
+                status.HTTP_201_CREATED if created
+                else status.HTTP_400_BAD_REQUEST
+            ),
+        )
+
 
 class BaseRecipeAttrViewset(
+        ConditionalGetMixin,
         mixins.DestroyModelMixin,
         mixins.ListModelMixin,
         mixins.UpdateModelMixin,
         viewsets.GenericViewSet):
     """Base viewset for recipe attributes."""
-    authentication_classes = [authentication.TokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = RecipeAttrCursorPagination
 
     def get_queryset(self):
         """Override to filter by user-id"""
         return self.queryset.filter(user=self.request.user).order_by('-name')
 
+    def perform_update(self, serializer):
+        """Update attribute, rejecting a name that is already used"""
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {'name': ['This name is already in use.']}
+            )
+
 
 class TagViewSet(BaseRecipeAttrViewset):
     """Manage tags in the database"""
@@ -87,3 +455,33 @@ class IngredientViewSet(BaseRecipeAttrViewset):
     """Manage ingredients in the database"""
     serializer_class = IngredientSerializer
     queryset = Ingredient.objects.all()
+
+
+class RecipeStatsView(APIView):
+    """Recipe totals of the user and their most used tags and ingredients"""
+    permission_classes = [permissions.IsAuthenticated]
+    top_limit = 5
+
+    def top(self, model, serializer_class):
+        return serializer_class(
+            model.objects.filter(
+                user=self.request.user,
+                recipe_count__gt=0,
+            ).order_by('-recipe_count', 'name')[:self.top_limit],
+            many=True,
+        ).data
+
+    @extend_schema(responses=RecipeStatsSerializer)
+    def get(self, request):
+        data = RecipeStatsSerializer(stats.user_stats(request.user)).data
+        data['top_tags'] = self.top(Tag, TagSerializer)
+        data['top_ingredients'] = self.top(Ingredient, IngredientSerializer)
+        return Response(data)
+
+
+class ResponseCacheStatsView(APIView):
+    """Hit and miss counters of the response cache in this process"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(cache.stats.snapshot())
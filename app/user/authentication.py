@@ -0,0 +1,264 @@
+"""
+Authentication for the APIs
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import caches
+from django.db import router, transaction
+from django.db.models import DEFERRED
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import authentication, exceptions
+from rest_framework.authtoken.models import Token
+
+
+class LRUCache:
+    """Bounded in-process LRU cache with entries expiring after a TTL"""
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return cached value or None when missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """Store value, evicting the least recently used entries"""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Remove value if cached"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SharedCache:
+    """Cache stored in one of Django's cache backends"""
+    key_prefix = 'auth-token'
+
+    def __init__(self, alias, timeout):
+        self.alias = alias
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def make_key(self, key):
+        """Hash the token so it never appears in the cache backend"""
+        return f'{self.key_prefix}:{hashlib.sha256(key.encode()).hexdigest()}'
+
+    def get(self, key):
+        return self.cache.get(self.make_key(key))
+
+    def set(self, key, value):
+        self.cache.set(self.make_key(key), value, self.timeout)
+
+    def delete(self, key):
+        self.cache.delete(self.make_key(key))
+
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+
+def get_token_cache():
+    """Return the token cache configured by TOKEN_AUTH_CACHE setting"""
+    global _token_cache
+    if _token_cache is None:
+        with _token_cache_lock:
+            if _token_cache is None:
+                options = settings.TOKEN_AUTH_CACHE
+                if options.get('ALIAS'):
+                    _token_cache = SharedCache(
+                        options['ALIAS'],
+                        options['TIMEOUT'],
+                    )
+                else:
+                    _token_cache = LRUCache(
+                        options['MAX_SIZE'],
+                        options['TIMEOUT'],
+                    )
+
+    return _token_cache
+
+
+def invalidate_tokens(*keys):
+    """Remove tokens from the cache"""
+    token_cache = get_token_cache()
+    for key in keys:
+        token_cache.delete(key)
+
+
+def _user_cache_key(user_id):
+    return f'signed-token-user:{user_id}'
+
+
+def get_user_state_cache():
+    """Return the cache of users of signed tokens"""
+    return caches[settings.SIGNED_TOKENS['CACHE_ALIAS']]
+
+
+def invalidate_signed_tokens(*user_ids):
+    """
+    Remove users of signed tokens from the cache, again once committed
+    so no worker keeps a state it read before.
+    """
+    keys = [_user_cache_key(user_id) for user_id in user_ids]
+    cache = get_user_state_cache()
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class SignedToken(NamedTuple):
+    """Content of a signed token"""
+    key: str
+    user_id: int
+    version: int
+
+
+SIGNED_TOKEN_SALT = 'user.authentication.SignedToken'
+
+
+def make_signed_token(user):
+    """Return a signed token of user, stored nowhere"""
+    return signing.TimestampSigner(salt=SIGNED_TOKEN_SALT).sign(
+        f'{user.pk}.{user.token_version}',
+    )
+
+
+def read_signed_token(key):
+    """
+    Return the content of a signed token, raising BadSignature when it
+    is forged or SignatureExpired when older than the configured age.
+    """
+    value = signing.TimestampSigner(salt=SIGNED_TOKEN_SALT).unsign(
+        key,
+        max_age=settings.SIGNED_TOKENS['MAX_AGE'],
+    )
+    user_id, version = value.split('.')
+    return SignedToken(key, int(user_id), int(version))
+
+
+def is_signed_token(key):
+    """Tell signed tokens from opaque keys, which never contain colons"""
+    return ':' in key
+
+
+class AuthState(NamedTuple):
+    """What authentication needs of a user, kept in the token cache"""
+    user_id: int
+    is_active: bool
+    token_version: int
+    # Defaults to False for states cached before it was added
+    is_staff: bool = False
+
+    @classmethod
+    def of(cls, user):
+        return cls(user.pk, user.is_active, user.token_version, user.is_staff)
+
+    def make_user(self):
+        """
+        Return the user with the fields API views and permissions read
+        loaded. Any other field costs a query when first accessed.
+        """
+        model = get_user_model()
+        loaded = {
+            model._meta.pk.attname: self.user_id,
+            'is_active': self.is_active,
+            'token_version': self.token_version,
+            'is_staff': self.is_staff,
+        }
+        fields = model._meta.concrete_fields
+        return model.from_db(
+            router.db_for_read(model),
+            [field.attname for field in fields],
+            [loaded.get(field.attname, DEFERRED) for field in fields],
+        )
+
+
+class CachedTokenAuthentication(authentication.TokenAuthentication):
+    """
+    Token authentication caching the state of the token's user, never
+    the user itself, so a cached copy is never saved back. Signed tokens
+    are accepted as well, they are checked against the token version of
+    their user, cached in SIGNED_TOKENS['CACHE_ALIAS'], instead of the
+    token table.
+    """
+
+    def authenticate_credentials(self, key):
+        if is_signed_token(key):
+            return self.authenticate_signed(key)
+
+        token_cache = get_token_cache()
+        state = token_cache.get(key)
+        if state is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, AuthState.of(user))
+            return (user, token)
+
+        if not state.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'),
+            )
+        user = state.make_user()
+        return (user, Token(key=key, user=user))
+
+    def authenticate_signed(self, key):
+        try:
+            token = read_signed_token(key)
+        except signing.SignatureExpired:
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        except (signing.BadSignature, ValueError):
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        cache = get_user_state_cache()
+        cache_key = _user_cache_key(token.user_id)
+        state = cache.get(cache_key)
+        if state is None:
+            user = get_user_model().objects.filter(
+                pk=token.user_id,
+            ).first()
+            if user is None:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            state = AuthState.of(user)
+            cache.set(
+                cache_key,
+                state,
+                settings.TOKEN_AUTH_CACHE['TIMEOUT'],
+            )
+
+        if not state.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'),
+            )
+        if state.token_version != token.version:
+            raise exceptions.AuthenticationFailed(_('Token was revoked.'))
+
+        return (state.make_user(), token)
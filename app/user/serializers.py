@@ -7,7 +7,9 @@ from django.contrib.auth import (
 )
 from django.utils.translation import gettext as _
 
-from rest_framework import serializers
+from rest_framework import exceptions, serializers
+
+from core.hashers import HashingBusy
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -24,15 +26,19 @@ class UserSerializer(serializers.ModelSerializer):
         return get_user_model().objects.create_user(**validated_data)
 
     def update(self, instance, validated_data):
-        """Update and return user"""
+        """Update and return user, saving only the changed fields"""
         password = validated_data.pop('password', None)
-        user = super().update(instance, validated_data)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        update_fields = list(validated_data)
 
         if password:
-            user.set_password(password)
-            user.save()
+            instance.set_password(password)
+            update_fields.append('password')
+
+        instance.save(update_fields=update_fields)
 
-        return user
+        return instance
 
 
 class AuthTokenSerializer(serializers.Serializer):
@@ -47,11 +53,14 @@ class AuthTokenSerializer(serializers.Serializer):
         """Validate and authenticate user"""
         email = attrs.get('email')
         password = attrs.get('password')
-        user = authenticate(
-            request=self.context.get('request'),
-            email=email,
-            password=password,
-        )
+        try:
+            user = authenticate(
+                request=self.context.get('request'),
+                email=email,
+                password=password,
+            )
+        except HashingBusy as exc:
+            raise exceptions.Throttled(wait=exc.wait, detail=str(exc))
         if not user:
             msg = _('Unable to authenticate with provided credentials.')
             raise serializers.ValidationError(msg, code='authorization')
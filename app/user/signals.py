@@ -0,0 +1,55 @@
+"""
+Signal handlers for the user app
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from user.authentication import invalidate_signed_tokens, invalidate_tokens
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Drop deleted token from the auth cache"""
+    invalidate_tokens(instance.key)
+
+
+@receiver(pre_save, sender=get_user_model())
+def revoke_signed_tokens(sender, instance, raw=False, update_fields=None,
+                         **kwargs):
+    """
+    Revoke signed tokens issued with the previous password, whichever
+    way it was changed. The version is incremented in the database only
+    if the stored hash differs, so no concurrent change is lost.
+    """
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and 'password' not in update_fields:
+        return
+
+    revoked = sender._default_manager.filter(pk=instance.pk).exclude(
+        password=instance.password,
+    ).update(token_version=F('token_version') + 1)
+    if revoked:
+        instance.refresh_from_db(fields=['token_version'])
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """Drop tokens of a changed user, e.g. deactivated or new password"""
+    invalidate_signed_tokens(instance.pk)
+    if created:
+        return
+
+    invalidate_tokens(
+        *Token.objects.filter(user=instance).values_list('key', flat=True)
+    )
+
+
+@receiver(post_delete, sender=get_user_model())
+def invalidate_deleted_user(sender, instance, **kwargs):
+    """Drop a deleted user of signed tokens from the auth cache"""
+    invalidate_signed_tokens(instance.pk)
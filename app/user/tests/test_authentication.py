@@ -0,0 +1,337 @@
+"""
+Tests for the cached token authentication.
+"""
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework.authtoken.models import Token
+from rest_framework import status
+
+from user.authentication import (
+    AuthState,
+    CachedTokenAuthentication,
+    LRUCache,
+    get_token_cache,
+    make_signed_token,
+)
+from user.serializers import UserSerializer
+
+
+ME_URL = reverse('user:me')
+TOKEN_URL = reverse('user:token')
+
+
+def create_user(**params):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(**params)
+
+
+class LRUCacheTests(TestCase):
+    """Test the in-process LRU cache"""
+
+    def test_evicts_least_recently_used(self):
+        """Test cache drops the least recently used entry when full"""
+        cache = LRUCache(max_size=2, timeout=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    @patch('user.authentication.time.monotonic')
+    def test_entries_expire(self, patched_monotonic):
+        """Test cache entries expire after timeout"""
+        cache = LRUCache(max_size=2, timeout=60)
+        patched_monotonic.return_value = 100
+        cache.set('a', 1)
+
+        patched_monotonic.return_value = 159
+        self.assertEqual(cache.get('a'), 1)
+        patched_monotonic.return_value = 160
+        self.assertIsNone(cache.get('a'))
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating requests with cached tokens"""
+
+    def setUp(self):
+        self.user = create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test Name',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_lookup_cached(self):
+        """Test token is looked up in the database only once"""
+        with self.assertNumQueries(2):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        # Only the profile itself is read
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_invalid_token_error(self):
+        """Test unknown token is rejected"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_invalidated(self):
+        """Test deleting a token removes it from the cache"""
+        self.client.get(ME_URL)
+
+        self.token.delete()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_invalidated(self):
+        """Test deactivating a user removes their token from the cache"""
+        self.client.get(ME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_invalidated(self):
+        """Test updating password through the API invalidates cache"""
+        self.client.get(ME_URL)
+        self.assertIsNotNone(get_token_cache().get(self.token.key))
+
+        res = self.client.patch(ME_URL, {'password': 'newpass123'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNone(get_token_cache().get(self.token.key))
+
+    def test_only_auth_state_cached(self):
+        """Test the cache holds the state of the user, not the user"""
+        self.client.get(ME_URL)
+
+        self.assertEqual(
+            get_token_cache().get(self.token.key),
+            AuthState(self.user.pk, True, 0),
+        )
+
+    def test_cached_user_loads_fields(self):
+        """Test fields of the user left out of the cache are loaded"""
+        self.client.get(ME_URL)
+        user, token = CachedTokenAuthentication().authenticate_credentials(
+            self.token.key,
+        )
+
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(token.key, self.token.key)
+        with self.assertNumQueries(0):
+            self.assertFalse(user.is_staff)
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, self.user.email)
+
+    def test_session_authentication(self):
+        """Test users logged in with a session, e.g. in the browsable
+        API, are authenticated too"""
+        client = APIClient()
+        client.force_login(self.user)
+
+        res = client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_update_keeps_password_changed_elsewhere(self):
+        """Test a cached user never restores a password changed elsewhere,
+        as another worker would without invalidating this one's cache"""
+        self.client.get(ME_URL)
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            password=make_password('elsewhere123'),
+        )
+
+        res = self.client.patch(ME_URL, {'name': 'New Name'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'New Name')
+        self.assertTrue(self.user.check_password('elsewhere123'))
+
+
+@override_settings(SIGNED_TOKENS={
+    'ENABLED': True,
+    'MAX_AGE': 60,
+    'CACHE_ALIAS': 'default',
+})
+class SignedTokenAuthenticationTests(TestCase):
+    """Test issuing and authenticating with signed tokens"""
+
+    def setUp(self):
+        self.user = create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test Name',
+        )
+        self.client = APIClient()
+
+    def login(self):
+        res = self.client.post(TOKEN_URL, {
+            'email': 'test@example.com',
+            'password': 'testpass123',
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        token = res.data['token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        return res
+
+    def test_login_writes_no_token(self):
+        """Test signed tokens are issued without a token row"""
+        res = self.login()
+
+        self.assertEqual(res.data['expires_in'], 60)
+        self.assertFalse(Token.objects.exists())
+
+    def test_authenticate_cached(self):
+        """Test the user is loaded once, later requests only read the
+        profile"""
+        self.login()
+
+        with self.assertNumQueries(2):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_expired_token_error(self):
+        """Test tokens older than the maximum age are rejected"""
+        with patch('django.core.signing.time.time', return_value=1000):
+            token = make_signed_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('expired', res.data['detail'])
+
+    def test_forged_token_error(self):
+        """Test tokens with a wrong signature are rejected"""
+        other = create_user(email='other@example.com', password='pass123')
+        token = make_signed_token(self.user)
+        forged = token.replace(f'{self.user.pk}.', f'{other.pk}.', 1)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {forged}')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_revokes(self):
+        """Test changing the password revokes issued tokens"""
+        self.login()
+        self.client.get(ME_URL)
+
+        self.client.patch(ME_URL, {'password': 'newpass123'})
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('revoked', res.data['detail'])
+
+    def test_password_set_elsewhere_revokes(self):
+        """Test a password changed outside the API, e.g. in the admin or
+        by changepassword, revokes issued tokens"""
+        self.login()
+        self.client.get(ME_URL)
+
+        user = get_user_model().objects.get(pk=self.user.pk)
+        user.set_password('newpass123')
+        user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(user.token_version, 1)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_other_changes_keep_tokens(self):
+        """Test saving a user with an unchanged password keeps tokens"""
+        self.login()
+
+        user = get_user_model().objects.get(pk=self.user.pk)
+        user.name = 'New Name'
+        user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertEqual(user.token_version, 0)
+
+    def test_token_version_in_shared_cache(self):
+        """Test token versions are kept in the cache shared by workers,
+        not in the cache of this process"""
+        self.login()
+        self.client.get(ME_URL)
+
+        self.assertEqual(
+            caches['default'].get(f'signed-token-user:{self.user.pk}'),
+            AuthState(self.user.pk, True, 0),
+        )
+        self.assertIsNone(
+            get_token_cache().get(f'signed-token-user:{self.user.pk}'),
+        )
+
+    def test_concurrent_password_changes_revoke(self):
+        """Test a password change from a stale user still revokes the
+        tokens of the version current in the database"""
+        stale = get_user_model().objects.get(pk=self.user.pk)
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            token_version=1,
+        )
+        token = make_signed_token(get_user_model().objects.get(
+            pk=self.user.pk,
+        ))
+
+        serializer = UserSerializer(
+            stale,
+            data={'password': 'newpass123'},
+            partial=True,
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(stale.token_version, 2)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test tokens of deactivated users are rejected"""
+        self.login()
+        self.client.get(ME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_opaque_tokens_still_accepted(self):
+        """Test tokens issued before signed tokens keep working"""
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
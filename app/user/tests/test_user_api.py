@@ -8,6 +8,8 @@ from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.testing import QueryBudgetMixin
+
 
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
@@ -19,7 +21,7 @@ def create_user(**params):
     return get_user_model().objects.create_user(**params)
 
 
-class PublicUserApiTests(TestCase):
+class PublicUserApiTests(QueryBudgetMixin, TestCase):
     def setUp(self):
         self.client = APIClient()
 
@@ -122,6 +124,33 @@ class PublicUserApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertNotIn('token', res.data)
 
+    def test_create_token_query_budget(self):
+        """Test obtaining a token stays within the query budget"""
+        create_user(email='test@example.com', password='test-user-pass123')
+
+        with self.assertQueryBudget(5):
+            res = self.client.post(TOKEN_URL, {
+                'email': 'test@example.com',
+                'password': 'test-user-pass123',
+            })
+
+        self.assertIn('token', res.data)
+
+    def test_token_authentication_query_budget(self):
+        """Test requests with a cached token only read the profile"""
+        create_user(email='test@example.com', password='test-user-pass123')
+        token = self.client.post(TOKEN_URL, {
+            'email': 'test@example.com',
+            'password': 'test-user-pass123',
+        }).data['token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        self.client.get(ME_URL)
+
+        with self.assertQueryBudget(1):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
     def test_retrieve_me_unauthorized(self):
         """Test unauth user umable to access to me url"""
         res = self.client.get(ME_URL)
@@ -129,7 +158,7 @@ class PublicUserApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateUserApiTests(TestCase):
+class PrivateUserApiTests(QueryBudgetMixin, TestCase):
     def setUp(self):
         self.user = create_user(
             email='test@example.com',
@@ -166,3 +195,10 @@ class PrivateUserApiTests(TestCase):
         self.user.refresh_from_db()
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
+
+    def test_update_user_profile_query_budget(self):
+        """Test updating the profile stays within the query budget"""
+        with self.assertQueryBudget(3):
+            res = self.client.patch(ME_URL, {'name': 'Updated name'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -1,10 +1,15 @@
 """
 User API View
 """
-from rest_framework import generics, authentication, permissions
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from user.authentication import make_signed_token
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer,
@@ -19,14 +24,28 @@ class CreateUserView(generics.CreateAPIView):
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Retrieve and update user in the system"""
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        """Retrieve and return authenticated user."""
-        return self.request.user
+        """
+        Retrieve and return authenticated user, read again from the
+        database as authentication may return a partly loaded user.
+        """
+        return get_user_model().objects.get(pk=self.request.user.pk)
 
 
 class CreateTokenView(ObtainAuthToken):
     serializer_class = AuthTokenSerializer
     renderer_class = api_settings.DEFAULT_RENDERER_CLASSES
+
+    def post(self, request, *args, **kwargs):
+        """Issue a signed token, written nowhere, when they are enabled"""
+        if not settings.SIGNED_TOKENS['ENABLED']:
+            return super().post(request, *args, **kwargs)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({
+            'token': make_signed_token(serializer.validated_data['user']),
+            'expires_in': settings.SIGNED_TOKENS['MAX_AGE'],
+        })